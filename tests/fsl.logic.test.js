@@ -3,6 +3,14 @@
 const {
   buildFslBody,
   validatePayload,
+  encodeTrackSegment,
+  decodeTrackSegment,
+  newTrace,
+  markStage,
+  ackSnapshot,
+  diffPayload,
+  decodeQrCustomer,
+  lookupCustomer,
 } = require("../transport/www/field/fsl/fsl.logic.js"); // ⬅ adjust path
 
 describe("buildFslBody", () => {
@@ -18,6 +26,12 @@ describe("buildFslBody", () => {
     expect(body.payload_json).toBe(
       JSON.stringify({ qty_or_weight: 27, hello: "world" })
     );
+    expect("base_version" in body).toBe(false);
+  });
+
+  test("patches carry base_version", () => {
+    const body = buildFslBody({ qr_token: "QR", driver_canonical_id: "D", payload: {}, base_version: 0 });
+    expect(body.base_version).toBe(0);
   });
 });
 
@@ -41,3 +55,105 @@ describe("validatePayload", () => {
     expect(errors).toEqual([]);
   });
 });
+
+describe("encodeTrackSegment", () => {
+  const points = [
+    { lat: 35.70001, lng: 51.40002, ts: 1760860800123 },
+    { lat: 35.70011, lng: 51.39992, ts: 1760860805000 },
+    { lat: 35.70031, lng: 51.39992, ts: 1760860810999 },
+  ];
+
+  test("first value absolute, then integer deltas", () => {
+    const seg = encodeTrackSegment(points);
+
+    expect(seg.lat).toEqual([3570001, 10, 20]);
+    expect(seg.lng).toEqual([5140002, -10, 0]);
+    expect(seg.t).toEqual([1760860800, 5, 5]);
+  });
+
+  test("round-trips to 1e-5 degrees and whole seconds", () => {
+    const back = decodeTrackSegment(encodeTrackSegment(points));
+
+    expect(back.length).toBe(3);
+    expect(back[2].lat).toBeCloseTo(35.70031, 5);
+    expect(back[1].lng).toBeCloseTo(51.39992, 5);
+    expect(back[0].ts).toBe(1760860800000);
+  });
+
+  test("empty input gives empty arrays", () => {
+    expect(encodeTrackSegment([])).toEqual({ lat: [], lng: [], t: [] });
+  });
+});
+
+describe("trace stages", () => {
+  test("newTrace stamps captured and a 32-char hex id", () => {
+    const trace = newTrace(1000);
+    expect(trace.stages).toEqual({ captured: 1000 });
+    expect(trace.id).toMatch(/^[0-9a-f]{32}$/);
+  });
+
+  test("markStage keeps the first value unless overwriting", () => {
+    const trace = newTrace(1000);
+    markStage(trace, "first_attempt", 2000);
+    markStage(trace, "first_attempt", 3000);
+    markStage(trace, "sent", 2000, true);
+    markStage(trace, "sent", 3000, true);
+    expect(trace.stages.first_attempt).toBe(2000);
+    expect(trace.stages.sent).toBe(3000);
+  });
+});
+
+describe("diffPayload", () => {
+  const photo = "data:image/jpeg;base64," + "A".repeat(5000);
+  const saved = {
+    qty_or_weight: 40,
+    photo_data_url: photo,
+    is_waste_safe: true,
+    performed_at: "2026-10-19T08:00:00.000Z",
+  };
+
+  test("acknowledged snapshot does not keep photo bytes", () => {
+    const snap = ackSnapshot(saved);
+    expect(snap.photo_data_url.length).toBeLessThan(40);
+    expect(snap.qty_or_weight).toBe(40);
+  });
+
+  test("only changed fields and performed_at are sent", () => {
+    const next = { ...saved, qty_or_weight: 42, performed_at: "2026-10-19T08:05:00.000Z" };
+    expect(diffPayload(ackSnapshot(saved), next)).toEqual({
+      qty_or_weight: 42,
+      performed_at: "2026-10-19T08:05:00.000Z",
+    });
+  });
+
+  test("a new photo is sent", () => {
+    const next = { ...saved, photo_data_url: photo + "B" };
+    expect(Object.keys(diffPayload(ackSnapshot(saved), next))).toEqual(["photo_data_url", "performed_at"]);
+  });
+});
+
+describe("offline customer lookup", () => {
+  const qrToken = (payload) =>
+    Buffer.from(JSON.stringify(payload)).toString("base64url");
+
+  test("decodes the customer from a QR token", () => {
+    expect(decodeQrCustomer(qrToken({ customer: "مشتری-۱", sig: "x", v: 1 }))).toBe("مشتری-۱");
+    expect(decodeQrCustomer("not*base64")).toBeNull();
+    expect(decodeQrCustomer(qrToken({ v: 1 }))).toBeNull();
+  });
+
+  test("finds the customer and its sites in the directory", () => {
+    const directory = {
+      fields: { customers: ["customer_name"], sites: ["customer", "site_uuid", "service_window"] },
+      customers: { C1: ["Bakery"] },
+      sites: { S1: ["C1", "u1", "08:00-12:00"], S2: ["C2", "u2", null] },
+    };
+    expect(lookupCustomer(directory, "C1")).toEqual({
+      customer: "C1",
+      customer_name: "Bakery",
+      sites: [{ name: "S1", customer: "C1", site_uuid: "u1", service_window: "08:00-12:00" }],
+    });
+    expect(lookupCustomer(directory, "C2")).toBeNull();
+    expect(lookupCustomer(null, "C1")).toBeNull();
+  });
+});
@@ -3,6 +3,12 @@
 const {
   createdAtToMs,
   shouldDropItem,
+  parseRetryAfterMs,
+  computeBackoffMs,
+  diffAssetManifests,
+  isCachedAssetCurrent,
+  applyDirectoryUpdate,
+  markSendStages,
   flushQueueCore,
 } = require("../transport/www/field/fsl/sw.core.js"); // ⬅ adjust path if different
 
@@ -180,3 +186,281 @@ describe("flushQueueCore", () => {
     expect(metrics.failed).toBe(2);
   });
 });
+
+describe("parseRetryAfterMs", () => {
+  test("parses delta-seconds", () => {
+    expect(parseRetryAfterMs("7")).toBe(7000);
+  });
+
+  test("parses HTTP-date", () => {
+    const now = Date.parse("2026-01-10T00:00:00Z");
+    expect(parseRetryAfterMs("Sat, 10 Jan 2026 00:00:30 GMT", now)).toBe(30000);
+  });
+
+  test("returns 0 for missing or invalid", () => {
+    expect(parseRetryAfterMs(null)).toBe(0);
+    expect(parseRetryAfterMs("")).toBe(0);
+    expect(parseRetryAfterMs("soon")).toBe(0);
+  });
+});
+
+describe("computeBackoffMs", () => {
+  test("grows exponentially with jitter in [exp/2, exp]", () => {
+    const low = { baseMs: 1000, random: () => 0 };
+    const high = { baseMs: 1000, random: () => 1 };
+
+    expect(computeBackoffMs(1, 0, low)).toBe(500);
+    expect(computeBackoffMs(1, 0, high)).toBe(1000);
+    expect(computeBackoffMs(3, 0, low)).toBe(2000);
+    expect(computeBackoffMs(3, 0, high)).toBe(4000);
+  });
+
+  test("never retries before the server hint", () => {
+    expect(computeBackoffMs(1, 15000, { baseMs: 1000, random: () => 1 })).toBe(15000);
+  });
+
+  test("is capped", () => {
+    expect(
+      computeBackoffMs(30, 0, { baseMs: 1000, capMs: 60000, random: () => 1 })
+    ).toBe(60000);
+  });
+});
+
+describe("flushQueueCore throttling", () => {
+  test("stops the batch on 503 without counting retries", async () => {
+    const now = Date.now();
+    const items = [1, 2, 3].map((id) => ({
+      id,
+      created_at: now - id * 1000,
+      retry_count: 0,
+      body: JSON.stringify({ id }),
+    }));
+
+    const queueService = {
+      async getAll() {
+        return items.map((i) => ({ ...i }));
+      },
+      async delete(id) {
+        const idx = items.findIndex((i) => i.id === id);
+        if (idx >= 0) items.splice(idx, 1);
+      },
+      async update(updated) {
+        const idx = items.findIndex((i) => i.id === updated.id);
+        if (idx >= 0) items[idx] = { ...updated };
+      },
+      async trimToMax() {},
+    };
+
+    let calls = 0;
+    const sendFn = jest.fn(async () => {
+      calls++;
+      return calls === 1
+        ? { ok: true, status: 200 }
+        : { ok: false, status: 503, retryAfterMs: 8000 };
+    });
+
+    const metrics = await flushQueueCore({
+      queueService,
+      sendFn,
+      nowMs: now,
+      maxAgeMs: 30 * 24 * 60 * 60 * 1000,
+      maxRetries: 5,
+      maxItemsPerFlush: 10,
+      maxQueueItems: 100,
+      logger: { logSync() {}, logDrop() {} },
+    });
+
+    expect(sendFn).toHaveBeenCalledTimes(2);
+    expect(metrics.throttled).toBe(true);
+    expect(metrics.retry_after_ms).toBe(8000);
+    expect(metrics.succeeded).toBe(1);
+    expect(metrics.failed).toBe(0);
+    expect(items.length).toBe(2);
+    expect(items.every((i) => i.retry_count === 0)).toBe(true);
+  });
+});
+
+describe("flushQueueCore tracing", () => {
+  test("stamps first_attempt once and sent on every try, saving the trace", async () => {
+    const items = [
+      {
+        id: 1,
+        body: JSON.stringify({ a: 1 }),
+        created_at: 1000,
+        retry_count: 0,
+        trace: { id: "t1", stages: { captured: 900, queued: 1000 } },
+      },
+    ];
+    const queueService = {
+      async getAll() {
+        return items.map((i) => ({ ...i, trace: JSON.parse(JSON.stringify(i.trace)) }));
+      },
+      async delete(id) {
+        const idx = items.findIndex((i) => i.id === id);
+        if (idx >= 0) items.splice(idx, 1);
+      },
+      async update(updated) {
+        const idx = items.findIndex((i) => i.id === updated.id);
+        if (idx >= 0) items[idx] = { ...updated };
+      },
+      async trimToMax() {},
+    };
+
+    const seen = [];
+    const sendFn = jest.fn(async (payloadObj, item) => {
+      seen.push({ ...item.trace.stages, retry_count: item.trace.retry_count });
+      return seen.length === 1 ? { ok: false, status: 500 } : { ok: true, status: 200 };
+    });
+
+    const opts = {
+      queueService,
+      sendFn,
+      nowMs: 2000,
+      maxAgeMs: 60 * 60 * 1000,
+      maxRetries: 5,
+      logger: { logSync() {}, logDrop() {} },
+    };
+    await flushQueueCore({ ...opts, clock: () => 2000 });
+    expect(items[0].trace.stages.first_attempt).toBe(2000);
+
+    await flushQueueCore({ ...opts, clock: () => 5000 });
+    expect(seen[1].first_attempt).toBe(2000);
+    expect(seen[1].sent).toBe(5000);
+    expect(seen[1].retry_count).toBe(1);
+    expect(items.length).toBe(0);
+  });
+
+  test("items without a trace are left alone", () => {
+    expect(markSendStages({ id: 1 }, 1000)).toBe(null);
+  });
+});
+
+describe("diffAssetManifests", () => {
+  const current = {
+    version: "a",
+    assets: {
+      "/field/fsl/fsl.js": { hash: "111", bytes: 4000 },
+      "/field/fsl/fsl.css": { hash: "222", bytes: 900 },
+      "/field/fsl/old.js": { hash: "333", bytes: 100 },
+    },
+  };
+  const next = {
+    version: "b",
+    assets: {
+      "/field/fsl/fsl.js": { hash: "444", bytes: 4100 },
+      "/field/fsl/fsl.css": { hash: "222", bytes: 900 },
+      "/field/fsl/sw.core.js": { hash: "555", bytes: 2000 },
+    },
+  };
+
+  test("only changed and new entries are fetched", () => {
+    const diff = diffAssetManifests(current, next);
+    expect(diff.changed).toEqual(["/field/fsl/fsl.js", "/field/fsl/sw.core.js"]);
+    expect(diff.unchanged).toEqual(["/field/fsl/fsl.css"]);
+    expect(diff.removed).toEqual(["/field/fsl/old.js"]);
+    expect(diff.changedBytes).toBe(6100);
+  });
+
+  test("first install fetches everything", () => {
+    const diff = diffAssetManifests(null, next);
+    expect(diff.changed.length).toBe(3);
+    expect(diff.unchanged).toEqual([]);
+  });
+});
+
+describe("isCachedAssetCurrent", () => {
+  const manifest = { version: "a", assets: { "/field/fsl/fsl.js": { hash: "111", bytes: 4000 } } };
+
+  test("plain URLs and the cached hash are served from cache", () => {
+    expect(isCachedAssetCurrent(manifest, "/field/fsl/fsl.js", null)).toBe(true);
+    expect(isCachedAssetCurrent(manifest, "/field/fsl/fsl.js", "111")).toBe(true);
+  });
+
+  test("a newer hash or an unknown asset goes to the network", () => {
+    expect(isCachedAssetCurrent(manifest, "/field/fsl/fsl.js", "444")).toBe(false);
+    expect(isCachedAssetCurrent(manifest, "/field/fsl/new.js", "555")).toBe(false);
+    expect(isCachedAssetCurrent(null, "/field/fsl/fsl.js", "111")).toBe(false);
+  });
+});
+
+describe("flushQueueCore stale writes", () => {
+  test("409 removes the item without a retry", async () => {
+    const items = [{ id: 1, body: JSON.stringify({ a: 1 }), created_at: 1000, retry_count: 0 }];
+    const queueService = {
+      async getAll() {
+        return items.map((i) => ({ ...i }));
+      },
+      async delete(id) {
+        const idx = items.findIndex((i) => i.id === id);
+        if (idx >= 0) items.splice(idx, 1);
+      },
+      async update() {
+        throw new Error("stale items must not be retried");
+      },
+      async trimToMax() {},
+    };
+
+    const metrics = await flushQueueCore({
+      queueService,
+      sendFn: async () => ({ ok: false, status: 409 }),
+      nowMs: 2000,
+      maxAgeMs: 60 * 60 * 1000,
+      maxRetries: 5,
+      logger: { logSync() {}, logDrop() {} },
+    });
+
+    expect(items.length).toBe(0);
+    expect(metrics.rejected).toBe(1);
+    expect(metrics.failed).toBe(0);
+  });
+});
+
+describe("applyDirectoryUpdate", () => {
+  const fields = { customers: ["customer_name"], sites: ["customer", "site_uuid"] };
+  const v1 = {
+    territory: "North",
+    version: 100,
+    fields,
+    customers: { C1: ["Bakery"], C2: ["Clinic"] },
+    sites: { S1: ["C1", "u1"], S2: ["C2", "u2"] },
+  };
+
+  test("takes a full snapshot as is", () => {
+    const next = applyDirectoryUpdate(null, { ...v1, full: true });
+    expect(next).toEqual(v1);
+  });
+
+  test("keeps the same object when unchanged", () => {
+    expect(applyDirectoryUpdate(v1, { territory: "North", version: 100, unchanged: true })).toBe(v1);
+  });
+
+  test("refetches when an unchanged answer is for another territory", () => {
+    const update = { territory: "South", version: 100, unchanged: true };
+    expect(() => applyDirectoryUpdate(v1, update)).toThrow("DIRECTORY_BASE_MISMATCH");
+  });
+
+  test("applies upserts and deletes from a delta", () => {
+    const next = applyDirectoryUpdate(v1, {
+      territory: "North",
+      version: 200,
+      base: 100,
+      full: false,
+      customers: { upsert: { C3: ["School"] }, delete: ["C2"] },
+      sites: { upsert: { S1: ["C1", "u9"] }, delete: ["S2"] },
+    });
+    expect(next.version).toBe(200);
+    expect(next.customers).toEqual({ C1: ["Bakery"], C3: ["School"] });
+    expect(next.sites).toEqual({ S1: ["C1", "u9"] });
+    expect(v1.sites.S2).toEqual(["C2", "u2"]); // input untouched
+  });
+
+  test("rejects a delta for another version", () => {
+    const delta = { territory: "North", version: 300, base: 200, full: false };
+    expect(() => applyDirectoryUpdate(v1, delta)).toThrow("DIRECTORY_BASE_MISMATCH");
+    expect(() => applyDirectoryUpdate(null, delta)).toThrow("DIRECTORY_BASE_MISMATCH");
+  });
+
+  test("drops the directory when the driver has no territory", () => {
+    expect(applyDirectoryUpdate(v1, { territory: null })).toBeNull();
+  });
+});
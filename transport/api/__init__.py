@@ -0,0 +1,2 @@
+# `transport.api.get_driver_trips` is the path the field service worker caches.
+from transport.api.trips import get_driver_trips
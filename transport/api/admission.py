@@ -0,0 +1,83 @@
+"""
+Admission control for the FSL write endpoints.
+
+A fleet reconnecting at once (cell network back in a district) makes every
+service worker flush its queue together. Each request must take one of a
+fixed number of concurrency slots held in Redis. When none are free, the
+request fails fast with 503 and a jittered Retry-After hint, and the SW backs off
+(see computeBackoffMs in sw.core.js).
+
+Slots are members of a sorted set scored by acquire time, so a worker that
+dies while holding one only leaks it for SLOT_TTL seconds.
+
+Site config (all optional):
+- fsl_admission_slots (default 16)
+- fsl_admission_retry_after (default 5 seconds, before jitter)
+"""
+
+import random
+import secrets
+import time
+from contextlib import contextmanager
+
+import frappe
+
+ADMISSION_PREFIX = "fsl_admission"
+DEFAULT_SLOTS = 16
+DEFAULT_RETRY_AFTER = 5  # seconds
+SLOT_TTL = 60  # seconds; longer than any sane write request
+
+
+class ServerBusyError(frappe.ValidationError):
+    http_status_code = 503
+
+
+class RateLimitedError(frappe.ValidationError):
+    http_status_code = 429
+
+
+def set_retry_after(seconds: int):
+    """Expose a retry hint both as a header (after_request) and in the JSON body."""
+    seconds = max(1, int(seconds))
+    frappe.local.flags.fsl_retry_after = seconds
+    frappe.local.response["retry_after"] = seconds
+
+
+def jittered_retry_after(base: int | None = None) -> int:
+    base = int(base or frappe.conf.get("fsl_admission_retry_after") or DEFAULT_RETRY_AFTER)
+    # spread the retries of a burst over [base, 2 * base]
+    return base + random.randint(0, base)
+
+
+@contextmanager
+def admission_slot(pool: str = "fsl_write", slots: int | None = None):
+    """Hold one concurrency slot of `pool` for the duration of the block, or reject with 503."""
+    limit = int(slots or frappe.conf.get("fsl_admission_slots") or DEFAULT_SLOTS)
+    cache = frappe.cache()
+    key = cache.make_key(f"{ADMISSION_PREFIX}:{pool}")
+    token = secrets.token_hex(8)
+    now = time.time()
+
+    pipe = cache.pipeline()
+    pipe.zremrangebyscore(key, 0, now - SLOT_TTL)
+    pipe.zadd(key, {token: now})
+    pipe.zcard(key)
+    pipe.expire(key, SLOT_TTL)
+    in_use = pipe.execute()[2]
+
+    if in_use > limit:
+        cache.zrem(key, token)
+        set_retry_after(jittered_retry_after())
+        frappe.throw("Server is busy. Please retry shortly.", ServerBusyError)
+
+    try:
+        yield
+    finally:
+        cache.zrem(key, token)
+
+
+def set_retry_after_header(response=None, request=None):
+    """after_request hook: turn the retry hint into a Retry-After header."""
+    seconds = frappe.local.flags.get("fsl_retry_after")
+    if seconds and response is not None:
+        response.headers["Retry-After"] = str(seconds)
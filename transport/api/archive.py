@@ -0,0 +1,35 @@
+import frappe
+
+from transport.archival.store import get_archived_fsl_row
+from transport.utils.replica import replica_read
+
+FSL_DOCTYPE = "Field Service Log"
+
+
+@frappe.whitelist()
+@replica_read
+def get_fsl_by_trip_id(trip_id: str):
+    """
+    Fetch an FSL by trip_id from the hot table or, failing that, FSL Archive.
+
+    Returns {"archived": bool, "fsl": {...}}.
+    """
+    if not trip_id:
+        frappe.throw("trip_id required")
+
+    frappe.has_permission(FSL_DOCTYPE, "read", throw=True)
+
+    name = frappe.db.get_value(FSL_DOCTYPE, {"trip_id": trip_id}, "name")
+    if name:
+        doc = frappe.get_doc(FSL_DOCTYPE, name)
+        doc.check_permission("read")
+        return {"archived": False, "fsl": doc.as_dict()}
+
+    row = get_archived_fsl_row(trip_id)
+    if not row:
+        frappe.throw(f"No Field Service Log found for trip {trip_id}", frappe.DoesNotExistError)
+
+    # same record-level rules (user permissions, if_owner) as the live FSL had
+    archived = frappe.get_doc({**row, "doctype": FSL_DOCTYPE})
+    frappe.has_permission(FSL_DOCTYPE, "read", doc=archived, throw=True)
+    return {"archived": True, "fsl": row}
@@ -0,0 +1,247 @@
+"""
+Dispatcher query API for Field Service Logs.
+
+Pages use keyset pagination on (trip_date, name), newest first. The next page
+starts strictly after the last row's key instead of at an OFFSET, so page 200
+costs the same as page 1. Callers list the columns they need from a fixed
+set. Counts are grouped queries that can be answered from the composite
+indexes on Field Service Log (see on_doctype_update) without reading rows.
+Both endpoints read from the replica when one is configured.
+"""
+
+import base64
+import json
+
+import frappe
+from frappe.utils import cint, getdate, nowdate
+
+from transport.board.events import BOARD_FIELDS, board_rows
+from transport.utils.replica import replica_read
+
+FSL_DOCTYPE = "Field Service Log"
+
+# Roles that see every FSL; override with "fsl_dispatcher_roles" in site_config.json
+DISPATCHER_ROLES = ["System Manager", "Ops Manager", "Finance", "CRM", "Limited Admin"]
+
+PROJECTABLE = frozenset(
+    (
+        "name",
+        "trip_id",
+        "trip_date",
+        "status",
+        "customer",
+        "site",
+        "driver",
+        "qty_or_weight",
+        "package_count",
+        "performed_at",
+        "is_waste_safe",
+        "is_waste_collected",
+        "is_safety_critical",
+        "is_safety_resolved",
+        "needs_review",
+        "gps_lat",
+        "gps_lng",
+        "modified",
+    )
+)
+DEFAULT_FIELDS = ("name", "trip_date", "status", "customer", "driver", "qty_or_weight", "performed_at")
+FLAG_FILTERS = ("is_waste_safe", "is_waste_collected", "is_safety_critical", "is_safety_resolved", "needs_review")
+GROUP_BY = {
+    "status": "f.status",
+    "driver": "f.driver",
+    "trip_date": "f.trip_date",
+    "territory": "d.custom_territory",
+}
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+def encode_cursor(trip_date, name: str) -> str:
+    raw = json.dumps([str(trip_date), name], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        trip_date, name = json.loads(raw)
+        return str(getdate(trip_date)), str(name)
+    except Exception:
+        frappe.throw("Invalid cursor")
+
+
+def parse_fields(fields) -> list[str]:
+    if not fields:
+        return list(DEFAULT_FIELDS)
+    if isinstance(fields, str):
+        fields = frappe.parse_json(fields) if fields.lstrip().startswith("[") else fields.split(",")
+
+    fields = [f.strip() for f in fields if f and f.strip()]
+    unknown = sorted(set(fields) - PROJECTABLE)
+    if unknown:
+        frappe.throw(f"Unknown fields: {', '.join(unknown)}")
+    # the cursor needs both keys
+    for key in ("trip_date", "name"):
+        if key not in fields:
+            fields.append(key)
+    return fields
+
+
+def build_conditions(filters: dict) -> tuple[list[str], dict]:
+    """WHERE clauses (alias f) and params from dispatcher filters."""
+    conditions, params = [], {}
+
+    if filters.get("from_date"):
+        conditions.append("f.trip_date >= %(from_date)s")
+        params["from_date"] = getdate(filters["from_date"])
+    if filters.get("to_date"):
+        conditions.append("f.trip_date <= %(to_date)s")
+        params["to_date"] = getdate(filters["to_date"])
+
+    for key in ("driver", "customer", "status"):
+        if filters.get(key):
+            conditions.append(f"f.{key} = %({key})s")
+            params[key] = filters[key]
+
+    if filters.get("territory"):
+        # Driver is small; the IN list lets (driver, trip_date) drive the scan
+        conditions.append("f.driver IN (SELECT name FROM `tabDriver` WHERE custom_territory = %(territory)s)")
+        params["territory"] = filters["territory"]
+
+    for flag in FLAG_FILTERS:
+        value = filters.get(flag)
+        if value not in (None, ""):
+            conditions.append(f"f.{flag} = %({flag})s")
+            params[flag] = cint(value)
+
+    return conditions, params
+
+
+def build_page_query(filters: dict, fields: list[str], cursor: str | None, limit: int) -> tuple[str, dict]:
+    conditions, params = build_conditions(filters)
+    if cursor:
+        params["cursor_date"], params["cursor_name"] = decode_cursor(cursor)
+        conditions.append(
+            "(f.trip_date < %(cursor_date)s OR (f.trip_date = %(cursor_date)s AND f.name < %(cursor_name)s))"
+        )
+
+    params["limit"] = limit + 1  # one extra row tells us whether there is a next page
+    columns = ", ".join(f"f.`{field}`" for field in fields)
+    where = " AND ".join(conditions) or "1=1"
+    sql = f"""
+        SELECT {columns}
+        FROM `tab{FSL_DOCTYPE}` f
+        WHERE {where}
+        ORDER BY f.trip_date DESC, f.name DESC
+        LIMIT %(limit)s
+    """
+    return sql, params
+
+
+def _check_access():
+    frappe.only_for(frappe.conf.get("fsl_dispatcher_roles") or DISPATCHER_ROLES)
+
+
+@frappe.whitelist()
+@replica_read
+def get_fsl_page(
+    fields=None,
+    cursor=None,
+    limit=DEFAULT_LIMIT,
+    from_date=None,
+    to_date=None,
+    driver=None,
+    customer=None,
+    territory=None,
+    status=None,
+    is_waste_safe=None,
+    is_waste_collected=None,
+    is_safety_critical=None,
+    is_safety_resolved=None,
+    needs_review=None,
+):
+    """
+    One page of FSLs, newest trip_date first.
+
+    Pass the returned `next_cursor` back as `cursor` for the next page;
+    it is None on the last page.
+    """
+    _check_access()
+    filters = {k: v for k, v in locals().items() if k not in ("fields", "cursor", "limit")}
+    limit = max(1, min(cint(limit) or DEFAULT_LIMIT, MAX_LIMIT))
+    fields = parse_fields(fields)
+
+    sql, params = build_page_query(filters, fields, cursor, limit)
+    rows = frappe.db.sql(sql, params, as_dict=True)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].trip_date, rows[-1].name)
+    return {"rows": rows, "next_cursor": next_cursor}
+
+
+@frappe.whitelist()
+@replica_read
+def count_fsls(
+    group_by="status",
+    from_date=None,
+    to_date=None,
+    driver=None,
+    customer=None,
+    territory=None,
+    status=None,
+    is_waste_safe=None,
+    is_waste_collected=None,
+    is_safety_critical=None,
+    is_safety_resolved=None,
+    needs_review=None,
+):
+    """
+    Counts per group_by value (status, driver, trip_date or territory), e.g.
+    today's progress per territory: group_by=territory, from_date=to_date=today.
+    """
+    _check_access()
+    filters = {k: v for k, v in locals().items() if k != "group_by"}
+    if group_by not in GROUP_BY:
+        frappe.throw(f"group_by must be one of {', '.join(GROUP_BY)}")
+    if not (filters.get("from_date") or filters.get("to_date")):
+        frappe.throw("Pass from_date and/or to_date")
+
+    conditions, params = build_conditions(filters)
+    join = "LEFT JOIN `tabDriver` d ON d.name = f.driver" if group_by == "territory" else ""
+    rows = frappe.db.sql(
+        f"""
+        SELECT {GROUP_BY[group_by]} AS `key`, COUNT(*) AS `count`
+        FROM `tab{FSL_DOCTYPE}` f
+        {join}
+        WHERE {" AND ".join(conditions)}
+        GROUP BY {GROUP_BY[group_by]}
+        """,
+        params,
+        as_dict=True,
+    )
+    return {"group_by": group_by, "counts": {str(r.key or ""): r.count for r in rows}, "total": sum(r.count for r in rows)}
+
+
+@frappe.whitelist()
+@replica_read
+def get_board_snapshot(trip_date=None, territory=None):
+    """
+    Starting state of the live board: one compact row per FSL of the day.
+
+    The board then applies `fsl_board_update` events (transport.board.events)
+    and only calls this again after a reconnect.
+    """
+    _check_access()
+    conditions, params = build_conditions({"from_date": trip_date or nowdate(), "to_date": trip_date or nowdate()})
+    if territory:
+        conditions.append("d.custom_territory = %(territory)s")
+        params["territory"] = territory
+    rows = board_rows(" AND ".join(conditions), params)
+    return {
+        "fields": [*BOARD_FIELDS, "territory"],
+        "rows": [[*row, row_territory] for row_territory, row in rows],
+    }
+
@@ -0,0 +1,34 @@
+import frappe
+from frappe.utils import cint, getdate
+
+from transport.exports.fsl_export import parquet_available
+
+FSL_DOCTYPE = "Field Service Log"
+
+
+@frappe.whitelist()
+def start_fsl_export(from_date, to_date, file_format="csv"):
+    """Queue a streaming export; progress arrives on the `fsl_export_progress` realtime event."""
+    frappe.has_permission(FSL_DOCTYPE, "export", throw=True)
+
+    if not from_date or not to_date:
+        frappe.throw("from_date and to_date are required")
+    if getdate(from_date) > getdate(to_date):
+        frappe.throw("from_date must be on or before to_date")
+
+    file_format = (file_format or "csv").lower()
+    if file_format not in ("csv", "parquet"):
+        frappe.throw("file_format must be csv or parquet")
+    if file_format == "parquet" and not parquet_available():
+        frappe.throw("Parquet export needs pyarrow installed on the server")
+
+    job = frappe.enqueue(
+        "transport.exports.fsl_export.export_fsl_range",
+        queue="long",
+        timeout=cint(frappe.conf.get("fsl_export_timeout")) or 3600,
+        from_date=from_date,
+        to_date=to_date,
+        file_format=file_format,
+        user=frappe.session.user,
+    )
+    return {"queued": True, "job_id": getattr(job, "id", None)}
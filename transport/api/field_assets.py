@@ -0,0 +1,87 @@
+"""
+Content-hashed precache manifest for the /field/fsl shell.
+
+get_asset_manifest lists every static asset of the field page with a hash of
+its content. The service worker diffs it against the manifest of its current
+cache and downloads only the entries whose hash changed (see sw.js,
+syncAssets). Assets requested as `<url>?v=<hash>` with the current hash get a
+one-year immutable Cache-Control header; any other request for them keeps the
+default, so a plain URL never serves stale code.
+
+The manifest is rebuilt when an asset file changes (mtime), e.g. after
+`bench update`.
+"""
+
+import hashlib
+import os
+
+import frappe
+
+ASSET_ROOT = ("www", "field", "fsl")
+URL_PREFIX = "/field/fsl/"
+
+# sw.js is not listed: the browser checks it for updates byte by byte
+ASSETS = (
+    "fsl.css",
+    "fsl.js",
+    "fsl.logic.js",
+    "fsl.messages.js",
+    "fsl.request.js",
+    "fsl.queue.js",
+    "register-sw.js",
+    "sw.core.js",
+    "manifest.json",
+    "icons/icon-192.png",
+)
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+HASH_LENGTH = 16
+
+_cached = {}  # {"key": mtimes, "manifest": {...}}
+
+
+def _paths() -> dict:
+    root = frappe.get_app_path("transport", *ASSET_ROOT)
+    return {URL_PREFIX + name: os.path.join(root, *name.split("/")) for name in ASSETS}
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:HASH_LENGTH]
+
+
+def build_manifest() -> dict:
+    """{"version": ..., "assets": {url: {"hash", "bytes"}}}; cached until a file changes."""
+    paths = _paths()
+    key = tuple(os.stat(p).st_mtime_ns for p in paths.values())
+    if _cached.get("key") == key:
+        return _cached["manifest"]
+
+    assets = {url: {"hash": _file_hash(path), "bytes": os.path.getsize(path)} for url, path in paths.items()}
+    digest = hashlib.sha256("\n".join(f"{url} {a['hash']}" for url, a in sorted(assets.items())).encode())
+    manifest = {"version": digest.hexdigest()[:HASH_LENGTH], "assets": assets}
+    _cached.update(key=key, manifest=manifest)
+    return manifest
+
+
+def versioned_urls() -> dict:
+    """{"fsl.js": "/field/fsl/fsl.js?v=<hash>", ...} for the page template."""
+    assets = build_manifest()["assets"]
+    return {url[len(URL_PREFIX) :]: f"{url}?v={a['hash']}" for url, a in assets.items()}
+
+
+@frappe.whitelist(allow_guest=True, methods=["GET"])
+def get_asset_manifest():
+    return build_manifest()
+
+
+def set_asset_cache_headers(response=None, request=None):
+    """after_request hook: long-lived caching for current, hash-versioned asset URLs."""
+    if response is None or request is None or not request.path.startswith(URL_PREFIX):
+        return
+    version = request.args.get("v")
+    if not version or response.status_code != 200:
+        return
+    asset = build_manifest()["assets"].get(request.path)
+    if asset and asset["hash"] == version:
+        response.headers["Cache-Control"] = IMMUTABLE
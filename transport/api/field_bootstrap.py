@@ -0,0 +1,105 @@
+import json
+
+import frappe
+from frappe.sessions import get_csrf_token
+from frappe.utils import now_datetime, nowdate
+
+from transport.api.trips import get_trips_for_driver
+
+BOOTSTRAP_CACHE_PREFIX = "fsl_bootstrap"
+BOOTSTRAP_CACHE_TTL = 5 * 60  # seconds
+
+# Defaults mirror the constants in www/field/fsl/sw.js; override with
+# "fsl_queue_policy" in site_config.json.
+DEFAULT_QUEUE_POLICY = {
+    "max_retries": 3,
+    "max_queue_age_ms": 30 * 24 * 60 * 60 * 1000,
+    "max_queue_items": 10,
+    "max_items_per_flush": 10,
+}
+
+
+def get_queue_policy() -> dict:
+    return {**DEFAULT_QUEUE_POLICY, **(frappe.conf.get("fsl_queue_policy") or {})}
+
+
+def _cache_key(user: str) -> str:
+    return f"{BOOTSTRAP_CACHE_PREFIX}:{user}:{nowdate()}"
+
+
+def _load_user_state(user: str) -> dict:
+    """Driver profile + today's trips for a user (the cacheable part)."""
+    driver = frappe.db.get_value(
+        "Driver",
+        {"custom_user_id": user},
+        ["name", "custom_driver_canonical_id"],
+        as_dict=True,
+    )
+    if not driver:
+        return {"driver": None, "error": "NO_DRIVER", "trips": None}
+    if not driver.custom_driver_canonical_id:
+        return {"driver": None, "error": "NO_CANONICAL_ID", "trips": None}
+
+    return {
+        "driver": driver,
+        "error": None,
+        "trips": get_trips_for_driver(driver.name),
+    }
+
+
+def build_field_bootstrap(user: str | None = None) -> dict:
+    """
+    Everything /field/fsl needs to start working, in one payload:
+    driver profile, fresh CSRF token, today's trips and the offline queue policy.
+    """
+    user = user or frappe.session.user
+    if user == "Guest":
+        return {"driver": None, "error": "NOT_LOGGED_IN"}
+
+    cache = frappe.cache()
+    state = cache.get_value(_cache_key(user))
+    if state is None:
+        state = _load_user_state(user)
+        cache.set_value(_cache_key(user), state, expires_in_sec=BOOTSTRAP_CACHE_TTL)
+
+    return {
+        **state,
+        # CSRF is per session, never cached per user
+        "csrf_token": get_csrf_token(),
+        "queue_policy": get_queue_policy(),
+        "generated_at": int(now_datetime().timestamp() * 1000),
+    }
+
+
+def bootstrap_json(data: dict) -> str:
+    """JSON that is safe to inline in a <script type="application/json"> block."""
+    return (
+        json.dumps(data, default=str, ensure_ascii=False, separators=(",", ":"))
+        .replace("<", "\\u003c")
+        .replace(">", "\\u003e")
+        .replace("&", "\\u0026")
+    )
+
+
+def clear_field_bootstrap_cache(user: str | None = None):
+    """Drop cached bootstrap state for one user, or for everyone."""
+    cache = frappe.cache()
+    if user:
+        cache.delete_value(_cache_key(user))
+    else:
+        cache.delete_keys(f"{BOOTSTRAP_CACHE_PREFIX}:")
+
+
+def on_driver_update(doc, method=None):
+    """Driver.on_update: profile changed, rebuild the linked user's bootstrap."""
+    if doc.get("custom_user_id"):
+        clear_field_bootstrap_cache(doc.custom_user_id)
+
+
+@frappe.whitelist()
+def get_field_bootstrap():
+    """Same payload the page embeds; lets an open page refresh without a reload."""
+    if frappe.session.user == "Guest":
+        frappe.local.response["http_status_code"] = 403
+        frappe.throw("Not logged in")
+    return build_field_bootstrap()
@@ -0,0 +1,40 @@
+import gzip
+
+import frappe
+from frappe.utils import cint
+from werkzeug.wrappers import Response
+
+from transport.directory.snapshot import get_update
+
+
+def _driver_territory() -> str | None:
+    return frappe.db.get_value("Driver", {"custom_user_id": frappe.session.user}, "custom_territory")
+
+
+@frappe.whitelist(methods=["GET"])
+def get_field_directory(since=None):
+    """
+    Customers and sites of the driver's territory for offline QR lookups.
+
+    `since` is the version the device holds; the reply is a delta, a full
+    snapshot or {"unchanged": true} (see transport.directory.snapshot).
+    The body is stored gzipped and sent as-is to clients that accept gzip.
+    """
+    if frappe.session.user == "Guest":
+        frappe.local.response["http_status_code"] = 403
+        frappe.throw("Not logged in")
+
+    territory = _driver_territory()
+    if not territory:
+        return {"territory": None}
+
+    body = get_update(territory, cint(since) or None)
+    response = Response(content_type="application/json")
+    if "gzip" in (frappe.get_request_header("Accept-Encoding") or ""):
+        response.set_data(body)
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response.set_data(gzip.decompress(body))
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
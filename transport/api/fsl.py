@@ -1,14 +1,37 @@
 import json
 import hashlib
+from datetime import datetime
+
 import frappe
-from frappe.utils import get_datetime, nowdate
+from frappe.utils import cint, flt, get_datetime, getdate, nowdate
 
 
 from transport.field_auth.qr import verify_customer_token
 from transport.field_auth.driver import get_driver_by_canonical_id
+from transport.api.fsl_schema import parse_payload
+from transport.api.admission import RateLimitedError, admission_slot, set_retry_after
+from transport.board.events import stage_changes
+from transport.finalization.bulk import finalize_where, missing_service_type, run_finalize_hooks
+from transport.stats.weights import flag_weight
+from transport.tracing.spans import now_ms, record_trace
 
 FSL_DOCTYPE = "Field Service Log"
 
+class StaleWriteError(frappe.ValidationError):
+    """The write was captured before the stored one (e.g. an old offline replay)."""
+
+    http_status_code = 409
+
+
+class FullPayloadRequired(frappe.ValidationError):
+    """A patch (base_version) arrived for a draft that does not exist yet."""
+
+    http_status_code = 409
+
+
+# Roles allowed to bulk-finalize; override with "fsl_supervisor_roles" in site_config.json
+SUPERVISOR_ROLES = ["System Manager", "Ops Manager"]
+
 ALLOWED_FIELDS = {
     "qty_or_weight",
     "photo",
@@ -31,26 +54,9 @@ ALLOWED_FIELDS = {
 # ------------------------------
 
 
-def _parse_payload(payload_json: str) -> dict:
-    """Parse JSON payload and keep only whitelisted fields."""
-    data = json.loads(payload_json or "{}")
-    if not isinstance(data, dict):
-        return {}
-
-    out = {k: v for k, v in data.items() if k in ALLOWED_FIELDS}
-
-    ts = out.get("performed_at")
-    if ts:
-        try:
-            dt = get_datetime(ts)
-            # strip timezone info; store naive server time
-            if getattr(dt, "tzinfo", None):
-                dt = dt.replace(tzinfo=None)
-            out["performed_at"] = dt
-        except Exception:
-            frappe.throw("Invalid datetime format")
-
-    return out
+def _parse_payload(payload_json) -> dict:
+    """Decode the payload and coerce whitelisted fields (see fsl_schema); raises PayloadError."""
+    return parse_payload(payload_json, ALLOWED_FIELDS)
 
 
 def _make_trip_id(customer: str, driver_canonical_id: str, trip_date: str) -> str:
@@ -62,7 +68,7 @@ def _make_trip_id(customer: str, driver_canonical_id: str, trip_date: str) -> st
 def _rate_limit(key: str, limit: int = 10, window_sec: int = 60):
     """
     Per-key rate limiting using frappe.cache() (Redis in prod).
-    Counter with TTL=window_sec. If counter > limit -> HTTP 429.
+    Counter with TTL=window_sec. If counter > limit -> HTTP 429 + Retry-After.
     """
     cache = frappe.cache()
     cache_key = f"rl:{key}"
@@ -80,8 +86,12 @@ def _rate_limit(key: str, limit: int = 10, window_sec: int = 60):
         pass
 
     if n > limit:
-        frappe.local.response["http_status_code"] = 429
-        frappe.throw("Too many requests. Please wait and try again.")
+        try:
+            ttl = cache.ttl(cache_key)
+        except Exception:
+            ttl = None
+        set_retry_after(ttl if ttl and ttl > 0 else window_sec)
+        frappe.throw("Too many requests. Please wait and try again.", RateLimitedError)
 
 
 def _assert_same_driver(doc, driver_canonical_id: str):
@@ -119,7 +129,7 @@ def _create_draft(
     trip_id: str,
     customer: str,
     driver_canonical_id: str,
-    payload_json: str,
+    payload: dict,
 ):
     """
     Create draft FSL.
@@ -128,8 +138,6 @@ def _create_draft(
     - driver is stored as canonical id (which is also Driver.name).
     - qr_token is not stored.
     """
-    payload = _parse_payload(payload_json)
-
     doc_dict = {
         "doctype": FSL_DOCTYPE,
         "trip_id": trip_id,
@@ -144,39 +152,84 @@ def _create_draft(
         doc_dict["trip_date"] = nowdate()
 
     doc = frappe.get_doc(doc_dict)
+    doc.fsl_version = 1
+    flag_weight(doc)
     doc.insert(ignore_permissions=True, ignore_mandatory=True)
     frappe.db.commit()
     return doc
 
 
+def _same_value(stored, incoming) -> bool:
+    if stored in (None, "") or incoming in (None, ""):
+        return stored in (None, "") and incoming in (None, "")
+    if isinstance(incoming, datetime):
+        return get_datetime(stored) == incoming
+    if isinstance(incoming, int | float):
+        return flt(stored) == flt(incoming)
+    return str(stored) == str(incoming)
+
+
+def _changed_fields(doc, payload: dict) -> dict:
+    """Payload fields whose value differs from the stored one (performed_at is only an ordering key)."""
+    return {
+        key: value
+        for key, value in payload.items()
+        if key != "performed_at" and not _same_value(doc.get(key), value)
+    }
+
+
+def _is_stale(doc, payload: dict) -> bool:
+    incoming = payload.get("performed_at")
+    return bool(incoming and doc.performed_at and incoming < get_datetime(doc.performed_at))
+
+
 def _update_draft(
     existing_name: str,
     driver_canonical_id: str,
-    payload_json: str,
+    payload: dict,
 ):
     """
     Update an existing draft FSL.
 
     - Does NOT change customer or driver.
-    - Only updates payload fields.
+    - Only updates payload fields; a payload that changes nothing is not written.
+    - Rejects payloads captured before the stored performed_at (StaleWriteError).
     - Enforces same-driver and Draft status.
+
+    Returns (doc, written).
     """
-    doc = frappe.get_doc(FSL_DOCTYPE, existing_name)
+    doc = frappe.get_doc(FSL_DOCTYPE, existing_name, for_update=True)
 
     if doc.status != "Draft":
         frappe.throw("Only Draft can be edited")
 
     _assert_same_driver(doc, driver_canonical_id)
 
-    patch = _parse_payload(payload_json)
-    doc.update(patch)
+    if _is_stale(doc, payload):
+        frappe.throw(
+            f"FSL {doc.name} already has newer data (version {doc.fsl_version})",
+            StaleWriteError,
+        )
+
+    changes = _changed_fields(doc, payload)
+    if not changes:
+        frappe.db.rollback()  # release the row lock; nothing to write
+        return doc, False
+
+    doc.update(changes)
+    if payload.get("performed_at"):
+        doc.performed_at = payload["performed_at"]
+    doc.fsl_version = cint(doc.fsl_version) + 1
 
     if doc.meta.get_field("trip_date"):
         doc.trip_date = nowdate()
 
+    if "qty_or_weight" in changes:
+        flag_weight(doc)
+
     doc.save(ignore_permissions=True)
     frappe.db.commit()
-    return doc
+    return doc, True
 
 
 # ------------------------------
@@ -185,24 +238,42 @@ def _update_draft(
 
 
 @frappe.whitelist(allow_guest=True)
-def upsert_draft_fsl(qr_token: str, driver_canonical_id: str, payload_json: str = "{}"):
+def upsert_draft_fsl(
+    qr_token: str,
+    driver_canonical_id: str,
+    payload_json: str = "{}",
+    trace_json: str | None = None,
+    base_version: int | None = None,
+):
     """
     Upsert a draft FSL for (customer, driver, day).
 
     - qr_token: signed token bound to a Customer (via verify_customer_token)
     - driver_canonical_id: canonical id of Driver (also its name)
     - payload_json: JSON with allowed fields
+    - trace_json: optional client latency trace (see transport.tracing.spans)
+    - base_version: set when payload_json is a patch, i.e. only the fields
+      changed since the client's last acknowledged `version`
 
     Server computes trip_id from (customer + driver + day).
     If trip exists -> update; else -> create.
     qr_token is only used for verification and is NOT stored.
+
+    Patches made on an older version are merged field by field; writes whose
+    performed_at is older than the stored one are rejected (409,
+    StaleWriteError). A patch for a trip with no draft yet gets 409,
+    FullPayloadRequired, and the client resends the whole payload.
     """
-    
+    accepted_ms = now_ms()
+
     if not qr_token:
         frappe.throw("qr_token required")
     if not driver_canonical_id:
         frappe.throw("driver_canonical_id required")
 
+    # Reject malformed payloads before any DB access
+    payload = _parse_payload(payload_json)
+
     # Validate driver exists (name == canonical id)
     if not get_driver_by_canonical_id(driver_canonical_id):
         frappe.throw("Driver with this ID doesn't exist!")
@@ -223,35 +294,65 @@ def upsert_draft_fsl(qr_token: str, driver_canonical_id: str, payload_json: str
         window_sec=60,
     )
 
-    existing = frappe.db.get_value(FSL_DOCTYPE, {"trip_id": trip_id}, "name")
-    if existing:
-        doc = _update_draft(
-            existing_name=existing,
+    # bounded concurrency for fleet-wide reconnect bursts (503 + Retry-After)
+    with admission_slot("fsl_write"):
+        existing = frappe.db.get_value(FSL_DOCTYPE, {"trip_id": trip_id}, "name")
+        if existing:
+            doc, written = _update_draft(
+                existing_name=existing,
+                driver_canonical_id=driver_canonical_id,
+                payload=payload,
+            )
+            if written:
+                stage_changes([doc.name])
+            if trace_json:
+                record_trace(
+                    trace_json,
+                    fsl=doc.name,
+                    driver=driver_canonical_id,
+                    mode="edit" if written else "unchanged",
+                    accepted_ms=accepted_ms,
+                    committed_ms=now_ms(),
+                )
+            return {
+                "ok": True,
+                "mode": "edit" if written else "unchanged",
+                "name": doc.name,
+                "trip_id": trip_id,
+                "trip_date": trip_date,
+                "version": cint(doc.fsl_version),
+                "weight_outlier": bool(doc.weight_outlier),
+            }
+
+        if base_version is not None and str(base_version) != "":
+            frappe.throw("No draft for this trip yet; send the full payload", FullPayloadRequired)
+
+        doc = _create_draft(
+            trip_id=trip_id,
+            customer=customer,
             driver_canonical_id=driver_canonical_id,
-            payload_json=payload_json,
+            payload=payload,
         )
+        stage_changes([doc.name])
+        if trace_json:
+            record_trace(
+                trace_json,
+                fsl=doc.name,
+                driver=driver_canonical_id,
+                mode="created",
+                accepted_ms=accepted_ms,
+                committed_ms=now_ms(),
+            )
         return {
             "ok": True,
-            "mode": "edit",
+            "mode": "created",
             "name": doc.name,
             "trip_id": trip_id,
             "trip_date": trip_date,
+            "version": cint(doc.fsl_version),
+            "weight_outlier": bool(doc.weight_outlier),
         }
 
-    doc = _create_draft(
-        trip_id=trip_id,
-        customer=customer,
-        driver_canonical_id=driver_canonical_id,
-        payload_json=payload_json,
-    )
-    return {
-        "ok": True,
-        "mode": "created",
-        "name": doc.name,
-        "trip_id": trip_id,
-        "trip_date": trip_date,
-    }
-
 
 @frappe.whitelist(allow_guest=True)
 def finalize_fsl(fsl_name: str, driver_canonical_id: str):
@@ -264,20 +365,53 @@ def finalize_fsl(fsl_name: str, driver_canonical_id: str):
     # Validate driver exists (mainly for clearer errors)
     get_driver_by_canonical_id(driver_canonical_id)
 
-    doc = frappe.get_doc(FSL_DOCTYPE, fsl_name)
-    if doc.status != "Draft":
-        frappe.throw("Already finalized")
+    with admission_slot("fsl_write"):
+        doc = frappe.get_doc(FSL_DOCTYPE, fsl_name)
+        if doc.status != "Draft":
+            frappe.throw("Already finalized")
 
-    _assert_same_driver(doc, driver_canonical_id)
+        _assert_same_driver(doc, driver_canonical_id)
 
-    if not getattr(doc, "service_type", None):
-        frappe.throw("Service type required")
+        if missing_service_type(doc):
+            frappe.throw("Service type required")
 
-    doc.status = "Final"
-    doc.save(ignore_permissions=True)
-    frappe.db.commit()
+        doc.status = "Final"
+        doc.save(ignore_permissions=True)
+        run_finalize_hooks([doc.name])
+        frappe.db.commit()
+
+        return {"ok": True, "name": doc.name, "status": doc.status}
 
-    return {"ok": True, "name": doc.name, "status": doc.status}
+
+@frappe.whitelist()
+def bulk_finalize_fsl(trip_date=None, territory=None, driver=None):
+    """
+    Finalize every Draft FSL matching the filters (supervisors only).
+
+    - trip_date: day of the trips
+    - territory: Driver.custom_territory of the FSL's driver
+    - driver: Driver name (== canonical id)
+
+    Drafts failing the finalize_fsl checks (driver, service type) are left as
+    Draft and returned in `skipped`.
+    """
+    frappe.only_for(frappe.conf.get("fsl_supervisor_roles") or SUPERVISOR_ROLES)
+
+    if not (trip_date or territory or driver):
+        frappe.throw("Pass at least one of trip_date, territory or driver")
+
+    conditions, params = [], {}
+    if trip_date:
+        conditions.append("f.trip_date = %(trip_date)s")
+        params["trip_date"] = getdate(trip_date)
+    if territory:
+        conditions.append("d.custom_territory = %(territory)s")
+        params["territory"] = territory
+    if driver:
+        conditions.append("f.driver = %(driver)s")
+        params["driver"] = driver
+
+    return {"ok": True, **finalize_where(" AND ".join(conditions), params)}
 
 
 @frappe.whitelist()
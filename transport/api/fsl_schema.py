@@ -0,0 +1,226 @@
+"""
+Compiled payload schema for the FSL write endpoints.
+
+The schema is built once per process from the Field Service Log meta, limited
+to the fields the client may send. It is rebuilt when the DocType changes.
+Each field gets a parser for its fieldtype, so a bad value is rejected before
+the endpoint touches the database. Unknown keys are dropped, as before.
+
+orjson is used to decode the payload when it is installed; otherwise json.
+"""
+
+import json
+import math
+from datetime import datetime
+
+import frappe
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+FSL_DOCTYPE = "Field Service Log"
+
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩\u066b", "01234567890123456789.")  # \u066b: Arabic decimal separator
+_TRUE = frozenset(("1", "true", "yes", "on"))
+_FALSE = frozenset(("0", "false", "no", "off", ""))
+
+_DATA_LENGTH = 140  # varchar(140), Frappe's default for Data/Link
+
+_compiled = {}  # (site, meta.modified, fields) -> {fieldname: parser}
+
+
+class PayloadError(frappe.ValidationError):
+    pass
+
+
+class _Invalid(ValueError):
+    pass
+
+
+def loads(raw):
+    """Decode a JSON payload string (orjson when available)."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+# ------------------------------
+# Type-specific parsers
+# ------------------------------
+
+
+def _number_text(value: str) -> str:
+    return value.strip().translate(_DIGITS).replace(",", "")
+
+
+def _to_float(value, df):
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise _Invalid("must be a number")
+    if isinstance(value, int | float):
+        out = float(value)
+    elif isinstance(value, str):
+        try:
+            out = float(_number_text(value))
+        except ValueError:
+            raise _Invalid("must be a number")
+    else:
+        raise _Invalid("must be a number")
+
+    if not math.isfinite(out):
+        raise _Invalid("must be a finite number")
+    if df.non_negative and out < 0:
+        raise _Invalid("must not be negative")
+    return out
+
+
+def _to_int(value, df):
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise _Invalid("must be a whole number")
+    if isinstance(value, int):
+        out = value
+    elif isinstance(value, float) and value.is_integer():
+        out = int(value)
+    elif isinstance(value, str):
+        try:
+            out = int(_number_text(value))
+        except ValueError:
+            raise _Invalid("must be a whole number")
+    else:
+        raise _Invalid("must be a whole number")
+
+    if df.non_negative and out < 0:
+        raise _Invalid("must not be negative")
+    return out
+
+
+def _to_check(value, df):
+    if value is None or isinstance(value, bool):
+        return 1 if value else 0
+    if isinstance(value, int | float) and value in (0, 1):
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return 1
+        if text in _FALSE:
+            return 0
+    raise _Invalid("must be 0/1 or true/false")
+
+
+def _to_datetime(value, df):
+    if value is None or value == "":
+        return None
+    if not isinstance(value, str):
+        raise _Invalid("must be an ISO 8601 datetime")
+
+    text = value.strip()
+    if text.endswith(("Z", "z")):
+        text = text[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(text)
+    except ValueError:
+        raise _Invalid("must be an ISO 8601 datetime")
+    # strip timezone info; store naive server time (same as before)
+    return dt.replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def _to_text(value, df):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, str | int | float):
+        raise _Invalid("must be text")
+    out = value if isinstance(value, str) else str(value)
+    if df.length and len(out) > df.length:
+        raise _Invalid(f"must be at most {df.length} characters")
+    return out
+
+
+def _to_select(value, df):
+    out = _to_text(value, df)
+    if out and out not in df.options:
+        raise _Invalid(f"must be one of {', '.join(df.options)}")
+    return out
+
+
+_PARSERS = {
+    "Float": _to_float,
+    "Currency": _to_float,
+    "Percent": _to_float,
+    "Int": _to_int,
+    "Check": _to_check,
+    "Datetime": _to_datetime,
+    "Select": _to_select,
+}
+_LIMITED_TEXT = {"Data", "Link"}  # Attach/Attach Image are text columns
+
+
+# ------------------------------
+# Compilation
+# ------------------------------
+
+
+def _compile(meta, fieldnames) -> dict:
+    schema = {}
+    for fieldname in fieldnames:
+        df = meta.get_field(fieldname)
+        if not df:
+            continue  # allowed but not on this DocType: dropped like any unknown key
+
+        spec = frappe._dict(
+            non_negative=bool(df.get("non_negative")),
+            length=(df.length or _DATA_LENGTH) if df.fieldtype in _LIMITED_TEXT else None,
+            options=[o for o in (df.options or "").split("\n") if o] if df.fieldtype == "Select" else [],
+        )
+        parser = _PARSERS.get(df.fieldtype, _to_text)
+        schema[fieldname] = (parser, spec)
+    return schema
+
+
+def get_schema(allowed_fields) -> dict:
+    """{fieldname: (parser, spec)} for `allowed_fields`, compiled once per DocType version."""
+    meta = frappe.get_meta(FSL_DOCTYPE)
+    key = (frappe.local.site, str(meta.modified), frozenset(allowed_fields))
+    schema = _compiled.get(key)
+    if schema is None:
+        schema = _compiled[key] = _compile(meta, sorted(allowed_fields))
+    return schema
+
+
+def parse_payload(payload_json, allowed_fields) -> dict:
+    """
+    Decode, filter and coerce an FSL payload.
+
+    Every field error is collected and raised together as PayloadError.
+    """
+    if isinstance(payload_json, dict):
+        data = payload_json
+    else:
+        try:
+            data = loads(payload_json or "{}")
+        except ValueError:
+            frappe.throw("payload_json is not valid JSON", PayloadError)
+
+    if not isinstance(data, dict):
+        return {}
+
+    schema = get_schema(allowed_fields)
+    out, errors = {}, []
+    for key, value in data.items():
+        compiled = schema.get(key)
+        if compiled is None:
+            continue
+        parser, spec = compiled
+        try:
+            out[key] = parser(value, spec)
+        except _Invalid as e:
+            errors.append(f"{key} {e}")
+
+    if errors:
+        frappe.throw("Invalid payload: " + "; ".join(errors), PayloadError)
+    return out
@@ -0,0 +1,24 @@
+import frappe
+from frappe.utils import cint, getdate
+
+MANIFEST_DOCTYPE = "Waste Manifest"
+
+
+@frappe.whitelist()
+def start_manifest_render(manifest_date, zip_output=0):
+    """Queue rendering of a day's manifests; progress arrives on `manifest_render_progress`."""
+    frappe.has_permission(MANIFEST_DOCTYPE, "create", throw=True)
+    if not manifest_date:
+        frappe.throw("manifest_date is required")
+
+    job = frappe.enqueue(
+        "transport.manifests.jobs.render_daily_manifests",
+        queue="long",
+        timeout=cint(frappe.conf.get("manifest_render_timeout")) or 3600,
+        job_id=f"waste-manifests-{getdate(manifest_date)}",
+        deduplicate=True,
+        manifest_date=str(getdate(manifest_date)),
+        zip_output=bool(cint(zip_output)),
+        user=frappe.session.user,
+    )
+    return {"queued": bool(job), "job_id": getattr(job, "id", None)}
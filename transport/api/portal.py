@@ -0,0 +1,45 @@
+import frappe
+from werkzeug.wrappers import Response
+
+from transport.manifests.render import thumbnail_jpeg
+from transport.portal.history import FSL_DOCTYPE, PHOTO_FIELDS, get_history_page, resolve_customer
+from transport.utils.files import local_file_path
+
+THUMBNAIL_CACHE_SECONDS = 24 * 3600
+
+
+@frappe.whitelist(methods=["GET"])
+def get_pickup_history(customer=None, after=None):
+    """
+    One page of the logged-in portal customer's collected pickups, newest first.
+
+    `after` is the `next` cursor of the previous page; `next` is None on the
+    last page. See transport.portal.history.
+    """
+    return get_history_page(resolve_customer(frappe.session.user, customer), after)
+
+
+@frappe.whitelist(methods=["GET"])
+def get_pickup_photo(fsl, field="photo"):
+    """Thumbnail of a Final FSL's photo for the customer it belongs to (the files are private)."""
+    if field not in PHOTO_FIELDS:
+        frappe.throw("Unknown photo field")
+
+    row = frappe.db.get_value(FSL_DOCTYPE, {"name": fsl, "status": "Final"}, ["customer", field], as_dict=True)
+    if not row or not row.get(field):
+        raise frappe.DoesNotExistError
+    resolve_customer(frappe.session.user, row.customer)
+
+    # Final photos never change: cache the downscaled bytes, not the original
+    key = f"fsl_portal:thumb:{fsl}:{field}"
+    jpeg = frappe.cache().get_value(key)
+    if jpeg is None:
+        path = local_file_path(row[field])
+        jpeg = thumbnail_jpeg(path) if path else None
+        if jpeg is None:
+            raise frappe.DoesNotExistError
+        frappe.cache().set_value(key, jpeg, expires_in_sec=THUMBNAIL_CACHE_SECONDS)
+
+    response = Response(jpeg, content_type="image/jpeg")
+    response.headers["Cache-Control"] = f"private, max-age={THUMBNAIL_CACHE_SECONDS}"
+    return response
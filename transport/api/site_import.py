@@ -0,0 +1,27 @@
+import frappe
+from frappe.utils import cint
+
+SITE_DOCTYPE = "Customer Site"
+
+
+@frappe.whitelist(methods=["POST"])
+def start_customer_site_import(file_url, dry_run=1, allow_near_duplicates=0):
+    """Queue a bulk Customer Site import; the result arrives on `customer_site_import_done`."""
+    frappe.has_permission(SITE_DOCTYPE, "create", throw=True)
+    if not file_url or not frappe.db.exists("File", {"file_url": file_url}):
+        frappe.throw("Attach a CSV file first")
+    # the job reads the file as this user and echoes rows back in its report
+    frappe.get_doc("File", {"file_url": file_url}).check_permission("read")
+
+    job = frappe.enqueue(
+        "transport.sites.importer.import_sites_job",
+        queue="long",
+        timeout=1800,
+        job_id=f"customer-site-import-{file_url}",
+        deduplicate=True,
+        file_url=file_url,
+        dry_run=bool(cint(dry_run)),
+        allow_near_duplicates=bool(cint(allow_near_duplicates)),
+        user=frappe.session.user,
+    )
+    return {"queued": bool(job), "job_id": getattr(job, "id", None)}
@@ -0,0 +1,90 @@
+"""
+GPS breadcrumb endpoints.
+
+The field page batches points and posts them to ingest_track. The wire format
+is described in transport.tracking.codec. Supervisors read a time range back
+with get_driver_track, e.g. to render a map for a billing dispute.
+
+Site config (all optional):
+- fsl_track_max_points (default 20000 per request)
+- fsl_track_max_age_hours (default 72; older points are dropped)
+"""
+
+import time
+
+import frappe
+import numpy as np
+from frappe.utils import cint
+
+from transport.api.admission import admission_slot
+from transport.api.trips import _get_session_driver
+from transport.tracking.codec import COORD_SCALE, TrackPayloadError, decode_wire
+from transport.tracking.store import TRACK_DOCTYPE, append_points, load_series, path_length_km, to_epoch
+from transport.utils.replica import replica_read
+
+FUTURE_TOLERANCE = 300  # seconds of device clock skew accepted
+MAX_RANGE_DAYS = 7
+
+
+@frappe.whitelist()
+def ingest_track(segments=None, data=None, encoding="json"):
+    """
+    Store a batch of breadcrumbs for the logged-in driver.
+
+    Points outside the accepted time window or off the map are dropped and counted.
+    """
+    driver = _get_session_driver()
+    t, lat, lng = decode_wire(segments, data, encoding or "json")
+
+    max_points = cint(frappe.conf.get("fsl_track_max_points")) or 20000
+    if len(t) > max_points:
+        frappe.throw(f"Too many points in one request (max {max_points})", TrackPayloadError)
+
+    now = int(time.time())
+    max_age = (cint(frappe.conf.get("fsl_track_max_age_hours")) or 72) * 3600
+    keep = (
+        (t >= now - max_age)
+        & (t <= now + FUTURE_TOLERANCE)
+        & (np.abs(lat) <= 90 * COORD_SCALE)
+        & (np.abs(lng) <= 180 * COORD_SCALE)
+    )
+
+    with admission_slot("fsl_write"):
+        stored = append_points(driver, t[keep], lat[keep], lng[keep])
+        frappe.db.commit()
+
+    return {"ok": True, "stored": stored, "dropped": int(len(t) - stored)}
+
+
+@frappe.whitelist()
+@replica_read
+def get_driver_track(driver, start, end, max_points=2000):
+    """
+    Breadcrumbs of `driver` between start and end (datetimes in system time or Unix seconds).
+
+    Long ranges are thinned to about max_points for rendering; distance_km is
+    computed on the full series.
+    """
+    frappe.has_permission(TRACK_DOCTYPE, "read", throw=True)
+
+    start, end = to_epoch(start), to_epoch(end)
+    if end < start:
+        frappe.throw("end must be after start")
+    if end - start > MAX_RANGE_DAYS * 86400:
+        frappe.throw(f"Range is limited to {MAX_RANGE_DAYS} days")
+
+    series = load_series(driver, start, end)
+    total = len(series.t)
+    step = max(1, -(-total // max(1, cint(max_points))))
+    idx = np.arange(0, total, step)
+    if total and idx[-1] != total - 1:
+        idx = np.append(idx, total - 1)  # always end on the last fix
+
+    return {
+        "driver": driver,
+        "points": total,
+        "distance_km": round(path_length_km(series.lat, series.lng), 3),
+        "t": series.t[idx].tolist(),
+        "lat": series.lat[idx].round(5).tolist(),
+        "lng": series.lng[idx].round(5).tolist(),
+    }
@@ -0,0 +1,50 @@
+import json
+
+import frappe
+from frappe.utils import getdate, nowdate
+
+from transport.utils.replica import replica_read
+
+ROUTE_PLAN_DOCTYPE = "Driver Route Plan"
+
+
+def _get_session_driver() -> str:
+    user = frappe.session.user
+    if user == "Guest":
+        frappe.local.response["http_status_code"] = 403
+        frappe.throw("Not logged in")
+
+    driver = frappe.db.get_value("Driver", {"custom_user_id": user}, "name")
+    if not driver:
+        frappe.throw("No Driver linked to this user")
+    return driver
+
+
+def get_trips_for_driver(driver: str, plan_date=None) -> dict:
+    """Ordered stop list planned for a driver (see transport.routing.fleet)."""
+    plan_date = getdate(plan_date or nowdate())
+    plan = frappe.db.get_value(
+        ROUTE_PLAN_DOCTYPE,
+        {"driver": driver, "plan_date": plan_date},
+        ["name", "total_distance_km", "stops"],
+        as_dict=True,
+    )
+
+    return {
+        "driver": driver,
+        "plan_date": str(plan_date),
+        "plan": plan.name if plan else None,
+        "total_distance_km": plan.total_distance_km if plan else 0,
+        "stops": json.loads(plan.stops or "[]") if plan else [],
+    }
+
+
+@frappe.whitelist()
+@replica_read
+def get_driver_trips(plan_date=None):
+    """
+    Return today's planned trips for the logged-in driver.
+
+    Cached offline by the FSL service worker (TRIPS_API_PATH in sw.js).
+    """
+    return get_trips_for_driver(_get_session_driver(), plan_date)
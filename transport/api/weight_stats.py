@@ -0,0 +1,18 @@
+import frappe
+
+STATS_DOCTYPE = "FSL Weight Stats"
+
+
+@frappe.whitelist()
+def start_weight_stats_rebuild():
+    """Queue a full rebuild of FSL Weight Stats; `fsl_weight_stats_rebuilt` fires when done."""
+    frappe.only_for("System Manager")
+    job = frappe.enqueue(
+        "transport.stats.weights.rebuild_weight_stats",
+        queue="long",
+        timeout=3600,
+        job_id="fsl-weight-stats-rebuild",
+        deduplicate=True,
+        user=frappe.session.user,
+    )
+    return {"queued": bool(job), "job_id": getattr(job, "id", None)}
@@ -0,0 +1,294 @@
+"""
+Hot/cold archival for Field Service Logs and purging of FSL logs.
+
+- Final FSLs older than `fsl_archive_after_days` move into FSL Archive
+  (one compressed row per trip_id) and are deleted from the hot table once
+  their archive row is confirmed; see _detach_archived for what happens to
+  the rows that referenced them.
+- FSL Sync Log rows, this app's Error Log rows and delivered outbox events
+  (with their batch logs) and FSL Trace rows are purged past retention.
+
+Every delete runs on a bounded primary-key range and commits per chunk, so
+no statement holds row locks for long. During working hours the job stops
+and leaves the rest for the next (nightly) run.
+
+Site config (all optional):
+- fsl_archive_after_days (default 365)
+- fsl_sync_log_retention_days (default 90)
+- fsl_error_log_retention_days (default 30)
+- fsl_outbox_retention_days (default 30)
+- fsl_trace_retention_days (default 90)
+- archive_chunk_size (default 500)
+- archive_working_hours (default "07:00-19:00"; may wrap past midnight, e.g. "22:00-06:00")
+- archive_max_minutes (default 30)
+"""
+
+import time
+
+import frappe
+from frappe.utils import add_days, get_datetime, now_datetime, nowdate
+
+from transport.archival.store import ARCHIVE_DOCTYPE, encode_payload
+
+FSL_DOCTYPE = "Field Service Log"
+SYNC_LOG_DOCTYPE = "FSL Sync Log"
+OUTBOX_DOCTYPE = "FSL Outbox Event"
+OUTBOX_BATCH_DOCTYPE = "FSL Outbox Batch"
+TRACE_DOCTYPE = "FSL Trace"
+PHOTO_HASH_DOCTYPE = "FSL Photo Hash"
+
+# Titles this app passes to frappe.log_error (stored in Error Log.method)
+FSL_ERROR_LOG_TITLES = ("FSL Client Error", "FSL Driver Mismatch", "QR Verify")
+
+
+def _conf_int(key: str, default: int) -> int:
+    return int(frappe.conf.get(key) or default)
+
+
+def _in_working_hours(now=None) -> bool:
+    window = frappe.conf.get("archive_working_hours") or "07:00-19:00"
+    start, _, end = window.partition("-")
+    now = get_datetime(now or now_datetime())
+    minutes = now.hour * 60 + now.minute
+
+    def to_minutes(value):
+        hh, _, mm = value.strip().partition(":")
+        return int(hh) * 60 + int(mm or 0)
+
+    start, end = to_minutes(start), to_minutes(end)
+    if start > end:  # window past midnight, e.g. 22:00-06:00
+        return minutes >= start or minutes < end
+    return start <= minutes < end
+
+
+class _Budget:
+    """Stops the job when time runs out or working hours begin."""
+
+    def __init__(self):
+        self.deadline = time.monotonic() + _conf_int("archive_max_minutes", 30) * 60
+
+    def exhausted(self) -> bool:
+        return time.monotonic() > self.deadline or _in_working_hours()
+
+
+def _next_key_range(table: str, where: str, params: dict, after: str, limit: int):
+    """Next (first, last, count) of primary keys matching `where`, walking the PK index."""
+    names = frappe.db.sql(
+        f"""
+        SELECT name FROM `tab{table}`
+        WHERE name > %(after)s AND {where}
+        ORDER BY name
+        LIMIT %(limit)s
+        """,
+        {**params, "after": after, "limit": limit},
+        pluck=True,
+    )
+    if not names:
+        return None
+    return names[0], names[-1], len(names)
+
+
+# ------------------------------
+# FSL -> FSL Archive
+# ------------------------------
+
+
+def _detach_archived(names: tuple):
+    """
+    Clean up after FSLs that just moved to FSL Archive.
+
+    - Version trail (FSL has track_changes on): dropped with the row
+    - File attachments: re-pointed to the archive row; its payload keeps the
+      photo URLs, so archived photos stay readable through FSL Archive
+    - FSL Photo Hash / FSL Trace rows of the archived FSLs: dropped
+    - Links from hot FSLs and photo hashes to an archived FSL: cleared, so
+      saving them doesn't fail link validation; review_reason still names it
+    Outbox events are kept: they carry their own payload and never load the
+    FSL, and delivered ones are purged by purge_outbox.
+    """
+    params = {"doctype": FSL_DOCTYPE, "names": names}
+    frappe.db.sql("DELETE FROM `tabVersion` WHERE ref_doctype = %(doctype)s AND docname IN %(names)s", params)
+    frappe.db.sql(
+        f"""
+        UPDATE `tabFile` f
+        INNER JOIN `tab{ARCHIVE_DOCTYPE}` a ON a.fsl_name = f.attached_to_name
+        SET f.attached_to_doctype = %(archive)s, f.attached_to_name = a.name, f.attached_to_field = NULL
+        WHERE f.attached_to_doctype = %(doctype)s AND f.attached_to_name IN %(names)s
+        """,
+        {**params, "archive": ARCHIVE_DOCTYPE},
+    )
+    frappe.db.sql(f"DELETE FROM `tab{PHOTO_HASH_DOCTYPE}` WHERE fsl IN %(names)s", params)
+    frappe.db.sql(f"DELETE FROM `tab{TRACE_DOCTYPE}` WHERE fsl IN %(names)s", params)
+    frappe.db.sql(
+        f"UPDATE `tab{PHOTO_HASH_DOCTYPE}` SET match_fsl = NULL WHERE match_fsl IN %(names)s",
+        params,
+    )
+    frappe.db.sql(
+        f"UPDATE `tab{FSL_DOCTYPE}` SET photo_reused_from = NULL WHERE photo_reused_from IN %(names)s",
+        params,
+    )
+
+
+def archive_final_fsls(budget=None) -> int:
+    """Move old Final FSLs into FSL Archive, one PK range per transaction."""
+    budget = budget or _Budget()
+    chunk = _conf_int("archive_chunk_size", 500)
+    cutoff = add_days(nowdate(), -_conf_int("fsl_archive_after_days", 365))
+
+    where = "status = 'Final' AND trip_date < %(cutoff)s"
+    params = {"cutoff": cutoff}
+    after = ""
+    moved = 0
+
+    while not budget.exhausted():
+        key_range = _next_key_range(FSL_DOCTYPE, where, params, after, chunk)
+        if not key_range:
+            break
+        first, last, _ = key_range
+        range_params = {**params, "first": first, "last": last}
+
+        rows = frappe.db.sql(
+            f"""
+            SELECT * FROM `tab{FSL_DOCTYPE}`
+            WHERE name BETWEEN %(first)s AND %(last)s AND {where}
+            FOR UPDATE
+            """,
+            range_params,
+            as_dict=True,
+        )
+        if rows:
+            archived_on = now_datetime()
+            frappe.db.bulk_insert(
+                ARCHIVE_DOCTYPE,
+                fields=[
+                    "name",
+                    "creation",
+                    "modified",
+                    "owner",
+                    "modified_by",
+                    "trip_id",
+                    "fsl_name",
+                    "customer",
+                    "driver",
+                    "trip_date",
+                    "archived_on",
+                    "payload",
+                ],
+                values=[
+                    (
+                        row.trip_id,
+                        archived_on,
+                        archived_on,
+                        "Administrator",
+                        "Administrator",
+                        row.trip_id,
+                        row.name,
+                        row.customer,
+                        row.driver,
+                        row.trip_date,
+                        archived_on,
+                        encode_payload(row),
+                    )
+                    for row in rows
+                ],
+                ignore_duplicates=True,
+            )
+
+            # only rows whose archive copy is in place: ignore_duplicates skips a
+            # trip_id that is already archived (for another FSL), so check by fsl_name
+            names = tuple(
+                frappe.db.sql_list(
+                    f"SELECT fsl_name FROM `tab{ARCHIVE_DOCTYPE}` WHERE name IN %(trip_ids)s AND fsl_name IN %(names)s",
+                    {"trip_ids": tuple(row.trip_id for row in rows), "names": tuple(row.name for row in rows)},
+                )
+            )
+            if len(names) < len(rows):
+                skipped = sorted({row.name for row in rows} - set(names))
+                frappe.logger("transport").warning(f"[archival] trip_id already archived, FSLs kept: {skipped}")
+            if names:
+                frappe.db.sql(f"DELETE FROM `tab{FSL_DOCTYPE}` WHERE name IN %(names)s", {"names": names})
+                _detach_archived(names)
+            moved += len(names)
+
+        frappe.db.commit()
+        after = last
+
+    return moved
+
+
+# ------------------------------
+# Log retention
+# ------------------------------
+
+
+def _purge_in_chunks(doctype: str, where: str, params: dict, budget) -> int:
+    chunk = _conf_int("archive_chunk_size", 500)
+    after = ""
+    purged = 0
+
+    while not budget.exhausted():
+        key_range = _next_key_range(doctype, where, params, after, chunk)
+        if not key_range:
+            break
+        first, last, count = key_range
+
+        frappe.db.sql(
+            f"DELETE FROM `tab{doctype}` WHERE name BETWEEN %(first)s AND %(last)s AND {where}",
+            {**params, "first": first, "last": last},
+        )
+        purged += count
+        frappe.db.commit()
+        after = last
+
+    return purged
+
+
+def purge_sync_logs(budget=None) -> int:
+    cutoff = add_days(now_datetime(), -_conf_int("fsl_sync_log_retention_days", 90))
+    return _purge_in_chunks(SYNC_LOG_DOCTYPE, "creation < %(cutoff)s", {"cutoff": cutoff}, budget or _Budget())
+
+
+def purge_error_logs(budget=None) -> int:
+    cutoff = add_days(now_datetime(), -_conf_int("fsl_error_log_retention_days", 30))
+    return _purge_in_chunks(
+        "Error Log",
+        "creation < %(cutoff)s AND method IN %(titles)s",
+        {"cutoff": cutoff, "titles": FSL_ERROR_LOG_TITLES},
+        budget or _Budget(),
+    )
+
+
+def purge_outbox(budget=None) -> int:
+    """Delivered events and batch logs; Pending/Failed events are kept for follow-up."""
+    budget = budget or _Budget()
+    cutoff = add_days(now_datetime(), -_conf_int("fsl_outbox_retention_days", 30))
+    params = {"cutoff": cutoff}
+    purged = _purge_in_chunks(OUTBOX_DOCTYPE, "status = 'Sent' AND creation < %(cutoff)s", params, budget)
+    return purged + _purge_in_chunks(OUTBOX_BATCH_DOCTYPE, "creation < %(cutoff)s", params, budget)
+
+
+def purge_traces(budget=None) -> int:
+    cutoff = add_days(now_datetime(), -_conf_int("fsl_trace_retention_days", 90))
+    return _purge_in_chunks(TRACE_DOCTYPE, "creation < %(cutoff)s", {"cutoff": cutoff}, budget or _Budget())
+
+
+# ------------------------------
+# Scheduler entry point
+# ------------------------------
+
+
+def run_archival():
+    """Nightly: archive old Final FSLs, then purge sync/error logs, the outbox and latency traces (scheduled daily_long)."""
+    budget = _Budget()
+    if budget.exhausted():
+        return {"skipped": "working hours"}
+
+    result = {
+        "archived_fsl": archive_final_fsls(budget),
+        "purged_sync_logs": purge_sync_logs(budget),
+        "purged_error_logs": purge_error_logs(budget),
+        "purged_outbox": purge_outbox(budget),
+        "purged_traces": purge_traces(budget),
+    }
+    frappe.logger("transport").info(f"[archival] {result}")
+    return result
@@ -0,0 +1,37 @@
+"""Cold storage format for archived Field Service Logs (FSL Archive.payload)."""
+
+import base64
+import json
+import zlib
+
+import frappe
+
+ARCHIVE_DOCTYPE = "FSL Archive"
+
+
+def encode_payload(row: dict) -> str:
+    """Full FSL row -> zlib-compressed, base64 JSON (fits a Long Text column)."""
+    raw = json.dumps(row, default=str, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(zlib.compress(raw, 9)).decode("ascii")
+
+
+def decode_payload(payload: str) -> dict:
+    if not payload:
+        return {}
+    return json.loads(zlib.decompress(base64.b64decode(payload)).decode("utf-8"))
+
+
+def get_archived_fsl_row(trip_id: str) -> dict | None:
+    """Return the archived FSL row for a trip_id, or None."""
+    row = frappe.db.get_value(
+        ARCHIVE_DOCTYPE,
+        trip_id,
+        ["trip_id", "fsl_name", "archived_on", "payload"],
+        as_dict=True,
+    )
+    if not row:
+        return None
+
+    data = decode_payload(row.payload)
+    data["archived_on"] = row.archived_on
+    return data
@@ -0,0 +1,159 @@
+"""
+Debounced realtime change events for the FSL live board.
+
+upsert_draft_fsl calls stage_changes after it commits a created or edited
+draft; the `fsl_on_finalize` hook (single, bulk and sweeper finalizations)
+stages its FSLs once the finalizing transaction commits. Each changed FSL
+goes into a per-territory Redis hash as its compact row, so repeated writes
+to one FSL collapse into its latest state. The first change of a window also sets a
+`SET NX` marker and queues flush_board; later changes in that window only
+touch the hash. flush_board waits out the window, drains the hash and
+publishes a single `fsl_board_update` event to the Field Service Log room
+(desk users who can read FSLs).
+
+Staging never fails a write: errors are logged and the board catches up from
+get_board_snapshot when it next (re)connects.
+
+Site config (all optional):
+- fsl_board_debounce_ms (default 2000)
+"""
+
+import json
+import time
+
+import frappe
+from frappe.utils import cint, flt
+
+FSL_DOCTYPE = "Field Service Log"
+BOARD_EVENT = "fsl_board_update"
+PENDING_PREFIX = "fsl_board:pending"
+SCHEDULED_PREFIX = "fsl_board:scheduled"
+NO_TERRITORY = ""
+DEFAULT_DEBOUNCE_MS = 2000
+
+# Row layout shared by the events and get_board_snapshot
+BOARD_FIELDS = [
+    "name",
+    "status",
+    "trip_date",
+    "driver",
+    "driver_name",
+    "customer",
+    "qty_or_weight",
+    "needs_review",
+    "modified",
+]
+
+BOARD_QUERY = f"""
+    SELECT f.name, f.status, f.trip_date, f.driver, d.full_name, f.customer,
+        f.qty_or_weight, f.needs_review, f.modified, d.custom_territory
+    FROM `tab{FSL_DOCTYPE}` f
+    LEFT JOIN `tabDriver` d ON d.name = f.driver
+    WHERE {{where}}
+"""
+
+
+def debounce_ms() -> int:
+    return cint(frappe.conf.get("fsl_board_debounce_ms")) or DEFAULT_DEBOUNCE_MS
+
+
+def compact_row(row) -> list:
+    """DB row (BOARD_QUERY order, without territory) -> JSON-ready list in BOARD_FIELDS order."""
+    name, status, trip_date, driver, driver_name, customer, qty, needs_review, modified = row
+    return [
+        name,
+        status,
+        str(trip_date) if trip_date else None,
+        driver,
+        driver_name,
+        customer,
+        flt(qty),
+        cint(needs_review),
+        str(modified),
+    ]
+
+
+def board_rows(where: str, params: dict) -> list[tuple[str, list]]:
+    """[(territory, compact row)] for FSLs matching `where` (aliases: f = FSL, d = Driver)."""
+    rows = frappe.db.sql(BOARD_QUERY.format(where=where), params)
+    return [(row[-1] or NO_TERRITORY, compact_row(row[:-1])) for row in rows]
+
+
+# ------------------------------
+# Staging (write path)
+# ------------------------------
+
+
+def on_fsl_finalized(names: list[str]):
+    """fsl_on_finalize hook: stage once the finalizing transaction commits."""
+    names = list(names)
+    frappe.db.after_commit.add(lambda: stage_changes(names))
+
+
+def stage_changes(names: list[str]):
+    """Queue board updates for committed changes to `names`."""
+    if not names:
+        return
+    try:
+        by_territory = {}
+        for territory, row in board_rows("f.name IN %(names)s", {"names": tuple(names)}):
+            by_territory.setdefault(territory, {})[row[0]] = json.dumps(row)
+
+        cache = frappe.cache()
+        window = debounce_ms()
+        for territory, rows in by_territory.items():
+            pipe = cache.pipeline()
+            pipe.hset(cache.make_key(f"{PENDING_PREFIX}:{territory}"), mapping=rows)
+            # first change of a window schedules the flush; the marker holds its start time
+            pipe.set(
+                cache.make_key(f"{SCHEDULED_PREFIX}:{territory}"),
+                int(time.time() * 1000),
+                nx=True,
+                px=window * 10,  # outlives a stuck job; the next change reschedules
+            )
+            _, scheduled = pipe.execute()
+            if scheduled:
+                frappe.enqueue(
+                    "transport.board.events.flush_board",
+                    queue="short",
+                    territory=territory,
+                )
+    except Exception:
+        frappe.logger("transport").warning("fsl board change not staged", exc_info=True)
+
+
+# ------------------------------
+# Flush (background)
+# ------------------------------
+
+
+def _drain(territory: str) -> list[list]:
+    cache = frappe.cache()
+    key = cache.make_key(f"{PENDING_PREFIX}:{territory}")
+    pipe = cache.pipeline()  # MULTI/EXEC: read and clear atomically
+    pipe.hgetall(key)
+    pipe.delete(key)
+    raw, _ = pipe.execute()
+    return sorted((json.loads(v) for v in raw.values()), key=lambda row: row[0])
+
+
+def flush_board(territory: str):
+    """Background job: wait out the debounce window, then publish one event for the territory."""
+    cache = frappe.cache()
+    marker = cache.make_key(f"{SCHEDULED_PREFIX}:{territory}")
+    raw = cache.get(marker)
+    started = int(raw) if raw else int(time.time() * 1000)
+    wait = started + debounce_ms() - time.time() * 1000
+    if wait > 0:
+        time.sleep(wait / 1000)
+
+    # clear the marker first: a change landing after this schedules the next flush
+    cache.delete(marker)
+    rows = _drain(territory)
+    if rows:
+        frappe.publish_realtime(
+            BOARD_EVENT,
+            {"territory": territory, "fields": BOARD_FIELDS, "rows": rows},
+            doctype=FSL_DOCTYPE,
+        )
+    return len(rows)
@@ -0,0 +1,65 @@
+import json
+
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("fsl-reconnect-burst")
+@click.option("--devices", default=50, help="Devices reconnecting at the same instant")
+@click.option("--items", default=3, help="Queued drafts each device flushes")
+@click.option("--base-url", default=None, help="Defaults to the site's URL")
+@click.option("--max-attempts", default=5, help="Attempts per item on 429/503")
+@pass_context
+def fsl_reconnect_burst(context, devices, items, base_url, max_attempts):
+    """Load-test upsert_draft_fsl with a fleet-wide reconnect burst (creates draft FSLs)."""
+    from transport.field_auth.qr import sign_customer_token
+    from transport.loadtest.reconnect_burst import run_burst
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        base_url = base_url or frappe.utils.get_url()
+        drivers = frappe.get_all(
+            "Driver", filters={"custom_driver_canonical_id": ["is", "set"]}, pluck="custom_driver_canonical_id"
+        )
+        customers = frappe.get_all("Customer", pluck="name", limit=devices)
+        if not drivers or not customers:
+            click.echo("Need at least one Driver with a canonical id and one Customer")
+            return
+
+        # one device per (customer, driver) pair, so each has its own trip
+        fleet = [
+            {
+                "id": i,
+                "driver_canonical_id": drivers[i % len(drivers)],
+                "qr_token": sign_customer_token(customers[(i // len(drivers)) % len(customers)]),
+            }
+            for i in range(devices)
+        ]
+    finally:
+        frappe.destroy()
+
+    summary = run_burst(base_url, fleet, items=items, max_attempts=max_attempts)
+    click.echo(json.dumps(summary, indent=2))
+
+
+@click.command("fsl-payload-bench")
+@click.option("--count", default=2000, help="Payloads per round")
+@click.option("--rounds", default=5, help="Rounds; the best one is reported")
+@pass_context
+def fsl_payload_bench(context, count, rounds):
+    """Benchmark FSL payload parsing against the previous parser (read-only)."""
+    from transport.api.fsl import ALLOWED_FIELDS
+    from transport.loadtest.payload_bench import run_bench
+
+    frappe.init(site=get_site(context))
+    frappe.connect()
+    try:
+        click.echo(json.dumps(run_bench(ALLOWED_FIELDS, count=count, rounds=rounds), indent=2))
+    finally:
+        frappe.destroy()
+
+
+commands = [fsl_reconnect_burst, fsl_payload_bench]
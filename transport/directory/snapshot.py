@@ -0,0 +1,178 @@
+"""
+Versioned per-territory directory of customers and Customer Sites for the
+field page.
+
+build_directories (cron) rebuilds the directory of every territory that has
+active drivers. A new version is stored only when the content changed; the
+version is the build time in epoch seconds, so it only grows, even after the
+cache is flushed. Each version is kept gzipped in Redis for KEEP_SECONDS.
+
+A device sends the version it holds and gets back, already gzipped:
+- {"unchanged": true} when it is current
+- a delta (upserted and deleted keys per table) when its version is still
+  stored; deltas are computed once and cached
+- the full snapshot otherwise
+
+Snapshot layout (rows are positional lists, see FIELDS):
+    {"territory", "version", "full": true, "fields": FIELDS,
+     "customers": {name: [...]}, "sites": {name: [...]}}
+Delta layout:
+    {"territory", "version", "base", "full": false,
+     "customers": {"upsert": {...}, "delete": [...]}, "sites": {...}}
+"""
+
+import gzip
+import hashlib
+import json
+import time
+
+import frappe
+
+CACHE_PREFIX = "fsl_directory"
+KEEP_SECONDS = 14 * 24 * 3600  # a device offline longer than this gets a full snapshot
+
+FIELDS = {
+    "customers": ["customer_name"],
+    "sites": ["customer", "site_uuid", "status", "latitude", "longitude", "service_window"],
+}
+
+
+def _key(territory: str, *parts) -> str:
+    return ":".join([CACHE_PREFIX, territory, *map(str, parts)])
+
+
+def pack(payload: dict) -> bytes:
+    """Gzipped `{"message": payload}`, ready to send as an API response body."""
+    body = json.dumps({"message": payload}, ensure_ascii=False, separators=(",", ":"), default=str)
+    return gzip.compress(body.encode(), compresslevel=9)
+
+
+def unpack(blob: bytes) -> dict:
+    return json.loads(gzip.decompress(blob))["message"]
+
+
+# ------------------------------
+# Build
+# ------------------------------
+
+
+def _coordinate(value):
+    # Float fields store "not set" as 0
+    return round(float(value), 6) if value else None
+
+
+def load_tables(territory: str) -> dict:
+    customers = frappe.db.sql(
+        """
+        SELECT name, customer_name FROM `tabCustomer`
+        WHERE territory = %(territory)s AND disabled = 0
+        """,
+        {"territory": territory},
+    )
+    sites = frappe.db.sql(
+        """
+        SELECT cs.name, cs.customer, cs.site_uuid, cs.status, cs.latitude, cs.longitude, cs.service_window
+        FROM `tabCustomer Site` cs
+        INNER JOIN `tabCustomer` c ON c.name = cs.customer
+        WHERE c.territory = %(territory)s AND c.disabled = 0
+        """,
+        {"territory": territory},
+    )
+    return {
+        "customers": {name: [customer_name] for name, customer_name in customers},
+        "sites": {
+            name: [customer, site_uuid, status, _coordinate(lat), _coordinate(lng), service_window]
+            for name, customer, site_uuid, status, lat, lng, service_window in sites
+        },
+    }
+
+
+def _digest(tables: dict) -> str:
+    raw = json.dumps(tables, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def get_head(territory: str) -> dict | None:
+    """{"version", "digest"} of the current snapshot, or None if none is stored."""
+    head = frappe.cache().get_value(_key(territory, "head"))
+    if head and frappe.cache().get_value(_key(territory, head["version"])) is None:
+        return None  # snapshot evicted: rebuild
+    return head
+
+
+def build_directory(territory: str) -> dict:
+    """Store a new version if the territory's content changed; returns the head."""
+    tables = load_tables(territory)
+    digest = _digest(tables)
+    head = get_head(territory)
+    if head and head["digest"] == digest:
+        return head
+
+    version = max(int(time.time()), head["version"] + 1 if head else 0)
+    snapshot = {"territory": territory, "version": version, "full": True, "fields": FIELDS, **tables}
+    cache = frappe.cache()
+    cache.set_value(_key(territory, version), pack(snapshot), expires_in_sec=KEEP_SECONDS)
+    head = {"version": version, "digest": digest}
+    cache.set_value(_key(territory, "head"), head, expires_in_sec=KEEP_SECONDS)
+    return head
+
+
+def _territories() -> list[str]:
+    return frappe.get_all(
+        "Driver",
+        filters={"status": "Active", "custom_territory": ["is", "set"]},
+        pluck="custom_territory",
+        distinct=True,
+    )
+
+
+def build_directories():
+    """Scheduler: refresh the directory of every territory with active drivers."""
+    for territory in _territories():
+        build_directory(territory)
+
+
+# ------------------------------
+# Serve
+# ------------------------------
+
+
+def diff_tables(old: dict, new: dict) -> dict:
+    """{table: {"upsert": {name: row}, "delete": [name]}} turning `old` into `new`."""
+    out = {}
+    for table in FIELDS:
+        before, after = old.get(table) or {}, new.get(table) or {}
+        out[table] = {
+            "upsert": {name: row for name, row in after.items() if before.get(name) != row},
+            "delete": sorted(name for name in before if name not in after),
+        }
+    return out
+
+
+def get_update(territory: str, since=None) -> bytes:
+    """Gzipped response body for a device holding version `since` (None: nothing yet)."""
+    head = get_head(territory) or build_directory(territory)
+    version = head["version"]
+    if since and int(since) == version:
+        return pack({"territory": territory, "version": version, "unchanged": True})
+
+    cache = frappe.cache()
+    current = cache.get_value(_key(territory, version))
+    if current is None:  # evicted since get_head: rebuild
+        version = build_directory(territory)["version"]
+        current = cache.get_value(_key(territory, version))
+    base = cache.get_value(_key(territory, since)) if since else None
+    if base is None:
+        return current
+
+    delta_key = _key(territory, "delta", since, version)
+    delta = cache.get_value(delta_key)
+    if delta is None:
+        old, new = unpack(base), unpack(current)
+        if old.get("fields") != new.get("fields"):
+            return current  # layout changed: positional rows don't line up
+        delta = pack(
+            {"territory": territory, "version": version, "base": int(since), "full": False, **diff_tables(old, new)}
+        )
+        cache.set_value(delta_key, delta, expires_in_sec=KEEP_SECONDS)
+    return delta if len(delta) < len(current) else current
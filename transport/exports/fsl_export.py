@@ -0,0 +1,201 @@
+"""
+Streaming export of Field Service Logs for a trip_date range.
+
+Rows come off an unbuffered (server-side) cursor and are written to a private
+file as they arrive, so memory stays flat however large the range is.
+Progress is pushed to the requesting user over realtime (`fsl_export_progress`).
+The read runs on the read replica when one is configured and fresh enough.
+"""
+
+import csv
+import os
+
+import frappe
+from frappe.utils import getdate, now_datetime
+
+from transport.utils.replica import replica_read
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # parquet is optional; CSV always works
+    pa = None
+    pq = None
+
+FSL_DOCTYPE = "Field Service Log"
+PROGRESS_EVENT = "fsl_export_progress"
+PROGRESS_EVERY = 2000
+PARQUET_BATCH_ROWS = 5000
+
+COLUMNS = [
+    "fsl",
+    "trip_id",
+    "trip_date",
+    "performed_at",
+    "status",
+    "driver_canonical_id",
+    "customer",
+    "customer_name",
+    "site",
+    "site_uuid",
+    "site_address",
+    "qty_or_weight",
+    "package_count",
+    "is_waste_safe",
+    "is_waste_collected",
+    "is_safety_critical",
+    "is_safety_resolved",
+    "safety_issue_reason",
+    "gps_lat",
+    "gps_lng",
+]
+
+EXPORT_QUERY = f"""
+    SELECT
+        fsl.name, fsl.trip_id, fsl.trip_date, fsl.performed_at, fsl.status,
+        d.custom_driver_canonical_id, fsl.customer, c.customer_name,
+        fsl.site, cs.site_uuid, cs.address,
+        fsl.qty_or_weight, fsl.package_count,
+        fsl.is_waste_safe, fsl.is_waste_collected,
+        fsl.is_safety_critical, fsl.is_safety_resolved, fsl.safety_issue_reason,
+        fsl.gps_lat, fsl.gps_lng
+    FROM `tab{FSL_DOCTYPE}` fsl
+    LEFT JOIN `tabDriver` d ON d.name = fsl.driver
+    LEFT JOIN `tabCustomer` c ON c.name = fsl.customer
+    LEFT JOIN `tabCustomer Site` cs ON cs.name = fsl.site
+    WHERE fsl.trip_date BETWEEN %(from_date)s AND %(to_date)s
+    ORDER BY fsl.trip_date, fsl.name
+"""
+
+PARQUET_TYPES = {
+    "trip_date": "date32",
+    "performed_at": "timestamp",
+    "qty_or_weight": "float64",
+    "package_count": "int64",
+    "is_waste_safe": "int8",
+    "is_waste_collected": "int8",
+    "is_safety_critical": "int8",
+    "is_safety_resolved": "int8",
+    "gps_lat": "float64",
+    "gps_lng": "float64",
+}
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def _parquet_schema():
+    types = {
+        "date32": pa.date32(),
+        "timestamp": pa.timestamp("us"),
+        "float64": pa.float64(),
+        "int64": pa.int64(),
+        "int8": pa.int8(),
+    }
+    return pa.schema([(col, types.get(PARQUET_TYPES.get(col), pa.string())) for col in COLUMNS])
+
+
+class _CsvSink:
+    def __init__(self, path):
+        self.fh = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.fh)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, row):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.fh.close()
+
+
+class _ParquetSink:
+    """Buffers one row group at a time, then hands it to ParquetWriter."""
+
+    def __init__(self, path):
+        self.schema = _parquet_schema()
+        self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.batch = []
+
+    def write(self, row):
+        self.batch.append(row)
+        if len(self.batch) >= PARQUET_BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self.batch:
+            return
+        arrays = []
+        for col, field in zip(zip(*self.batch, strict=True), self.schema, strict=True):
+            if pa.types.is_floating(field.type):
+                # Float columns come back from MariaDB as Decimal
+                col = [None if v is None else float(v) for v in col]
+            arrays.append(pa.array(col, type=field.type))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.batch = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+def _publish(user, **message):
+    frappe.publish_realtime(PROGRESS_EVENT, message, user=user)
+
+
+def _count_rows(from_date, to_date) -> int:
+    # trip_date is indexed, so this is an index range count
+    return frappe.db.count(FSL_DOCTYPE, {"trip_date": ["between", [from_date, to_date]]})
+
+
+@replica_read
+def _stream_to_file(path, from_date, to_date, file_format, user) -> int:
+    """Read-only part of the export; runs on the read replica when one is healthy."""
+    total = _count_rows(from_date, to_date)
+    sink = _ParquetSink(path) if file_format == "parquet" else _CsvSink(path)
+    written = 0
+    try:
+        with frappe.db.unbuffered_cursor():
+            for row in frappe.db.sql(
+                EXPORT_QUERY,
+                {"from_date": from_date, "to_date": to_date},
+                as_iterator=True,
+            ):
+                sink.write(row)
+                written += 1
+                if written % PROGRESS_EVERY == 0:
+                    _publish(user, processed=written, total=total)
+    except Exception:
+        sink.close()
+        if os.path.exists(path):
+            os.remove(path)
+        _publish(user, processed=written, total=total, failed=True)
+        raise
+    sink.close()
+    return written
+
+
+def export_fsl_range(from_date, to_date, file_format="csv", user=None):
+    """Background job: stream the range into a private File and report progress."""
+    user = user or frappe.session.user
+    from_date, to_date = getdate(from_date), getdate(to_date)
+    file_format = (file_format or "csv").lower()
+
+    file_name = f"fsl-{from_date}-{to_date}-{now_datetime():%Y%m%d%H%M%S}.{file_format}"
+    path = frappe.get_site_path("private", "files", file_name)
+    written = _stream_to_file(path, from_date, to_date, file_format, user)
+
+    # the File record is a write: primary connection
+    file_doc = frappe.get_doc(
+        {
+            "doctype": "File",
+            "file_name": file_name,
+            "file_url": f"/private/files/{file_name}",
+            "is_private": 1,
+        }
+    )
+    file_doc.insert(ignore_permissions=True)
+    frappe.db.commit()
+
+    _publish(user, processed=written, total=written, done=True, file_url=file_doc.file_url)
+    return {"rows": written, "file_url": file_doc.file_url}
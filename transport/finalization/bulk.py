@@ -0,0 +1,181 @@
+"""
+Set-based finalization of Field Service Logs.
+
+Used by the supervisor bulk endpoint (transport.api.fsl.bulk_finalize_fsl) and
+the stale-draft sweeper. Drafts are read one keyset page at a time, with a
+single query that also returns what validation needs (driver, service_type).
+Valid rows change to Final in one UPDATE per page, invalid rows are skipped or
+flagged for review, and each page is committed on its own.
+
+Anything that must happen when an FSL becomes Final goes in the
+`fsl_on_finalize` hook (hooks.py). It is called with a list of names, from both
+the single finalize_fsl endpoint and the bulk path, inside the same transaction
+as the status change.
+
+Site config (all optional):
+- fsl_finalize_chunk_size (default 500)
+"""
+
+import frappe
+from frappe.utils import now_datetime
+
+FSL_DOCTYPE = "Field Service Log"
+DEFAULT_CHUNK = 500
+MAX_REPORTED_SKIPS = 100
+
+
+def requires_service_type() -> bool:
+    return bool(frappe.get_meta(FSL_DOCTYPE).get_field("service_type"))
+
+
+def missing_service_type(doc) -> bool:
+    return requires_service_type() and not doc.get("service_type")
+
+
+def invalid_reason(row) -> str | None:
+    """Why a Draft row cannot be finalized (None if it can)."""
+    if not (row.get("driver") or "").strip():
+        return "FSL has no driver set"
+    if not row.get("driver_name"):
+        return f"Driver {row.driver} does not exist"
+    if missing_service_type(row):
+        return "Service type required"
+    return None
+
+
+def run_finalize_hooks(names: list[str]):
+    """Call every `fsl_on_finalize` hook with FSLs that just became Final."""
+    if not names:
+        return
+    for method in frappe.get_hooks("fsl_on_finalize"):
+        frappe.get_attr(method)(names)
+
+
+def fetch_draft_page(where: str, params: dict, after: str, limit: int) -> list:
+    """Next keyset page of Drafts matching `where` (aliases: f = FSL, d = Driver)."""
+    service_type = "f.service_type" if requires_service_type() else "NULL"
+    return frappe.db.sql(
+        f"""
+        SELECT f.name, f.driver, {service_type} AS service_type, d.name AS driver_name
+        FROM `tab{FSL_DOCTYPE}` f
+        LEFT JOIN `tabDriver` d ON d.name = f.driver
+        WHERE f.status = 'Draft' AND f.name > %(after)s AND {where}
+        ORDER BY f.name
+        LIMIT %(limit)s
+        """,
+        {**params, "after": after, "limit": limit},
+        as_dict=True,
+    )
+
+
+def _insert_versions(names: list[str], changed: list, now, user: str):
+    """Version rows a per-document save would have written (FSL has track_changes on)."""
+    data = frappe.as_json(
+        {
+            "added": [],
+            "changed": changed,
+            "removed": [],
+            "row_changed": [],
+            "data_import": None,
+            "updater_reference": None,
+        },
+        indent=None,
+    )
+    frappe.db.bulk_insert(
+        "Version",
+        fields=["name", "creation", "modified", "owner", "modified_by", "ref_doctype", "docname", "data"],
+        values=[
+            (frappe.generate_hash(length=10), now, now, user, user, FSL_DOCTYPE, name, data)
+            for name in names
+        ],
+    )
+
+
+def mark_final(names: list[str]) -> list[str]:
+    """
+    Change the given Drafts to Final in one statement, then run the hooks.
+
+    Rows that stopped being Draft since they were read are left alone. The
+    caller commits.
+    """
+    if not names:
+        return []
+
+    names = frappe.db.sql(
+        f"SELECT name FROM `tab{FSL_DOCTYPE}` WHERE name IN %(names)s AND status = 'Draft' FOR UPDATE",
+        {"names": tuple(names)},
+        pluck=True,
+    )
+    if not names:
+        return []
+
+    now = now_datetime()
+    user = frappe.session.user
+    frappe.db.sql(
+        f"""
+        UPDATE `tab{FSL_DOCTYPE}`
+        SET status = 'Final', modified = %(now)s, modified_by = %(user)s
+        WHERE name IN %(names)s
+        """,
+        {"now": now, "user": user, "names": tuple(names)},
+    )
+    _insert_versions(names, [["status", "Draft", "Final"]], now, user)
+    run_finalize_hooks(names)
+    return names
+
+
+def flag_for_review(invalid: list[tuple[str, str]]):
+    """Set needs_review on (name, reason) pairs; one UPDATE per distinct reason."""
+    by_reason = {}
+    for name, reason in invalid:
+        by_reason.setdefault(reason, []).append(name)
+
+    for reason, names in by_reason.items():
+        frappe.db.sql(
+            f"""
+            UPDATE `tab{FSL_DOCTYPE}`
+            SET needs_review = 1, review_reason = %(reason)s
+            WHERE name IN %(names)s AND status = 'Draft'
+            """,
+            {"reason": reason, "names": tuple(names)},
+        )
+
+
+def finalize_where(where: str, params: dict, *, flag_invalid: bool = False, should_stop=None) -> dict:
+    """
+    Finalize every valid Draft matching `where`, one committed page at a time.
+
+    Invalid drafts are flagged for review (flag_invalid) or reported back as skipped.
+    `should_stop` is checked between pages so long sweeps can yield.
+    """
+    chunk = int(frappe.conf.get("fsl_finalize_chunk_size") or DEFAULT_CHUNK)
+    result = {"finalized": 0, "flagged": 0, "skipped_count": 0, "skipped": []}
+    after = ""
+
+    while not (should_stop and should_stop()):
+        rows = fetch_draft_page(where, params, after, chunk)
+        if not rows:
+            break
+
+        valid, invalid = [], []
+        for row in rows:
+            reason = invalid_reason(row)
+            if reason:
+                invalid.append((row.name, reason))
+            else:
+                valid.append(row.name)
+
+        result["finalized"] += len(mark_final(valid))
+
+        if flag_invalid:
+            flag_for_review(invalid)
+            result["flagged"] += len(invalid)
+        else:
+            result["skipped_count"] += len(invalid)
+            room = MAX_REPORTED_SKIPS - len(result["skipped"])
+            result["skipped"].extend({"name": n, "reason": r} for n, r in invalid[:room])
+
+        frappe.db.commit()
+        after = rows[-1].name
+
+    return result
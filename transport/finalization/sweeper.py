@@ -0,0 +1,59 @@
+"""
+End-of-day sweep of stale Draft FSLs (scheduled daily).
+
+Drafts older than `fsl_stale_draft_days` are auto-finalized when they pass
+the same checks as finalize_fsl. The rest are flagged with needs_review and a
+reason, and are skipped on later runs. With fsl_stale_draft_action = "flag",
+nothing is finalized and every stale draft is flagged for a supervisor.
+
+Works page by page (see finalization.bulk.finalize_where) and commits each
+page, so no transaction stays open for the whole sweep.
+
+Site config (all optional):
+- fsl_stale_draft_days (default 2)
+- fsl_stale_draft_action: "finalize" (default) or "flag"
+- fsl_sweeper_max_minutes (default 15)
+"""
+
+import time
+
+import frappe
+from frappe.utils import add_days, nowdate
+
+from transport.finalization.bulk import DEFAULT_CHUNK, fetch_draft_page, finalize_where, flag_for_review
+
+STALE_WHERE = "f.trip_date < %(cutoff)s AND f.needs_review = 0"
+
+
+def _flag_all(params: dict, should_stop) -> dict:
+    chunk = int(frappe.conf.get("fsl_finalize_chunk_size") or DEFAULT_CHUNK)
+    flagged = 0
+    after = ""
+    while not should_stop():
+        rows = fetch_draft_page(STALE_WHERE, params, after, chunk)
+        if not rows:
+            break
+        flag_for_review([(row.name, "Stale draft") for row in rows])
+        flagged += len(rows)
+        frappe.db.commit()
+        after = rows[-1].name
+    return {"finalized": 0, "flagged": flagged}
+
+
+def sweep_stale_drafts():
+    days = int(frappe.conf.get("fsl_stale_draft_days") or 2)
+    action = frappe.conf.get("fsl_stale_draft_action") or "finalize"
+    deadline = time.monotonic() + int(frappe.conf.get("fsl_sweeper_max_minutes") or 15) * 60
+
+    def should_stop():
+        return time.monotonic() > deadline
+
+    params = {"cutoff": add_days(nowdate(), -days)}
+    if action == "flag":
+        result = _flag_all(params, should_stop)
+    else:
+        result = finalize_where(STALE_WHERE, params, flag_invalid=True, should_stop=should_stop)
+        result = {"finalized": result["finalized"], "flagged": result["flagged"]}
+
+    frappe.logger("transport").info(f"[fsl-sweeper] {result}")
+    return result
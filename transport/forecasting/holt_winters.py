@@ -0,0 +1,87 @@
+"""
+Additive Holt-Winters with a damped trend and weekly season, fitted to many
+series at once.
+
+Pure NumPy (no frappe imports). Series are the rows of an (n, T) matrix. The
+recursion walks the T days once and updates every series under every
+candidate (alpha, beta, gamma) together, so a fit costs T steps of (P, n)
+array operations whatever n is. Each series keeps the candidate with the
+smallest one-step-ahead squared error.
+
+Error-correction form, e = y - (level + phi * trend + season):
+    level  += phi * trend + alpha * e        (trend term uses the old trend)
+    trend   = phi * trend + alpha * beta * e
+    season += gamma * (1 - alpha) * e
+The first week seeds the level and season, the first two weeks the trend.
+"""
+
+import itertools
+
+import numpy as np
+
+SEASON = 7
+ALPHAS = (0.1, 0.3, 0.5)
+BETAS = (0.0, 0.1)
+GAMMAS = (0.05, 0.2, 0.4)
+PHI = 0.9  # trend damping: a week ahead never extrapolates a short run too far
+Z90 = 1.2816  # one-sided 90% normal quantile
+
+
+def param_grid() -> np.ndarray:
+    """(P, 3) candidate (alpha, beta, gamma) rows."""
+    return np.array(list(itertools.product(ALPHAS, BETAS, GAMMAS)), dtype=np.float64)
+
+
+def fit_forecast(y, horizon: int = 7, season: int = SEASON, grid=None) -> dict:
+    """
+    Fit every row of `y` and forecast the `horizon` days after its last column.
+
+    Returns:
+        {
+          "forecast": (n, horizon), never negative,
+          "upper": (n, horizon), forecast + Z90 * rmse,
+          "rmse": (n,), one-step-ahead error of the chosen parameters,
+          "params": (n, 3), chosen (alpha, beta, gamma),
+        }
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if y.ndim != 2 or y.shape[1] < 2 * season:
+        raise ValueError(f"need an (n, T) matrix with T >= {2 * season}")
+    n, days = y.shape
+    grid = param_grid() if grid is None else np.asarray(grid, dtype=np.float64).reshape(-1, 3)
+    alpha, beta, gamma = (grid[:, k, None] for k in range(3))  # (P, 1) each
+    candidates = len(grid)
+
+    first, second = y[:, :season], y[:, season : 2 * season]
+    level0 = first.mean(axis=1)
+    level = np.repeat(level0[None, :], candidates, axis=0)
+    trend = np.repeat(((second.mean(axis=1) - level0) / season)[None, :], candidates, axis=0)
+    seasonal = np.repeat((first - level0[:, None])[None, :, :], candidates, axis=0)
+    sse = np.zeros((candidates, n))
+
+    for t in range(season, days):
+        slot = t % season
+        s = seasonal[:, :, slot]
+        damped = PHI * trend
+        err = y[:, t] - (level + damped + s)
+        sse += err * err
+        level = level + damped + alpha * err
+        trend = damped + alpha * beta * err
+        seasonal[:, :, slot] = s + gamma * (1 - alpha) * err
+
+    best = sse.argmin(axis=0)
+    cols = np.arange(n)
+    level, trend = level[best, cols], trend[best, cols]
+    seasonal = seasonal[best, cols]  # (n, season)
+
+    steps = np.arange(1, horizon + 1)
+    damping = np.cumsum(PHI**steps)
+    forecast = level[:, None] + trend[:, None] * damping[None, :] + seasonal[:, (days + steps - 1) % season]
+    forecast = np.maximum(forecast, 0.0)
+    rmse = np.sqrt(sse[best, cols] / (days - season))
+    return {
+        "forecast": forecast,
+        "upper": forecast + Z90 * rmse[:, None],
+        "rmse": rmse,
+        "params": grid[best],
+    }
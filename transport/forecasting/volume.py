@@ -0,0 +1,180 @@
+"""
+Daily pickup volume forecast per Customer Site.
+
+forecast_site_volumes runs at the start of the nightly route planning (see
+ensure_forecasts). It loads the last `site_forecast_history_days` of Final
+FSLs, up to yesterday, with one grouped query. It builds two (sites x days) matrices, qty_or_weight and
+package_count, where a day without a pickup counts as 0. It fits
+transport.forecasting.holt_winters to every site at once and replaces the
+`Site Volume Forecast` rows from today on. Forecasts older than
+FORECAST_RETENTION_DAYS are purged by the same job.
+
+An FSL counts for its site. An FSL without a site counts for its customer's
+site when the customer has exactly one.
+
+site_forecasts() is the lookup the route planner uses.
+
+Site config (all optional):
+- site_forecast_history_days (default 84; at least 14)
+- site_forecast_horizon_days (default 7)
+- site_forecast_min_pickups (default 4; sites with fewer pickup days are skipped)
+"""
+
+import time
+
+import frappe
+import numpy as np
+from frappe.utils import add_days, cint, getdate, now_datetime, nowdate
+
+from transport.forecasting.holt_winters import SEASON, fit_forecast
+
+FSL_DOCTYPE = "Field Service Log"
+FORECAST_DOCTYPE = "Site Volume Forecast"
+FORECAST_RETENTION_DAYS = 90
+IN_CHUNK = 5000
+
+HISTORY_QUERY = f"""
+    SELECT
+        COALESCE(NULLIF(f.site, ''), one.site) AS resolved_site,
+        DATEDIFF(f.trip_date, %(start)s) AS day,
+        SUM(f.qty_or_weight),
+        SUM(f.package_count)
+    FROM `tab{FSL_DOCTYPE}` f
+    LEFT JOIN (
+        SELECT customer, MIN(name) AS site
+        FROM `tabCustomer Site`
+        GROUP BY customer
+        HAVING COUNT(*) = 1
+    ) one ON one.customer = f.customer
+    WHERE f.status = 'Final' AND f.trip_date BETWEEN %(start)s AND %(end)s
+    GROUP BY resolved_site, f.trip_date
+    HAVING resolved_site IS NOT NULL
+"""
+
+
+def _conf_int(key: str, default: int) -> int:
+    return cint(frappe.conf.get(key)) or default
+
+
+def load_history(start, days: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(site names, qty (n, days), packages (n, days)) from Final FSLs in [start, start + days)."""
+    rows = frappe.db.sql(HISTORY_QUERY, {"start": start, "end": add_days(start, days - 1)})
+    if not rows:
+        return np.empty(0, dtype=object), np.zeros((0, days)), np.zeros((0, days))
+
+    names, day, qty, packages = zip(*rows, strict=True)
+    sites, index = np.unique(np.array(names, dtype=object).astype(str), return_inverse=True)
+    day = np.asarray(day, dtype=np.int64)
+    qty_matrix = np.zeros((len(sites), days))
+    package_matrix = np.zeros((len(sites), days))
+    np.add.at(qty_matrix, (index, day), np.asarray(qty, dtype=np.float64))
+    np.add.at(package_matrix, (index, day), np.asarray(packages, dtype=np.float64))
+    return sites, qty_matrix, package_matrix
+
+
+def _site_customers() -> dict:
+    return dict(frappe.db.sql("SELECT name, customer FROM `tabCustomer Site`"))
+
+
+def forecast_site_volumes(as_of=None):
+    """Forecast every site with enough history (from ensure_forecasts, or by hand)."""
+    started = time.perf_counter()
+    today = getdate(as_of or nowdate())
+    history = max(_conf_int("site_forecast_history_days", 84), 2 * SEASON)
+    horizon = _conf_int("site_forecast_horizon_days", 7)
+    min_pickups = _conf_int("site_forecast_min_pickups", 4)
+
+    sites, qty, packages = load_history(add_days(today, -history), history)
+    pickup_days = (qty > 0).sum(axis=1)
+    keep = pickup_days >= min_pickups
+    sites, qty, packages, pickup_days = sites[keep], qty[keep], packages[keep], pickup_days[keep]
+
+    frappe.db.delete(FORECAST_DOCTYPE, {"forecast_date": [">=", today]})
+    frappe.db.delete(FORECAST_DOCTYPE, {"forecast_date": ["<", add_days(today, -FORECAST_RETENTION_DAYS)]})
+    if not len(sites):
+        frappe.db.commit()
+        return {"sites": 0}
+
+    qty_fit = fit_forecast(qty, horizon)
+    package_fit = fit_forecast(packages, horizon)
+
+    customers = _site_customers()
+    dates = [add_days(today, h) for h in range(horizon)]
+    now = now_datetime()
+    user = frappe.session.user
+    values = []
+    for i, site in enumerate(sites.tolist()):
+        params = "/".join(f"{p:g}" for p in qty_fit["params"][i])
+        for h, forecast_date in enumerate(dates):
+            values.append(
+                (
+                    f"SVF-{site}-{forecast_date}",
+                    now,
+                    now,
+                    user,
+                    user,
+                    site,
+                    customers.get(site),
+                    forecast_date,
+                    round(float(qty_fit["forecast"][i, h]), 3),
+                    round(float(qty_fit["upper"][i, h]), 3),
+                    round(float(package_fit["forecast"][i, h]), 3),
+                    today,
+                    history,
+                    int(pickup_days[i]),
+                    round(float(qty_fit["rmse"][i]), 3),
+                    params,
+                )
+            )
+
+    frappe.db.bulk_insert(
+        FORECAST_DOCTYPE,
+        fields=[
+            "name",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+            "site",
+            "customer",
+            "forecast_date",
+            "qty_forecast",
+            "qty_upper",
+            "package_forecast",
+            "generated_on",
+            "history_days",
+            "pickup_days",
+            "qty_rmse",
+            "parameters",
+        ],
+        values=values,
+    )
+    frappe.db.commit()
+
+    seconds = round(time.perf_counter() - started, 2)
+    frappe.logger("transport").info(f"[forecast] {len(sites)} sites x {horizon} days in {seconds}s")
+    return {"sites": len(sites), "rows": len(values), "seconds": seconds}
+
+
+def ensure_forecasts():
+    """Forecast now unless today's run already happened (route planning calls this first)."""
+    if not frappe.db.exists(FORECAST_DOCTYPE, {"generated_on": getdate(nowdate())}):
+        forecast_site_volumes()
+
+
+def site_forecasts(sites, forecast_date) -> dict:
+    """{site: {"qty", "upper", "packages"}} for `forecast_date`; sites without a forecast are left out."""
+    sites = sorted({s for s in sites if s})
+    out = {}
+    for start in range(0, len(sites), IN_CHUNK):
+        rows = frappe.db.sql(
+            f"""
+            SELECT site, qty_forecast, qty_upper, package_forecast
+            FROM `tab{FORECAST_DOCTYPE}`
+            WHERE forecast_date = %(date)s AND site IN %(sites)s
+            """,
+            {"date": getdate(forecast_date), "sites": tuple(sites[start : start + IN_CHUNK])},
+        )
+        for site, qty, upper, packages in rows:
+            out[site] = {"qty": qty, "upper": upper, "packages": packages}
+    return out
@@ -43,10 +43,55 @@ doc_events = {
         "after_insert": [
             "transport.driver_hooks.create_user.create_user_for_driver",
             "transport.driver_hooks.create_employee.create_employee_for_driver"
-        ]
+        ],
+        "on_update": "transport.api.field_bootstrap.on_driver_update",
     }
 }
 
+# Retry-After header for 429/503 responses from the FSL write endpoints
+after_request = [
+    "transport.api.admission.set_retry_after_header",
+    "transport.api.field_assets.set_asset_cache_headers",
+]
+
+# Called with a list of FSL names right after they become Final, in the same
+# transaction (single and bulk finalize, stale-draft sweeper).
+# See transport.finalization.bulk.run_finalize_hooks
+fsl_on_finalize = [
+    "transport.outbox.events.enqueue_fsl_finalized",
+    "transport.stats.weights.update_weight_stats",
+    "transport.board.events.on_fsl_finalized",
+    "transport.portal.history.on_fsl_finalized",
+]
+
+# Customer portal: /pickups (transport.portal.history)
+portal_menu_items = [
+    {"title": "Pickup History", "route": "/pickups", "role": "Customer"},
+]
+
+scheduler_events = {
+    "cron": {
+        "* * * * *": [
+            "transport.outbox.dispatcher.dispatch_outbox",
+            "transport.tracing.spans.flush_traces",
+        ],
+        "*/5 * * * *": [
+            "transport.photos.jobs.hash_recent_photos",
+        ],
+        "*/15 * * * *": [
+            "transport.directory.snapshot.build_directories",
+        ],
+    },
+    "daily": [
+        "transport.finalization.sweeper.sweep_stale_drafts",
+    ],
+    "daily_long": [
+        "transport.routing.fleet.plan_fleet_routes",
+        "transport.archival.jobs.run_archival",
+        "transport.manifests.jobs.render_previous_day",
+    ],
+}
+
 # csrf_exempt = [
 #     r"^/api/method/transport\.api\.fsl\.create_draft_fsl$",
 #     r"^/api/method/transport\.api\.field_auth\.exchange_qr_for_field_token$",
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for FSL payload parsing (transport.api.fsl_schema).
+
+Payloads are shaped like the ones payloadFromForm() in fsl.js sends: numbers
+from form inputs, booleans from checkboxes, an ISO timestamp with "Z", and a
+base64 photo data URL. The photo is not a stored field, but it still has to
+be decoded. It is compared with the previous parser (json + get_datetime,
+values passed through). See `bench --site <site> fsl-payload-bench --help`.
+"""
+
+import base64
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from frappe.utils import get_datetime
+
+from transport.api import fsl_schema
+from transport.api.fsl_schema import parse_payload
+
+PHOTO_BYTES = 120 * 1024  # a compressed phone photo
+
+
+def make_payloads(count: int, seed: int = 13) -> list[str]:
+    rng = random.Random(seed)
+    photo = "data:image/jpeg;base64," + base64.b64encode(rng.randbytes(PHOTO_BYTES)).decode()
+    start = datetime(2026, 10, 19, 7, 0)
+
+    payloads = []
+    for i in range(count):
+        safe = rng.random() > 0.1
+        payload = {
+            "qty_or_weight": round(rng.uniform(0.5, 120), 1) if i % 4 else f"{rng.uniform(0.5, 120):.1f}",
+            "package_count": rng.randint(1, 8),
+            "photo_data_url": photo if i % 3 == 0 else None,
+            "is_waste_safe": safe,
+            "is_waste_collected": rng.random() > 0.05,
+            "performed_at": (start + timedelta(seconds=rng.randint(0, 36000))).isoformat(
+                timespec="milliseconds"
+            )
+            + "Z",
+            "gps_lat": 35.6 + rng.random() * 0.3,
+            "gps_lng": 51.2 + rng.random() * 0.4,
+        }
+        if not safe:
+            payload.update(
+                safety_issue_reason="کیسه پاره شده و نشتی دارد",
+                is_safety_critical=rng.random() > 0.5,
+                is_safety_resolved=False,
+            )
+        payloads.append(json.dumps(payload, ensure_ascii=False))
+    return payloads
+
+
+def legacy_parse(payload_json: str, allowed_fields) -> dict:
+    """The pre-schema _parse_payload, kept here as the baseline."""
+    data = json.loads(payload_json or "{}")
+    if not isinstance(data, dict):
+        return {}
+    out = {k: v for k, v in data.items() if k in allowed_fields}
+    ts = out.get("performed_at")
+    if ts:
+        dt = get_datetime(ts)
+        if getattr(dt, "tzinfo", None):
+            dt = dt.replace(tzinfo=None)
+        out["performed_at"] = dt
+    return out
+
+
+def _time(fn, payloads, allowed_fields, rounds) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for raw in payloads:
+            fn(raw, allowed_fields)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_bench(allowed_fields, count: int = 2000, rounds: int = 5) -> dict:
+    payloads = make_payloads(count)
+    parse_payload(payloads[0], allowed_fields)  # compile the schema outside the timing
+
+    results = {"payloads": count, "json_decoder": "orjson" if fsl_schema.orjson else "json"}
+    for label, fn in (("legacy", legacy_parse), ("schema", parse_payload)):
+        elapsed = _time(fn, payloads, allowed_fields, rounds)
+        results[label] = {
+            "us_per_payload": round(elapsed / count * 1e6, 2),
+            "payloads_per_sec": round(count / elapsed),
+        }
+    results["speedup"] = round(results["legacy"]["us_per_payload"] / results["schema"]["us_per_payload"], 2)
+    return results
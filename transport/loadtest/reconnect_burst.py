@@ -0,0 +1,104 @@
+"""
+Reconnect-burst load test for the FSL write endpoints.
+
+Simulates N devices coming back online at the same instant, each flushing a
+queue of drafts to upsert_draft_fsl the way the service worker does: items in
+order, stopping on 429/503 and retrying after Retry-After plus jitter.
+Reports latency percentiles (including the peak) and status counts.
+
+Run it against a test site; it creates real draft FSLs. See
+`bench --site <site> fsl-reconnect-burst --help`.
+"""
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import requests
+
+UPSERT_PATH = "/api/method/transport.api.fsl.upsert_draft_fsl"
+THROTTLE_STATUSES = (429, 503)
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _device(base_url, device, items, barrier, results, max_attempts, timeout):
+    session = requests.Session()
+    barrier.wait()
+
+    for idx in range(items):
+        payload = {
+            "qty_or_weight": round(random.uniform(1, 80), 1),
+            "package_count": random.randint(1, 6),
+            "is_waste_safe": 1,
+            "is_waste_collected": 1,
+            "performed_at": datetime.utcnow().isoformat(),
+            "notes": f"burst device={device['id']} item={idx}",
+        }
+        body = {
+            "qr_token": device["qr_token"],
+            "driver_canonical_id": device["driver_canonical_id"],
+            "payload_json": json.dumps(payload),
+        }
+
+        for attempt in range(1, max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                res = session.post(base_url + UPSERT_PATH, json=body, timeout=timeout)
+                status = res.status_code
+                retry_after = float(res.headers.get("Retry-After") or 0)
+            except requests.RequestException:
+                status, retry_after = 0, 0
+            latency_ms = (time.perf_counter() - started) * 1000
+            results.append({"device": device["id"], "status": status, "latency_ms": latency_ms})
+
+            if status not in THROTTLE_STATUSES:
+                break
+            # same policy as the SW: honour the hint, add jittered exponential backoff
+            backoff = min(60.0, 2 ** (attempt - 1))
+            time.sleep(max(retry_after, backoff / 2 + random.random() * backoff / 2))
+
+
+def run_burst(base_url: str, devices: list[dict], items: int = 3, max_attempts: int = 5, timeout: float = 60):
+    """Fire all devices at once; return a summary dict."""
+    results = []
+    barrier = threading.Barrier(len(devices))
+    threads = [
+        threading.Thread(
+            target=_device,
+            args=(base_url.rstrip("/"), device, items, barrier, results, max_attempts, timeout),
+            daemon=True,
+        )
+        for device in devices
+    ]
+
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - started
+
+    latencies = [r["latency_ms"] for r in results]
+    return {
+        "devices": len(devices),
+        "requests": len(results),
+        "wall_seconds": round(wall_s, 2),
+        "status_counts": dict(Counter(r["status"] for r in results)),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 1),
+            "p95": round(percentile(latencies, 95), 1),
+            "p99": round(percentile(latencies, 99), 1),
+            "peak": round(max(latencies or [0]), 1),
+        },
+    }
@@ -0,0 +1,299 @@
+"""
+Daily waste manifests: one signed PDF per customer per collection day.
+
+The parent process loads the day's Final FSLs, groups them by customer and
+signs each manifest (HMAC-SHA256 over its content). The PDFs are rendered in
+a process pool (see manifests.render). Each finished PDF is attached to its
+Waste Manifest and committed straight away, so an interrupted run resumes
+where it stopped. Manifests already Rendered from the same FSLs (same
+content_hash) are skipped.
+
+Site config:
+- manifest_hmac_secret (required; without it the nightly job does nothing,
+  see manifests_enabled)
+- manifest_render_workers (default: CPU count)
+"""
+
+import hashlib
+import hmac
+import io
+import json
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import frappe
+from frappe.utils import add_days, flt, getdate, now_datetime, nowdate
+
+from transport.manifests.render import init_worker, render_manifest
+from transport.utils.files import local_file_path
+
+MANIFEST_DOCTYPE = "Waste Manifest"
+FSL_DOCTYPE = "Field Service Log"
+PROGRESS_EVENT = "manifest_render_progress"
+TEMPLATE_PATH = ("templates", "manifest", "waste_manifest.html")
+
+MANIFEST_QUERY = f"""
+    SELECT
+        fsl.name, fsl.modified, fsl.trip_id, fsl.customer, c.customer_name,
+        fsl.site, cs.address, fsl.driver, d.full_name AS driver_name,
+        fsl.performed_at, fsl.qty_or_weight, fsl.package_count,
+        fsl.is_waste_safe, fsl.safety_issue_reason,
+        fsl.is_safety_critical, fsl.is_safety_resolved,
+        fsl.photo, fsl.safety_issue_photo
+    FROM `tab{FSL_DOCTYPE}` fsl
+    LEFT JOIN `tabCustomer` c ON c.name = fsl.customer
+    LEFT JOIN `tabCustomer Site` cs ON cs.name = fsl.site
+    LEFT JOIN `tabDriver` d ON d.name = fsl.driver
+    WHERE fsl.trip_date = %(manifest_date)s AND fsl.status = 'Final'
+    ORDER BY fsl.customer, fsl.performed_at, fsl.name
+"""
+
+
+# ------------------------------
+# Content and signature
+# ------------------------------
+
+
+def manifests_enabled() -> bool:
+    """True when manifest_hmac_secret is set; the nightly job is skipped otherwise."""
+    return bool(frappe.conf.get("manifest_hmac_secret"))
+
+
+def _secret() -> bytes:
+    secret = frappe.conf.get("manifest_hmac_secret")
+    if not secret:
+        frappe.throw("manifest_hmac_secret not set in site_config.json")
+    return secret.encode()
+
+
+def content_hash(rows) -> str:
+    """Changes whenever an FSL is added, removed or edited."""
+    raw = "\n".join(f"{r.name}|{r.modified}" for r in rows).encode()
+    return hashlib.sha256(raw).hexdigest()
+
+
+def manifest_signature(customer: str, manifest_date, rows, secret: bytes) -> str:
+    """HMAC-SHA256 over the regulated content of a manifest (stable JSON)."""
+    unsigned = {
+        "v": 1,
+        "customer": customer,
+        "date": str(manifest_date),
+        "rows": [
+            [
+                r.trip_id,
+                str(r.performed_at or ""),
+                flt(r.qty_or_weight),
+                int(r.package_count or 0),
+                int(r.is_waste_safe or 0),
+                r.safety_issue_reason or "",
+                int(r.is_safety_critical or 0),
+                int(r.is_safety_resolved or 0),
+            ]
+            for r in rows
+        ],
+    }
+    raw = json.dumps(unsigned, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode()
+    return hmac.new(secret, raw, hashlib.sha256).hexdigest()
+
+
+# ------------------------------
+# Manifest records
+# ------------------------------
+
+
+def _totals(rows) -> dict:
+    return {
+        "fsl_count": len(rows),
+        "total_weight": sum(flt(r.qty_or_weight) for r in rows),
+        "total_packages": sum(int(r.package_count or 0) for r in rows),
+        "safety_issues": sum(1 for r in rows if not r.is_waste_safe),
+    }
+
+
+def _upsert_pending(customer: str, manifest_date, totals: dict, digest: str, signature: str) -> str:
+    values = {
+        "status": "Pending",
+        **totals,
+        "content_hash": digest,
+        "signature": signature,
+        "error": None,
+    }
+    existing = frappe.db.get_value(MANIFEST_DOCTYPE, {"customer": customer, "manifest_date": manifest_date}, "name")
+    if existing:
+        frappe.db.set_value(MANIFEST_DOCTYPE, existing, values)
+        return existing
+
+    doc = frappe.get_doc({"doctype": MANIFEST_DOCTYPE, "customer": customer, "manifest_date": manifest_date, **values})
+    doc.insert(ignore_permissions=True)
+    return doc.name
+
+
+def _build_tasks(manifest_date) -> list[dict]:
+    """Manifests to render for the day; up-to-date ones are skipped (resume)."""
+    rows = frappe.db.sql(MANIFEST_QUERY, {"manifest_date": manifest_date}, as_dict=True)
+    by_customer = {}
+    for row in rows:
+        by_customer.setdefault(row.customer, []).append(row)
+
+    done = {
+        m.customer: m.content_hash
+        for m in frappe.get_all(
+            MANIFEST_DOCTYPE,
+            filters={"manifest_date": manifest_date, "status": "Rendered"},
+            fields=["customer", "content_hash"],
+        )
+    }
+
+    secret = _secret()
+    generated_at = now_datetime().strftime("%Y-%m-%d %H:%M")
+    tasks = []
+    for customer, customer_rows in by_customer.items():
+        digest = content_hash(customer_rows)
+        if done.get(customer) == digest:
+            continue
+
+        signature = manifest_signature(customer, manifest_date, customer_rows, secret)
+        totals = _totals(customer_rows)
+        name = _upsert_pending(customer, manifest_date, totals, digest, signature)
+        tasks.append(
+            {
+                "name": name,
+                "customer": customer,
+                "customer_name": customer_rows[0].customer_name,
+                "manifest_date": str(manifest_date),
+                "generated_at": generated_at,
+                "signature": signature,
+                "content_hash": digest,
+                **totals,
+                "rows": [
+                    {
+                        **{k: row[k] for k in row if k not in ("photo", "safety_issue_photo", "modified")},
+                        "performed_at": str(row.performed_at or ""),
+                        "photo_paths": [p for p in map(local_file_path, (row.photo, row.safety_issue_photo)) if p],
+                    }
+                    for row in customer_rows
+                ],
+            }
+        )
+    frappe.db.commit()
+    return tasks
+
+
+def _save_result(result: dict):
+    name = result["name"]
+    if result.get("error"):
+        frappe.db.set_value(MANIFEST_DOCTYPE, name, {"status": "Failed", "error": result["error"][:1000]})
+        frappe.db.commit()
+        return
+
+    for old in frappe.get_all(
+        "File", filters={"attached_to_doctype": MANIFEST_DOCTYPE, "attached_to_name": name}, pluck="name"
+    ):
+        frappe.delete_doc("File", old, ignore_permissions=True)
+
+    file_doc = frappe.get_doc(
+        {
+            "doctype": "File",
+            "file_name": f"{name}.pdf",
+            "attached_to_doctype": MANIFEST_DOCTYPE,
+            "attached_to_name": name,
+            "attached_to_field": "manifest_file",
+            "is_private": 1,
+            "content": result["pdf"],
+        }
+    )
+    file_doc.insert(ignore_permissions=True)
+    frappe.db.set_value(
+        MANIFEST_DOCTYPE,
+        name,
+        {"status": "Rendered", "pages": result["pages"], "manifest_file": file_doc.file_url, "error": None},
+    )
+    frappe.db.commit()
+
+
+def _zip_day(manifest_date) -> str:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for m in frappe.get_all(
+            MANIFEST_DOCTYPE,
+            filters={"manifest_date": manifest_date, "status": "Rendered"},
+            fields=["name", "manifest_file"],
+            order_by="name asc",
+        ):
+            content = frappe.get_doc("File", {"file_url": m.manifest_file}).get_content()
+            zf.writestr(f"{m.name}.pdf", content)
+
+    file_doc = frappe.get_doc(
+        {
+            "doctype": "File",
+            "file_name": f"waste-manifests-{manifest_date}.zip",
+            "is_private": 1,
+            "content": buf.getvalue(),
+        }
+    )
+    file_doc.insert(ignore_permissions=True)
+    frappe.db.commit()
+    return file_doc.file_url
+
+
+# ------------------------------
+# Job entry points
+# ------------------------------
+
+
+def render_daily_manifests(manifest_date=None, zip_output=False, user=None) -> dict:
+    """Background job: render every outstanding manifest of the day."""
+    manifest_date = getdate(manifest_date or nowdate())
+    tasks = _build_tasks(manifest_date)
+    template_source = open(frappe.get_app_path("transport", *TEMPLATE_PATH), encoding="utf-8").read()
+
+    started = time.perf_counter()
+    stats = {"manifests": len(tasks), "rendered": 0, "failed": 0, "pages": 0}
+
+    def publish(**extra):
+        if user:
+            frappe.publish_realtime(PROGRESS_EVENT, {**stats, **extra}, user=user)
+
+    def collect(result):
+        _save_result(result)
+        if result.get("error"):
+            stats["failed"] += 1
+        else:
+            stats["rendered"] += 1
+            stats["pages"] += result["pages"]
+        elapsed = time.perf_counter() - started
+        publish(pages_per_sec=round(stats["pages"] / elapsed, 2) if elapsed else 0)
+
+    workers = int(frappe.conf.get("manifest_render_workers") or os.cpu_count() or 1)
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        init_worker(template_source)
+        for task in tasks:
+            collect(render_manifest(task))
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=ctx, initializer=init_worker, initargs=(template_source,)
+        ) as pool:
+            for future in as_completed([pool.submit(render_manifest, task) for task in tasks]):
+                collect(future.result())
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 2)
+    stats["pages_per_sec"] = round(stats["pages"] / elapsed, 2) if elapsed and stats["pages"] else 0
+    if zip_output:
+        stats["zip_url"] = _zip_day(manifest_date)
+
+    publish(done=True)
+    frappe.logger("transport").info(f"[manifests] {manifest_date}: {stats}")
+    return stats
+
+
+def render_previous_day():
+    """Nightly: manifests for yesterday's collections (scheduled daily_long)."""
+    if not manifests_enabled():
+        return {"manifests": 0}
+    return render_daily_manifests(add_days(nowdate(), -1))
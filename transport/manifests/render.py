@@ -0,0 +1,82 @@
+"""
+Worker side of manifest rendering (runs in a process pool; no DB access).
+
+Each worker compiles the manifest template once in init_worker and keeps it
+for every manifest it renders. Photo thumbnails are downscaled with Pillow
+and embedded as data URIs, so wkhtmltopdf never touches the file system or
+the network.
+"""
+
+import base64
+import io
+import time
+
+import jinja2
+import pdfkit
+from PIL import Image, ImageOps
+from pypdf import PdfReader
+
+THUMBNAIL_PX = 320
+THUMBNAIL_QUALITY = 70
+
+PDF_OPTIONS = {
+    "page-size": "A4",
+    "encoding": "UTF-8",
+    "margin-top": "14mm",
+    "margin-bottom": "14mm",
+    "margin-left": "12mm",
+    "margin-right": "12mm",
+    "disable-javascript": "",
+    "quiet": "",
+}
+
+_template = None  # compiled once per worker process
+
+
+def init_worker(template_source: str):
+    global _template
+    env = jinja2.Environment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+    _template = env.from_string(template_source)
+
+
+def thumbnail_jpeg(path: str, max_px: int = THUMBNAIL_PX) -> bytes | None:
+    """Downscaled JPEG of the photo at `path`; None if it is missing or unreadable."""
+    try:
+        with Image.open(path) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_px, max_px))
+            buf = io.BytesIO()
+            img.convert("RGB").save(buf, "JPEG", quality=THUMBNAIL_QUALITY, optimize=True)
+    except (OSError, ValueError):
+        return None
+    return buf.getvalue()
+
+
+def thumbnail_data_uri(path: str, max_px: int = THUMBNAIL_PX) -> str | None:
+    jpeg = thumbnail_jpeg(path, max_px)
+    if jpeg is None:
+        return None  # missing or unreadable photo: render the row without it
+    return "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii")
+
+
+def render_html(manifest: dict) -> str:
+    for row in manifest["rows"]:
+        row["thumbnails"] = [uri for uri in map(thumbnail_data_uri, row.pop("photo_paths", [])) if uri]
+    return _template.render(manifest=manifest)
+
+
+def render_manifest(manifest: dict) -> dict:
+    """Pool entry point: manifest dict -> {name, pdf, pages, seconds} or {name, error}."""
+    started = time.perf_counter()
+    try:
+        html = render_html(manifest)
+        pdf = pdfkit.from_string(html, False, options=PDF_OPTIONS)
+        pages = len(PdfReader(io.BytesIO(pdf)).pages)
+    except Exception as e:
+        return {"name": manifest["name"], "error": f"{type(e).__name__}: {e}"}
+    return {
+        "name": manifest["name"],
+        "pdf": pdf,
+        "pages": pages,
+        "seconds": time.perf_counter() - started,
+    }
@@ -0,0 +1,196 @@
+"""
+Background delivery of FSL Outbox Events (scheduled every minute).
+
+Each round claims a batch of due events by setting them to Sending, commits,
+and sends the batch to the configured sink (see transport.outbox.sinks).
+The results are then written back in a second short transaction, so no row
+lock is held during the remote call. A dispatcher that dies mid-batch
+leaves its claim to expire after CLAIM_TIMEOUT, and the batch is sent
+again under the same idempotency keys.
+
+Failed deliveries back off exponentially with jitter. An event is marked
+Failed when the sink rejects it or when it runs out of attempts. Each batch
+is logged in FSL Outbox Batch with its duration and events per second.
+
+Site config (all optional):
+- fsl_outbox_batch_size (default 100)
+- fsl_outbox_max_attempts (default 12)
+- fsl_outbox_backoff_base (default 30 seconds)
+- fsl_outbox_backoff_cap (default 3600 seconds)
+- fsl_outbox_max_seconds (default 50; one scheduler tick)
+"""
+
+import json
+import random
+import time
+
+import frappe
+from frappe.utils import add_to_date, cint, now_datetime
+
+from transport.outbox.events import OUTBOX_DOCTYPE
+from transport.outbox.sinks import SinkUnavailable, get_sink, outbox_enabled
+
+BATCH_DOCTYPE = "FSL Outbox Batch"
+CLAIM_TIMEOUT = 300  # seconds a claimed batch may stay in Sending
+
+
+def backoff_seconds(attempt: int, base: int = 30, cap: int = 3600, rand=random.random) -> int:
+    """Equal-jitter exponential backoff: half fixed, half random, capped."""
+    delay = min(cap, base * 2 ** max(0, attempt - 1))
+    return int(delay / 2 + rand() * delay / 2)
+
+
+def _claim_batch(size: int) -> list:
+    """Take up to `size` due events (or expired claims) and mark them Sending."""
+    now = now_datetime()
+    rows = frappe.db.sql(
+        f"""
+        SELECT name, event_type, idempotency_key, payload, attempts
+        FROM `tab{OUTBOX_DOCTYPE}`
+        WHERE (status = 'Pending' AND next_attempt_at <= %(now)s)
+           OR (status = 'Sending' AND next_attempt_at <= %(now)s)
+        ORDER BY next_attempt_at, name
+        LIMIT %(size)s
+        FOR UPDATE SKIP LOCKED
+        """,
+        {"now": now, "size": size},
+        as_dict=True,
+    )
+    if rows:
+        frappe.db.sql(
+            f"""
+            UPDATE `tab{OUTBOX_DOCTYPE}`
+            SET status = 'Sending', next_attempt_at = %(claim_until)s, modified = %(now)s
+            WHERE name IN %(names)s
+            """,
+            {
+                "now": now,
+                "claim_until": add_to_date(now, seconds=CLAIM_TIMEOUT),
+                "names": tuple(r.name for r in rows),
+            },
+        )
+    frappe.db.commit()
+    return rows
+
+
+def _mark_sent(names: list[str], batch: str, now):
+    if names:
+        frappe.db.sql(
+            f"""
+            UPDATE `tab{OUTBOX_DOCTYPE}`
+            SET status = 'Sent', sent_at = %(now)s, attempts = attempts + 1,
+                batch = %(batch)s, last_error = NULL, modified = %(now)s
+            WHERE name IN %(names)s
+            """,
+            {"now": now, "batch": batch, "names": tuple(names)},
+        )
+
+
+def _mark_failed(rows: list, error: str, batch: str, now, *, permanent: bool, retry_after: int | None = None):
+    conf = frappe.conf
+    max_attempts = cint(conf.get("fsl_outbox_max_attempts")) or 12
+    base = cint(conf.get("fsl_outbox_backoff_base")) or 30
+    cap = cint(conf.get("fsl_outbox_backoff_cap")) or 3600
+
+    for row in rows:
+        attempts = row.attempts + 1
+        if permanent or attempts >= max_attempts:
+            status, next_at = "Failed", None
+        else:
+            delay = max(backoff_seconds(attempts, base, cap), retry_after or 0)
+            status, next_at = "Pending", add_to_date(now, seconds=delay)
+
+        frappe.db.set_value(
+            OUTBOX_DOCTYPE,
+            row.name,
+            {
+                "status": status,
+                "attempts": attempts,
+                "next_attempt_at": next_at,
+                "last_error": error[:1000],
+                "batch": batch,
+            },
+            update_modified=True,
+        )
+
+
+def _log_batch(sink_name: str, started_at, elapsed: float, events: int, sent: int, failed: int, status, error):
+    doc = frappe.get_doc(
+        {
+            "doctype": BATCH_DOCTYPE,
+            "sink": sink_name,
+            "started_at": started_at,
+            "duration_ms": int(elapsed * 1000),
+            "http_status": status,
+            "events": events,
+            "sent": sent,
+            "failed": failed,
+            "events_per_sec": round(sent / elapsed, 2) if elapsed > 0 else sent,
+            "error": error,
+        }
+    )
+    doc.insert(ignore_permissions=True)
+    return doc.name
+
+
+def dispatch_batch(sink, size: int) -> dict | None:
+    rows = _claim_batch(size)
+    if not rows:
+        return None
+
+    events = [
+        {"idempotency_key": r.idempotency_key, "event_type": r.event_type, "payload": json.loads(r.payload)}
+        for r in rows
+    ]
+    started_at = now_datetime()
+    started = time.perf_counter()
+    sink_name = getattr(sink, "name", type(sink).__name__)
+
+    try:
+        result = sink.send(events)
+    except SinkUnavailable as e:
+        elapsed = time.perf_counter() - started
+        batch = _log_batch(sink_name, started_at, elapsed, len(rows), 0, len(rows), e.status, str(e))
+        _mark_failed(rows, str(e), batch, now_datetime(), permanent=False, retry_after=e.retry_after)
+        frappe.db.commit()
+        return {"events": len(rows), "sent": 0, "failed": len(rows), "unavailable": True}
+
+    elapsed = time.perf_counter() - started
+    rejected = [r for r in rows if r.idempotency_key in result.rejected]
+    sent = [r.name for r in rows if r.idempotency_key not in result.rejected]
+
+    error = "; ".join(sorted(set(result.rejected.values())))[:1000] or None
+    batch = _log_batch(sink_name, started_at, elapsed, len(rows), len(sent), len(rejected), result.status, error)
+    now = now_datetime()
+    _mark_sent(sent, batch, now)
+    for row in rejected:
+        _mark_failed([row], str(result.rejected[row.idempotency_key]), batch, now, permanent=True)
+    frappe.db.commit()
+    return {"events": len(rows), "sent": len(sent), "failed": len(rejected), "unavailable": False}
+
+
+def dispatch_outbox():
+    """Deliver due outbox events until the queue is empty, the sink is down or time is up."""
+    if not outbox_enabled():
+        return {"batches": 0}
+    if not frappe.db.exists(OUTBOX_DOCTYPE, {"status": ["in", ["Pending", "Sending"]]}):
+        return {"batches": 0}
+
+    sink = get_sink()
+    size = cint(frappe.conf.get("fsl_outbox_batch_size")) or 100
+    deadline = time.monotonic() + (cint(frappe.conf.get("fsl_outbox_max_seconds")) or 50)
+
+    totals = {"batches": 0, "sent": 0, "failed": 0}
+    while time.monotonic() < deadline:
+        outcome = dispatch_batch(sink, size)
+        if not outcome:
+            break
+        totals["batches"] += 1
+        totals["sent"] += outcome["sent"]
+        totals["failed"] += outcome["failed"]
+        if outcome["unavailable"]:
+            break  # let backoff space out the next attempt
+
+    if totals["batches"]:
+        frappe.logger("transport").info(f"[outbox] {totals}")
+    return totals
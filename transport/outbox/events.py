@@ -0,0 +1,82 @@
+"""
+Outbox events for finalized Field Service Logs.
+
+enqueue_fsl_finalized is an `fsl_on_finalize` hook, so the outbox rows are
+written in the same transaction that marks the FSLs Final. If the finalize
+rolls back, no event is left behind, and no committed Final FSL is missing
+its event. Delivery happens later in transport.outbox.dispatcher.
+
+Nothing is written while no sink is configured (sinks.outbox_enabled), so a
+site without the accounting bridge doesn't pile up Pending rows. FSLs
+finalized before the sink is configured get no event.
+"""
+
+import frappe
+from frappe.utils import now_datetime
+
+from transport.outbox.sinks import outbox_enabled
+
+OUTBOX_DOCTYPE = "FSL Outbox Event"
+FSL_FINALIZED = "fsl.finalized"
+
+PAYLOAD_QUERY = """
+    SELECT
+        f.name, f.trip_id, f.trip_date, f.performed_at, f.customer, f.site,
+        f.qty_or_weight, f.package_count, f.is_waste_collected,
+        f.driver, d.custom_sepidar_code AS driver_sepidar_code,
+        d.employee, d.custom_company AS company
+    FROM `tabField Service Log` f
+    LEFT JOIN `tabDriver` d ON d.name = f.driver
+    WHERE f.name IN %(names)s
+"""
+
+
+def idempotency_key(event_type: str, reference_name: str) -> str:
+    """Stable per (event, FSL): resends of the same event carry the same key."""
+    return f"{event_type}:{reference_name}"
+
+
+def enqueue_fsl_finalized(names: list[str]):
+    if not outbox_enabled():
+        return
+    rows = frappe.db.sql(PAYLOAD_QUERY, {"names": tuple(names)}, as_dict=True)
+    if not rows:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        OUTBOX_DOCTYPE,
+        fields=[
+            "name",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+            "event_type",
+            "reference_name",
+            "idempotency_key",
+            "status",
+            "attempts",
+            "next_attempt_at",
+            "payload",
+        ],
+        values=[
+            (
+                frappe.generate_hash(length=10),
+                now,
+                now,
+                user,
+                user,
+                FSL_FINALIZED,
+                row.name,
+                idempotency_key(FSL_FINALIZED, row.name),
+                "Pending",
+                0,
+                now,
+                frappe.as_json(row, indent=None),
+            )
+            for row in rows
+        ],
+        ignore_duplicates=True,
+    )
@@ -0,0 +1,111 @@
+"""
+Delivery targets for outbox events.
+
+A sink takes a list of event dicts ({idempotency_key, event_type, payload})
+and returns a SinkResult. Raise SinkUnavailable when the whole batch should
+be retried later (network error, 5xx, 429). The sink is chosen with
+"fsl_outbox_sink" in site_config.json: a dotted path to a callable that
+returns a sink. It defaults to HttpSink, which needs "fsl_outbox_url".
+With neither set the outbox is off (see outbox_enabled): no events are
+written and the dispatcher does nothing.
+"""
+
+import hashlib
+
+import frappe
+import requests
+
+
+class SinkUnavailable(Exception):
+    def __init__(self, message: str, status: int | None = None, retry_after: int | None = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class SinkResult:
+    def __init__(self, status: int | None = None, rejected: dict | None = None):
+        self.status = status
+        # idempotency_key -> error message, for events the sink rejected for good
+        self.rejected = rejected or {}
+
+
+def batch_key(events: list[dict]) -> str:
+    """Same events -> same key, so a retried batch is recognisable as a retry."""
+    keys = "\n".join(sorted(e["idempotency_key"] for e in events))
+    return hashlib.sha256(keys.encode()).hexdigest()[:32]
+
+
+class HttpSink:
+    """
+    POST {"events": [...]} as JSON to the accounting bridge.
+
+    Sends an Idempotency-Key header for the batch, and every event carries its
+    own key. A 2xx response may list per-event rejections as
+    {"rejected": {"<key>": "reason"}}. 409 counts as already delivered.
+    Other 4xx responses reject the whole batch.
+
+    Site config:
+    - fsl_outbox_url (required)
+    - fsl_outbox_token (optional; sent as Authorization: Bearer)
+    - fsl_outbox_timeout (default 10 seconds)
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, token: str | None = None, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def send(self, events: list[dict]) -> SinkResult:
+        try:
+            res = self.session.post(
+                self.url,
+                json={"events": events},
+                headers={"Idempotency-Key": batch_key(events)},
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise SinkUnavailable(f"{type(e).__name__}: {e}")
+
+        if res.status_code == 409:
+            return SinkResult(status=409)
+        if res.status_code == 429 or res.status_code >= 500:
+            retry_after = res.headers.get("Retry-After")
+            raise SinkUnavailable(
+                f"HTTP {res.status_code}",
+                status=res.status_code,
+                retry_after=int(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        if res.status_code >= 400:
+            reason = f"HTTP {res.status_code}: {res.text[:500]}"
+            return SinkResult(status=res.status_code, rejected={e["idempotency_key"]: reason for e in events})
+
+        try:
+            body = res.json() or {}
+        except ValueError:
+            body = {}
+        return SinkResult(status=res.status_code, rejected=dict(body.get("rejected") or {}))
+
+
+def http_sink() -> HttpSink:
+    url = frappe.conf.get("fsl_outbox_url")
+    if not url:
+        frappe.throw("fsl_outbox_url is not set in site_config.json")
+    return HttpSink(
+        url,
+        token=frappe.conf.get("fsl_outbox_token"),
+        timeout=float(frappe.conf.get("fsl_outbox_timeout") or 10),
+    )
+
+
+def outbox_enabled() -> bool:
+    """True when a sink is configured: a custom fsl_outbox_sink or the HTTP sink's URL."""
+    return bool(frappe.conf.get("fsl_outbox_sink") or frappe.conf.get("fsl_outbox_url"))
+
+
+def get_sink():
+    return frappe.get_attr(frappe.conf.get("fsl_outbox_sink") or "transport.outbox.sinks.http_sink")()
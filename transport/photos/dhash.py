@@ -0,0 +1,82 @@
+"""
+Perceptual hashing of pickup photos (no DB access).
+
+dHash: the photo is shrunk to 9x8 grey pixels and each bit says whether a
+pixel is brighter than its right-hand neighbour. Recompression, resizing and
+small crops flip only a few of the 64 bits, so re-uploads of the same photo
+sit within a small Hamming distance of each other.
+
+For lookups the hash is split into BANDS 16-bit bands (multi-index hashing):
+two hashes within distance d agree to within d // BANDS bits on at least one
+band, so candidates come from a few indexed equality probes per band instead
+of a scan over every stored hash.
+"""
+
+from itertools import combinations
+
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8
+BANDS = 4
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+MAX_PROBE_RADIUS = 2  # 1 + 16 + 120 probes per band
+
+# near-blank photos (lens cap, pocket shots) all hash alike; never flag them
+MIN_INFO_BITS = 6
+
+
+def dhash_image(img: Image.Image) -> int:
+    img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))  # JPEG: decode at reduced size
+    img = ImageOps.exif_transpose(img)
+    gray = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS)
+    px = np.asarray(gray, dtype=np.int16)
+    bits = (px[:, 1:] > px[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def dhash_file(path: str) -> int | None:
+    try:
+        with Image.open(path) as img:
+            return dhash_image(img)
+    except (OSError, ValueError):
+        return None  # missing or unreadable file
+
+
+def to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def from_hex(text: str) -> int:
+    return int(text, 16)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def is_informative(value: int) -> bool:
+    return MIN_INFO_BITS <= value.bit_count() <= 64 - MIN_INFO_BITS
+
+
+def bands(value: int) -> list[int]:
+    """The BANDS band values, most significant first."""
+    return [(value >> (BAND_BITS * (BANDS - 1 - i))) & BAND_MASK for i in range(BANDS)]
+
+
+def probes(band: int, radius: int) -> list[int]:
+    """Every BAND_BITS-bit value within `radius` bits of `band`."""
+    out = [band]
+    for r in range(1, min(radius, MAX_PROBE_RADIUS) + 1):
+        for bits in combinations(range(BAND_BITS), r):
+            flipped = band
+            for bit in bits:
+                flipped ^= 1 << bit
+            out.append(flipped)
+    return out
+
+
+def probe_radius(max_distance: int) -> int:
+    # pigeonhole: some band differs in at most max_distance // BANDS bits
+    return min(max_distance // BANDS, MAX_PROBE_RADIUS)
@@ -0,0 +1,165 @@
+"""
+Index FSL photos by perceptual hash and flag reused ones.
+
+hash_recent_photos (every five minutes) picks up FSLs whose `photo` changed
+since the last run, hashes the file and stores it in `FSL Photo Hash` (one row
+per FSL, with the four band values indexed). If an earlier photo from a
+different trip is within `fsl_photo_reuse_distance` bits, the FSL gets
+needs_review, a review_reason and photo_reused_from. Photos that cannot be
+read (external URL, missing file) are recorded without a hash and skipped.
+
+For existing data run backfill_photo_hashes once, e.g.
+`bench --site <site> execute transport.photos.jobs.backfill_photo_hashes`.
+
+Site config (all optional):
+- fsl_photo_reuse_distance (default 6, at most 11)
+- fsl_photo_hash_lookback_hours (default 24)
+- fsl_photo_hash_batch (default 500)
+"""
+
+import frappe
+from frappe.utils import add_to_date, now_datetime
+
+from transport.photos.dhash import (
+    BANDS,
+    MAX_PROBE_RADIUS,
+    bands,
+    dhash_file,
+    from_hex,
+    hamming,
+    is_informative,
+    probe_radius,
+    probes,
+    to_hex,
+)
+from transport.utils.files import local_file_path
+
+FSL_DOCTYPE = "Field Service Log"
+HASH_DOCTYPE = "FSL Photo Hash"
+MAX_DISTANCE = BANDS * (MAX_PROBE_RADIUS + 1) - 1
+
+# FSLs whose current photo has no hash yet
+PENDING_QUERY = """
+    SELECT f.name, f.trip_id, f.driver, f.photo, f.review_reason
+    FROM `tabField Service Log` f
+    LEFT JOIN `tabFSL Photo Hash` h ON h.name = f.name
+    WHERE f.photo IS NOT NULL AND f.photo != ''
+      AND (h.name IS NULL OR h.photo != f.photo)
+      AND {where}
+    ORDER BY {order}
+    LIMIT %(limit)s
+"""
+
+
+def _conf_int(key: str, default: int) -> int:
+    return int(frappe.conf.get(key) or default)
+
+
+def max_distance() -> int:
+    return min(_conf_int("fsl_photo_reuse_distance", 6), MAX_DISTANCE)
+
+
+def find_near_duplicate(value: int, trip_id: str, distance: int) -> tuple[str, int] | None:
+    """Closest stored photo from another trip within `distance` bits: (fsl, distance) or None."""
+    radius = probe_radius(distance)
+    selects, params = [], {"trip_id": trip_id or ""}
+    for i, band in enumerate(bands(value)):
+        params[f"b{i}"] = tuple(probes(band, radius))
+        selects.append(f"SELECT name, phash FROM `tab{HASH_DOCTYPE}` WHERE band_{i} IN %(b{i})s")
+
+    candidates = frappe.db.sql(
+        f"""
+        SELECT c.name, c.phash
+        FROM ({" UNION ".join(selects)}) c
+        JOIN `tab{HASH_DOCTYPE}` h ON h.name = c.name
+        WHERE IFNULL(h.trip_id, '') != %(trip_id)s
+        """,
+        params,
+    )
+
+    best = None
+    for name, phash in candidates:
+        d = hamming(value, from_hex(phash))
+        if d <= distance and (best is None or d < best[1] or (d == best[1] and name < best[0])):
+            best = (name, d)
+    return best
+
+
+def _save_hash(row, value: int | None, match=None):
+    # an unreadable photo is stored without a hash (band -1 is never probed)
+    band_values = bands(value) if value is not None else [-1] * BANDS
+    fields = {
+        "trip_id": row.trip_id,
+        "driver": row.driver,
+        "photo": row.photo,
+        "phash": to_hex(value) if value is not None else "",
+        **{f"band_{i}": band for i, band in enumerate(band_values)},
+        "match_fsl": match[0] if match else None,
+        "match_distance": match[1] if match else 0,
+    }
+    if frappe.db.exists(HASH_DOCTYPE, row.name):
+        frappe.db.set_value(HASH_DOCTYPE, row.name, fields)
+    else:
+        frappe.get_doc({"doctype": HASH_DOCTYPE, "fsl": row.name, **fields}).insert(ignore_permissions=True)
+
+
+def _flag(row, match):
+    note = f"Photo matches {match[0]} (distance {match[1]})"
+    reason = f"{row.review_reason}\n{note}" if row.review_reason else note
+    frappe.db.set_value(
+        FSL_DOCTYPE,
+        row.name,
+        {"needs_review": 1, "review_reason": reason, "photo_reused_from": match[0]},
+        update_modified=False,
+    )
+
+
+def index_photos(rows) -> dict:
+    """Hash, look up and store each row's photo (in order, so a batch also matches itself)."""
+    distance = max_distance()
+    hashed = flagged = unreadable = 0
+    for row in rows:
+        path = local_file_path(row.photo)
+        value = dhash_file(path) if path else None
+        if value is None:
+            _save_hash(row, None)
+            unreadable += 1
+            continue
+
+        match = find_near_duplicate(value, row.trip_id, distance) if is_informative(value) else None
+        _save_hash(row, value, match)
+        if match:
+            _flag(row, match)
+            flagged += 1
+        hashed += 1
+    frappe.db.commit()
+    return {"hashed": hashed, "flagged": flagged, "unreadable": unreadable}
+
+
+def _pending(where: str, order: str, params: dict):
+    return frappe.db.sql(
+        PENDING_QUERY.format(where=where, order=order),
+        {**params, "limit": _conf_int("fsl_photo_hash_batch", 500)},
+        as_dict=True,
+    )
+
+
+def hash_recent_photos():
+    """Scheduler: hash photos on FSLs modified within the lookback window."""
+    since = add_to_date(now_datetime(), hours=-_conf_int("fsl_photo_hash_lookback_hours", 24))
+    return index_photos(_pending("f.modified >= %(since)s", "f.modified", {"since": since}))
+
+
+def backfill_photo_hashes():
+    """One-off: walk every FSL with a photo, oldest name first."""
+    totals = {"hashed": 0, "flagged": 0, "unreadable": 0}
+    after = ""
+    while True:
+        rows = _pending("f.name > %(after)s", "f.name", {"after": after})
+        if not rows:
+            break
+        for key, count in index_photos(rows).items():
+            totals[key] += count
+        after = rows[-1].name
+    frappe.logger("transport").info(f"[photo hash backfill] {totals}")
+    return totals
@@ -0,0 +1,186 @@
+"""
+Pickup history for portal customers (/pickups).
+
+A portal user sees the Final FSLs of the customers their Contact is linked to,
+newest first. Pages use keyset pagination on (trip_date, name), which the
+(customer, trip_date) index on Field Service Log serves directly (InnoDB
+appends `name`), so a page never costs more than PAGE_SIZE + 1 index entries.
+The cursor is the last row's "trip_date|name".
+
+Pages are cached in Redis per customer under a generation number. The
+`fsl_on_finalize` hook bumps the generation of the affected customers once
+the finalizing transaction commits, which invalidates every cached page of
+those customers at once. Stale generations expire with their TTL.
+
+Site config (all optional):
+- portal_history_page_size (default 20)
+- portal_history_cache_seconds (default 600)
+"""
+
+from urllib.parse import urlencode
+
+import frappe
+from frappe.utils import cint, flt, getdate
+
+FSL_DOCTYPE = "Field Service Log"
+CACHE_PREFIX = "fsl_portal"
+PHOTO_FIELDS = ("photo", "safety_issue_photo")
+MAX_PAGE_SIZE = 100
+
+
+class PortalAccessError(frappe.PermissionError):
+    pass
+
+
+def page_size() -> int:
+    return min(cint(frappe.conf.get("portal_history_page_size")) or 20, MAX_PAGE_SIZE)
+
+
+def cache_seconds() -> int:
+    return cint(frappe.conf.get("portal_history_cache_seconds")) or 600
+
+
+# ------------------------------
+# Access
+# ------------------------------
+
+
+def portal_customers(user: str) -> list[str]:
+    """Customers linked to `user` through their Contact."""
+    if not user or user == "Guest":
+        return []
+    return frappe.db.sql_list(
+        """
+        SELECT DISTINCT dl.link_name
+        FROM `tabContact` ct
+        INNER JOIN `tabDynamic Link` dl
+            ON dl.parent = ct.name AND dl.parenttype = 'Contact' AND dl.link_doctype = 'Customer'
+        WHERE ct.user = %(user)s
+        ORDER BY dl.link_name
+        """,
+        {"user": user},
+    )
+
+
+def resolve_customer(user: str, customer: str | None = None) -> str:
+    """`customer` if `user` may see it (default: their first one); PortalAccessError otherwise."""
+    customers = portal_customers(user)
+    if not customers:
+        frappe.throw("No customer is linked to your account", PortalAccessError)
+    if customer and customer not in customers:
+        frappe.throw("Not permitted", PortalAccessError)
+    return customer or customers[0]
+
+
+# ------------------------------
+# Cursor and rows
+# ------------------------------
+
+
+def encode_cursor(trip_date, name: str) -> str:
+    return f"{trip_date}|{name}"
+
+
+def decode_cursor(cursor: str | None) -> tuple | None:
+    """(trip_date, name) or None for the first page; malformed cursors restart from the top."""
+    if not cursor or "|" not in cursor:
+        return None
+    trip_date, name = cursor.split("|", 1)
+    try:
+        return getdate(trip_date), name
+    except Exception:
+        return None
+
+
+def shape_row(row: dict) -> dict:
+    """DB row -> portal row; photos become thumbnail URLs (the files are private)."""
+    safe = cint(row.is_waste_safe)
+    return {
+        "name": row.name,
+        "trip_date": str(row.trip_date),
+        "performed_at": str(row.performed_at) if row.performed_at else None,
+        "site": row.site,
+        "address": row.address,
+        "qty_or_weight": flt(row.qty_or_weight),
+        "package_count": cint(row.package_count),
+        "is_waste_safe": bool(safe),
+        "safety_note": None if safe else (row.safety_issue_reason or ""),
+        "is_safety_resolved": bool(cint(row.is_safety_resolved)),
+        "thumbnails": [
+            "/api/method/transport.api.portal.get_pickup_photo?" + urlencode({"fsl": row.name, "field": field})
+            for field in PHOTO_FIELDS
+            if row.get(field)
+        ],
+    }
+
+
+def fetch_page(customer: str, after: tuple | None, limit: int) -> dict:
+    """{"rows", "next"}: one keyset page of the customer's Final FSLs, newest first."""
+    params = {"customer": customer, "limit": limit + 1}
+    keyset = ""
+    if after:
+        keyset = "AND (f.trip_date < %(after_date)s OR (f.trip_date = %(after_date)s AND f.name < %(after_name)s))"
+        params.update(after_date=after[0], after_name=after[1])
+
+    rows = frappe.db.sql(
+        f"""
+        SELECT f.name, f.trip_date, f.performed_at, f.site, cs.address,
+            f.qty_or_weight, f.package_count, f.is_waste_safe,
+            f.safety_issue_reason, f.is_safety_resolved, f.photo, f.safety_issue_photo
+        FROM `tab{FSL_DOCTYPE}` f
+        LEFT JOIN `tabCustomer Site` cs ON cs.name = f.site
+        WHERE f.customer = %(customer)s AND f.status = 'Final' {keyset}
+        ORDER BY f.trip_date DESC, f.name DESC
+        LIMIT %(limit)s
+        """,
+        params,
+        as_dict=True,
+    )
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "rows": [shape_row(r) for r in rows],
+        "next": encode_cursor(rows[-1].trip_date, rows[-1].name) if more else None,
+    }
+
+
+# ------------------------------
+# Cache
+# ------------------------------
+
+
+def _generation_key(customer: str) -> str:
+    return frappe.cache().make_key(f"{CACHE_PREFIX}:gen:{customer}")
+
+
+def get_history_page(customer: str, cursor: str | None = None) -> dict:
+    """Cached page of `customer`'s pickups after `cursor` (caller checks access)."""
+    after = decode_cursor(cursor)
+    limit = page_size()
+    cache = frappe.cache()
+    generation = cint(cache.get(_generation_key(customer)))
+    key = f"{CACHE_PREFIX}:page:{customer}:{generation}:{limit}:{encode_cursor(*after) if after else ''}"
+
+    page = cache.get_value(key)
+    if page is None:
+        page = fetch_page(customer, after, limit)
+        cache.set_value(key, page, expires_in_sec=cache_seconds())
+    return {"customer": customer, **page}
+
+
+def invalidate_customers(customers):
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    for customer in customers:
+        pipe.incr(_generation_key(customer))
+    pipe.execute()
+
+
+def on_fsl_finalized(names: list[str]):
+    """fsl_on_finalize hook: drop the affected customers' cached pages after commit."""
+    customers = frappe.db.sql_list(
+        f"SELECT DISTINCT customer FROM `tab{FSL_DOCTYPE}` WHERE name IN %(names)s AND IFNULL(customer, '') != ''",
+        {"names": tuple(names)},
+    )
+    if customers:
+        frappe.db.after_commit.add(lambda: invalidate_customers(customers))
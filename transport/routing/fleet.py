@@ -0,0 +1,223 @@
+"""
+Nightly fleet route planning.
+
+Loads every active driver's sites for the day, solves each route in a process
+pool (see planner.solve_task) and stores the ordered stop list in Driver Route Plan,
+which the trips endpoint (transport.api.get_driver_trips) serves to the field page.
+Each stop carries the site's forecast volume for the day (transport.forecasting.volume)
+as expected_qty, and the plan their sum as expected_load. The day's forecast runs
+inside this job, first, unless it already ran today: separate daily_long entries
+may run in parallel on several long workers, so their order is no guarantee.
+A failed forecast is logged and the routes are planned without it.
+
+Site config (all optional):
+- route_avg_speed_kmh (default 30)
+- route_service_minutes (default 10)
+- route_day_start (default "07:00")
+- route_depot: [lat, lng]
+- route_planner_workers (default: CPU count)
+- route_planner_max_seconds (default 0.5, per driver)
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import frappe
+from frappe.utils import getdate, nowdate
+
+from transport.api.field_bootstrap import clear_field_bootstrap_cache
+from transport.forecasting.volume import ensure_forecasts, site_forecasts
+from transport.routing.planner import parse_service_window, solve_task, sweep_partition
+
+ROUTE_PLAN_DOCTYPE = "Driver Route Plan"
+
+
+def _clock_to_minutes(value: str) -> int:
+    hh, _, mm = str(value or "07:00").partition(":")
+    return int(hh) * 60 + int(mm or 0)
+
+
+def _minutes_to_clock(value: float) -> str:
+    value = round(value)
+    return f"{value // 60:02d}:{value % 60:02d}"
+
+
+def _planner_options() -> dict:
+    conf = frappe.conf
+    return {
+        "start": conf.get("route_depot"),
+        "service_minutes": float(conf.get("route_service_minutes") or 10),
+        "speed_kmh": float(conf.get("route_avg_speed_kmh") or 30),
+        "day_start": _clock_to_minutes(conf.get("route_day_start") or "07:00"),
+        "max_seconds": float(conf.get("route_planner_max_seconds") or 0.5),
+    }
+
+
+# ------------------------------
+# Data loading
+# ------------------------------
+
+
+def _load_drivers() -> dict[str, list[str]]:
+    """territory -> [driver names] for active drivers."""
+    rows = frappe.get_all(
+        "Driver",
+        filters={"status": "Active", "custom_territory": ["is", "set"]},
+        fields=["name", "custom_territory"],
+        order_by="name asc",
+    )
+    by_territory = {}
+    for row in rows:
+        by_territory.setdefault(row.custom_territory, []).append(row.name)
+    return by_territory
+
+
+def _load_sites(territories: list[str]) -> dict[str, list[dict]]:
+    """territory -> active Customer Sites with coordinates (via Customer.territory)."""
+    if not territories:
+        return {}
+
+    rows = frappe.db.sql(
+        """
+        SELECT cs.name AS site, cs.customer, cs.latitude, cs.longitude,
+               cs.service_window, c.territory
+        FROM `tabCustomer Site` cs
+        INNER JOIN `tabCustomer` c ON c.name = cs.customer
+        WHERE cs.status = 'Active'
+          AND c.territory IN %(territories)s
+          AND IFNULL(cs.latitude, 0) != 0
+          AND IFNULL(cs.longitude, 0) != 0
+        ORDER BY cs.name
+        """,
+        {"territories": tuple(territories)},
+        as_dict=True,
+    )
+    by_territory = {}
+    for row in rows:
+        by_territory.setdefault(row.territory, []).append(row)
+    return by_territory
+
+
+def _build_tasks(options: dict) -> list[dict]:
+    drivers_by_territory = _load_drivers()
+    sites_by_territory = _load_sites(list(drivers_by_territory))
+
+    tasks = []
+    for territory, drivers in drivers_by_territory.items():
+        sites = sites_by_territory.get(territory) or []
+        if not sites:
+            continue
+
+        coords = [(s.latitude, s.longitude) for s in sites]
+        # several drivers in one territory: give each an angular sector
+        for driver, part in zip(drivers, sweep_partition(coords, len(drivers)), strict=True):
+            rows = [sites[i] for i in part]
+            tasks.append(
+                {
+                    "driver": driver,
+                    "territory": territory,
+                    "rows": rows,
+                    "coords": [(r.latitude, r.longitude) for r in rows],
+                    "windows": [parse_service_window(r.service_window) for r in rows],
+                    "options": options,
+                }
+            )
+    return tasks
+
+
+# ------------------------------
+# Persistence
+# ------------------------------
+
+
+def _save_plan(task: dict, result: dict, plan_date, forecasts: dict) -> str:
+    rows = task["rows"]
+    stops = []
+    for seq, (idx, eta) in enumerate(zip(result["order"], result["eta"], strict=True), start=1):
+        row = rows[idx]
+        window_end = task["windows"][idx][1]
+        forecast = forecasts.get(row.site)
+        stops.append(
+            {
+                "seq": seq,
+                "site": row.site,
+                "customer": row.customer,
+                "latitude": row.latitude,
+                "longitude": row.longitude,
+                "service_window": row.service_window,
+                "eta": _minutes_to_clock(eta),
+                "late": eta > window_end,
+                "expected_qty": forecast["qty"] if forecast else None,
+            }
+        )
+
+    values = {
+        "territory": task["territory"],
+        "stop_count": len(stops),
+        "total_distance_km": result["distance_km"],
+        "late_stops": result["late_stops"],
+        "expected_load": sum(s["expected_qty"] or 0 for s in stops),
+        "stops": json.dumps(stops, ensure_ascii=False, separators=(",", ":")),
+    }
+
+    existing = frappe.db.get_value(
+        ROUTE_PLAN_DOCTYPE, {"driver": task["driver"], "plan_date": plan_date}, "name"
+    )
+    if existing:
+        doc = frappe.get_doc(ROUTE_PLAN_DOCTYPE, existing)
+        doc.update(values)
+        doc.save(ignore_permissions=True)
+    else:
+        doc = frappe.get_doc(
+            {
+                "doctype": ROUTE_PLAN_DOCTYPE,
+                "driver": task["driver"],
+                "plan_date": plan_date,
+                **values,
+            }
+        )
+        doc.insert(ignore_permissions=True)
+    return doc.name
+
+
+# ------------------------------
+# Scheduler entry point
+# ------------------------------
+
+
+def plan_fleet_routes(plan_date=None):
+    """Plan routes for every active driver (scheduled daily)."""
+    plan_date = getdate(plan_date or nowdate())
+    try:
+        ensure_forecasts()
+    except Exception:
+        # forecasts only fill expected_qty/expected_load: plan without today's run
+        frappe.db.rollback()
+        frappe.log_error(title="Site volume forecast failed", message=frappe.get_traceback())
+    options = _planner_options()
+    tasks = _build_tasks(options)
+    if not tasks:
+        return {"planned": 0}
+
+    workers = int(frappe.conf.get("route_planner_workers") or os.cpu_count() or 1)
+    workers = max(1, min(workers, len(tasks)))
+
+    if workers == 1:
+        results = [solve_task(task) for task in tasks]
+    else:
+        # spawn: children import only the NumPy planner, not frappe or this worker's DB connection
+        ctx = multiprocessing.get_context("spawn")
+        payload = [{k: t[k] for k in ("coords", "windows", "options")} for t in tasks]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            results = list(pool.map(solve_task, payload, chunksize=4))
+
+    forecasts = site_forecasts([row.site for task in tasks for row in task["rows"]], plan_date)
+    for task, result in zip(tasks, results, strict=True):
+        _save_plan(task, result, plan_date, forecasts)
+    frappe.db.commit()
+    clear_field_bootstrap_cache()
+
+    frappe.logger("transport").info(f"[routing] planned {len(tasks)} routes for {plan_date}")
+    return {"planned": len(tasks)}
@@ -0,0 +1,302 @@
+"""
+Route sequencing for a driver's daily stops.
+
+Pure NumPy (no frappe imports) so it can run inside a process pool:
+
+- distance matrix: haversine, in km
+- construction: time-aware nearest neighbour (earliest ready time first)
+- improvement: 2-opt and or-opt moves, scored on the whole matrix at once,
+  accepted only if they don't add service-window lateness
+
+Times are minutes since midnight. A stop without a service window gets (0, 1440).
+"""
+
+import re
+import time
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+DAY_MINUTES = 24 * 60
+
+_PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+# separators: "-", en dash, Persian "تا" ("to")
+_WINDOW_RE = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*[-\u2013\u062a\u0627]+\s*(\d{1,2})(?::(\d{2}))?")
+
+
+def parse_service_window(text) -> tuple[int, int]:
+    """
+    Parse a Customer Site service_window ("08:00-12:30", "8-12", Persian digits ok).
+
+    Only the first window is used. Anything unparsable means "any time".
+    """
+    if not text:
+        return (0, DAY_MINUTES)
+
+    m = _WINDOW_RE.search(str(text).translate(_PERSIAN_DIGITS))
+    if not m:
+        return (0, DAY_MINUTES)
+
+    start = int(m.group(1)) * 60 + int(m.group(2) or 0)
+    end = int(m.group(3)) * 60 + int(m.group(4) or 0)
+    if not (0 <= start < end <= DAY_MINUTES):
+        return (0, DAY_MINUTES)
+
+    return (start, end)
+
+
+def haversine_matrix(coords) -> np.ndarray:
+    """(n, 2) lat/lng in degrees -> (n, n) great-circle distances in km."""
+    rad = np.radians(np.asarray(coords, dtype=np.float64))
+    lat = rad[:, 0][:, None]
+    lng = rad[:, 1][:, None]
+
+    dlat = lat - lat.T
+    dlng = lng - lng.T
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def sweep_partition(coords, k: int) -> list[np.ndarray]:
+    """
+    Split stops into k angular sectors around their centroid (classic sweep).
+
+    Used when several drivers share a territory. Returns k index arrays.
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    if k <= 1 or len(coords) == 0:
+        return [np.arange(len(coords))]
+
+    center = coords.mean(axis=0)
+    angles = np.arctan2(coords[:, 0] - center[0], coords[:, 1] - center[1])
+    order = np.argsort(angles, kind="stable")
+    return [part for part in np.array_split(order, k)]
+
+
+# ------------------------------
+# Internal route model
+# ------------------------------
+#
+# Node 0 is the start (depot, or a free start with zero distance to everything),
+# nodes 1..n are stops, node n+1 is a zero-distance sink so the open path can be
+# treated as a closed tour by the move operators.
+
+
+class _Route:
+    def __init__(self, dist, travel, win_start, win_end, service_minutes, day_start):
+        self.dist = dist
+        self.travel = travel
+        self.win_start = win_start
+        self.win_end = win_end
+        self.service_minutes = service_minutes
+        self.day_start = day_start
+
+    def schedule(self, tour):
+        """Return (total lateness in minutes, arrival/start-of-service per position)."""
+        travel = self.travel
+        ws = self.win_start
+        we = self.win_end
+        service = self.service_minutes
+
+        t = self.day_start
+        late = 0.0
+        starts = np.zeros(len(tour))
+        prev = tour[0]
+        for pos in range(1, len(tour) - 1):
+            node = tour[pos]
+            t += travel[prev, node]
+            if t < ws[node]:
+                t = ws[node]
+            if t > we[node]:
+                late += t - we[node]
+            starts[pos] = t
+            t += service
+            prev = node
+        return late, starts
+
+    def length(self, tour) -> float:
+        return float(self.dist[tour[:-1], tour[1:]].sum())
+
+    def nearest_neighbour(self, n: int) -> np.ndarray:
+        travel = self.travel
+        ws = self.win_start
+        we = self.win_end
+
+        tour = [0]
+        unvisited = np.ones(n + 2, dtype=bool)
+        unvisited[[0, n + 1]] = False
+
+        cur = 0
+        t = self.day_start
+        for _ in range(n):
+            cand = np.flatnonzero(unvisited)
+            ready = np.maximum(t + travel[cur, cand], ws[cand])
+            feasible = ready <= we[cand]
+
+            if feasible.any():
+                pick = cand[feasible][np.argmin(ready[feasible])]
+            else:
+                # everything left is already late: go to the nearest one
+                pick = cand[np.argmin(travel[cur, cand])]
+
+            t = max(t + travel[cur, pick], ws[pick]) + self.service_minutes
+            tour.append(pick)
+            unvisited[pick] = False
+            cur = pick
+
+        tour.append(n + 1)
+        return np.asarray(tour, dtype=np.int64)
+
+    def two_opt(self, tour, late, deadline, max_tries=32):
+        """One improving 2-opt move (segment reversal), best-delta first."""
+        dist = self.dist
+        a = tour[:-1]
+        b = tour[1:]
+        edge = dist[a, b]
+
+        # delta[i, j]: replace edges (a_i, b_i), (a_j, b_j) with (a_i, a_j), (b_i, b_j)
+        delta = dist[np.ix_(a, a)] + dist[np.ix_(b, b)] - edge[:, None] - edge[None, :]
+        delta = np.triu(delta, k=2)
+
+        ii, jj = np.nonzero(delta < -1e-9)
+        if not len(ii):
+            return None
+
+        order = np.argsort(delta[ii, jj], kind="stable")[:max_tries]
+        for idx in order:
+            if time.perf_counter() > deadline:
+                return None
+            i, j = ii[idx], jj[idx]
+            new = tour.copy()
+            new[i + 1 : j + 1] = new[i + 1 : j + 1][::-1]
+            new_late, _ = self.schedule(new)
+            if new_late <= late + 1e-9:
+                return new, new_late
+        return None
+
+    def or_opt(self, tour, late, deadline, max_segment=3, max_tries=8):
+        """One improving or-opt move (relocate a run of 1..3 stops, either orientation)."""
+        dist = self.dist
+        m = len(tour)
+        k = np.arange(m - 1)
+        left = tour[:-1]
+        right = tour[1:]
+        base = dist[left, right]
+
+        candidates = []
+        for seg_len in range(1, max_segment + 1):
+            for s in range(1, m - seg_len):
+                e = s + seg_len - 1
+                first, last = tour[s], tour[e]
+                prev, nxt = tour[s - 1], tour[e + 1]
+                gain = dist[prev, first] + dist[last, nxt] - dist[prev, nxt]
+
+                forward = dist[left, first] + dist[last, right] - base - gain
+                backward = dist[left, last] + dist[first, right] - base - gain
+                # can't insert next to / inside the segment itself
+                blocked = (k >= s - 1) & (k <= e)
+                forward[blocked] = np.inf
+                backward[blocked] = np.inf
+
+                for costs, reverse in ((forward, False), (backward, True)):
+                    pos = int(np.argmin(costs))
+                    if costs[pos] < -1e-9:
+                        candidates.append((costs[pos], s, e, pos, reverse))
+
+        candidates.sort(key=lambda c: c[0])
+        for _, s, e, pos, reverse in candidates[:max_tries]:
+            if time.perf_counter() > deadline:
+                return None
+            segment = tour[s : e + 1]
+            if reverse:
+                segment = segment[::-1]
+            rest = np.concatenate([tour[:s], tour[e + 1 :]])
+            insert_at = pos + 1 if pos < s else pos + 1 - len(segment)
+            new = np.concatenate([rest[:insert_at], segment, rest[insert_at:]])
+            new_late, _ = self.schedule(new)
+            if new_late <= late + 1e-9:
+                return new, new_late
+        return None
+
+
+def plan_route(
+    coords,
+    windows=None,
+    *,
+    start=None,
+    service_minutes: float = 10,
+    speed_kmh: float = 30,
+    day_start: float = 7 * 60,
+    max_seconds: float = 0.5,
+) -> dict:
+    """
+    Compute a visit order for one driver.
+
+    coords: (n, 2) lat/lng in degrees
+    windows: (n, 2) service window start/end in minutes, or None
+    start: optional (lat, lng) of the depot; otherwise the route starts at the first stop
+
+    Returns:
+        {
+          "order": [stop index, ...],      # indexes into coords
+          "eta": [minutes, ...],           # start of service, same order as "order"
+          "distance_km": float,
+          "late_stops": int,
+          "lateness_minutes": float,
+        }
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(coords)
+    if n == 0:
+        return {"order": [], "eta": [], "distance_km": 0.0, "late_stops": 0, "lateness_minutes": 0.0}
+
+    deadline = time.perf_counter() + max_seconds
+
+    dist = np.zeros((n + 2, n + 2))
+    dist[1 : n + 1, 1 : n + 1] = haversine_matrix(coords)
+    if start is not None:
+        depot = haversine_matrix(np.vstack([np.asarray(start, dtype=np.float64), coords]))[0, 1:]
+        dist[0, 1 : n + 1] = depot
+        dist[1 : n + 1, 0] = depot
+
+    win_start = np.zeros(n + 2)
+    win_end = np.full(n + 2, float(DAY_MINUTES))
+    if windows is not None:
+        windows = np.asarray(windows, dtype=np.float64).reshape(-1, 2)
+        win_start[1 : n + 1] = windows[:, 0]
+        win_end[1 : n + 1] = windows[:, 1]
+
+    route = _Route(
+        dist=dist,
+        travel=dist / max(speed_kmh, 1e-6) * 60.0,
+        win_start=win_start,
+        win_end=win_end,
+        service_minutes=service_minutes,
+        day_start=day_start,
+    )
+
+    tour = route.nearest_neighbour(n)
+    late, _ = route.schedule(tour)
+
+    while time.perf_counter() < deadline:
+        step = route.two_opt(tour, late, deadline) or route.or_opt(tour, late, deadline)
+        if not step:
+            break
+        tour, late = step
+
+    late, starts = route.schedule(tour)
+    inner = slice(1, n + 1)
+    late_mask = starts[inner] > win_end[tour[inner]] + 1e-9
+
+    return {
+        "order": (tour[inner] - 1).tolist(),
+        "eta": starts[inner].round(1).tolist(),
+        "distance_km": round(route.length(tour), 3),
+        "late_stops": int(late_mask.sum()),
+        "lateness_minutes": round(float(late), 1),
+    }
+
+
+def solve_task(task: dict) -> dict:
+    """Process-pool entry point (see transport.routing.fleet): {"coords", "windows", "options"} -> plan_route result."""
+    return plan_route(task["coords"], task["windows"], **task["options"])
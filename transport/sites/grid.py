@@ -0,0 +1,82 @@
+"""
+Near-duplicate coordinates on a uniform lat/lng grid.
+
+Pure NumPy (no frappe imports). Points are bucketed into cells at least
+`radius_m` wide, so any pair closer than the radius sits in the same or an
+adjacent cell. Candidates are found with one sort and a searchsorted per
+neighbouring cell (9 in total) instead of comparing every pair, then checked
+with the haversine distance.
+
+Longitude wrap-around at ±180° is ignored; a municipality never spans it.
+"""
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+METRES_PER_DEGREE = EARTH_RADIUS_M * np.pi / 180
+
+_LNG_OFFSET = 1 << 31
+_ROW = np.int64(1 << 32)
+
+
+def haversine_m(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """Element-wise great-circle distance in metres; inputs in degrees."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _cells(lat, lng, radius_m: float, max_abs_lat: float):
+    cell_lat = radius_m / METRES_PER_DEGREE
+    # a degree of longitude is shortest at the highest latitude: size cells for that
+    cell_lng = cell_lat / max(np.cos(np.radians(min(max_abs_lat, 89.0))), 1e-6)
+    return (
+        np.floor(lat / cell_lat).astype(np.int64),
+        np.floor(lng / cell_lng).astype(np.int64) + _LNG_OFFSET,
+    )
+
+
+def near_pairs(query, points, radius_m: float):
+    """
+    All (i, j) with query[i] within `radius_m` of points[j].
+
+    `query` and `points` are (n, 2) / (m, 2) lat/lng arrays in degrees.
+    Returns (i, j, distance_m) arrays, sorted by i then j.
+    """
+    query = np.asarray(query, dtype=np.float64).reshape(-1, 2)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    empty = (np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0))
+    if not len(query) or not len(points) or radius_m <= 0:
+        return empty
+
+    max_abs_lat = float(max(np.abs(query[:, 0]).max(), np.abs(points[:, 0]).max()))
+    q_row, q_col = _cells(query[:, 0], query[:, 1], radius_m, max_abs_lat)
+    p_row, p_col = _cells(points[:, 0], points[:, 1], radius_m, max_abs_lat)
+
+    order = np.argsort(p_row * _ROW + p_col, kind="stable")
+    sorted_keys = (p_row * _ROW + p_col)[order]
+
+    found_i, found_j = [], []
+    for d_row in (-1, 0, 1):
+        for d_col in (-1, 0, 1):
+            keys = (q_row + d_row) * _ROW + (q_col + d_col)
+            lo = np.searchsorted(sorted_keys, keys, side="left")
+            counts = np.searchsorted(sorted_keys, keys, side="right") - lo
+            total = int(counts.sum())
+            if not total:
+                continue
+            starts = np.repeat(lo, counts)
+            within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            found_i.append(np.repeat(np.arange(len(query)), counts))
+            found_j.append(order[starts + within])
+
+    if not found_i:
+        return empty
+
+    i = np.concatenate(found_i)
+    j = np.concatenate(found_j)
+    dist = haversine_m(query[i, 0], query[i, 1], points[j, 0], points[j, 1])
+    keep = dist <= radius_m
+    i, j, dist = i[keep], j[keep], dist[keep]
+    order = np.lexsort((j, i))
+    return i[order], j[order], dist[order]
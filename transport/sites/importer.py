@@ -0,0 +1,308 @@
+"""
+Bulk import of Customer Site rows from a CSV file.
+
+The whole file is read into columns and validated at once:
+- required columns, coordinate ranges, status values
+- duplicate address / site_uuid inside the file
+- customer and address must exist; address and site_uuid must not be taken
+  (one `IN` query per column chunk, never one per row)
+- coordinates within `customer_site_import_radius_m` of another row in the
+  file or of an existing site (transport.sites.grid)
+
+Rows that fail any check are skipped and reported with their line number;
+the rest go in with frappe.db.bulk_insert (multi-row INSERTs). Customer Site
+has no controller logic, so nothing is lost by skipping Document.insert.
+Re-importing a corrected file is safe: rows already in are reported as taken.
+
+Site config (all optional):
+- customer_site_import_radius_m (default 15; 0 disables the coordinate check)
+"""
+
+import csv
+import io
+
+import frappe
+import numpy as np
+from frappe.utils import flt, now_datetime
+
+from transport.sites.grid import METRES_PER_DEGREE, near_pairs
+
+SITE_DOCTYPE = "Customer Site"
+DONE_EVENT = "customer_site_import_done"
+
+COLUMNS = ("customer", "address", "site_uuid", "status", "service_window", "latitude", "longitude")
+REQUIRED = ("customer", "address")
+IN_CHUNK = 5000
+REPORT_LIMIT = 200
+
+# Persian (U+06F0..) and Arabic-Indic (U+0660..) digits, Arabic decimal separator
+_DIGITS = str.maketrans(
+    "".join(map(chr, [*range(0x06F0, 0x06FA), *range(0x0660, 0x066A), 0x066B])),
+    "0123456789" * 2 + ".",
+)
+
+
+class SiteImportError(frappe.ValidationError):
+    pass
+
+
+# ------------------------------
+# Reading and column checks
+# ------------------------------
+
+
+def read_columns(content) -> dict[str, np.ndarray]:
+    """CSV text/bytes -> {column: object array of stripped strings}; unknown columns dropped."""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+    rows = list(csv.reader(io.StringIO(content.lstrip("\ufeff"))))
+    if not rows:
+        frappe.throw("The file is empty", SiteImportError)
+
+    header = [h.strip().lower().replace(" ", "_") for h in rows[0]]
+    missing = [c for c in REQUIRED if c not in header]
+    if missing:
+        frappe.throw(f"Missing column(s): {', '.join(missing)}", SiteImportError)
+
+    body = rows[1:]
+    width = len(header)
+    cells = np.array([(r + [""] * width)[:width] for r in body], dtype=object).reshape(len(body), width)
+    return {
+        name: np.array([v.strip() for v in cells[:, idx]], dtype=object)
+        for idx, name in enumerate(header)
+        if name in COLUMNS
+    }
+
+
+def _to_float(values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(floats with NaN for blanks, mask of non-blank values that are not numbers)."""
+    out = np.full(len(values), np.nan)
+    bad = np.zeros(len(values), dtype=bool)
+    for idx, text in enumerate(values):
+        if not text:
+            continue
+        try:
+            out[idx] = float(text.translate(_DIGITS).replace(",", ""))
+        except ValueError:
+            bad[idx] = True
+    return out, bad
+
+
+def _repeats(values: np.ndarray, present: np.ndarray) -> np.ndarray:
+    """True for every present value already seen earlier in the array."""
+    out = np.zeros(len(values), dtype=bool)
+    idx = np.flatnonzero(present)
+    if len(idx):
+        _, first, inverse = np.unique(values[idx].astype(str), return_index=True, return_inverse=True)
+        out[idx] = first[inverse.ravel()] != np.arange(len(idx))
+    return out
+
+
+class Report:
+    """Per-row problems, collected column by column."""
+
+    def __init__(self, n: int):
+        self.bad = np.zeros(n, dtype=bool)
+        self.messages = {}
+
+    def add(self, mask: np.ndarray, message, *, reject: bool = True):
+        for idx in np.flatnonzero(mask):
+            text = message(idx) if callable(message) else message
+            self.messages.setdefault(int(idx), []).append(text)
+        if reject:
+            self.bad |= mask
+
+    def rows(self) -> list[dict]:
+        # line 1 is the header
+        return [{"line": idx + 2, "problems": msgs} for idx, msgs in sorted(self.messages.items())]
+
+
+def check_columns(cols: dict[str, np.ndarray], statuses) -> tuple[dict, Report]:
+    """Row-local and in-file checks; returns normalised columns and the report."""
+    n = len(cols["customer"])
+    blank = np.full(n, "", dtype=object)
+    cols = {c: cols.get(c, blank) for c in COLUMNS}
+    report = Report(n)
+
+    for column in REQUIRED:
+        report.add(cols[column] == "", f"{column} is required")
+
+    lat, lat_bad = _to_float(cols["latitude"])
+    lng, lng_bad = _to_float(cols["longitude"])
+    report.add(lat_bad | lng_bad, "latitude/longitude must be numbers")
+    report.add(np.isnan(lat) != np.isnan(lng), "latitude and longitude go together")
+    with np.errstate(invalid="ignore"):
+        report.add((np.abs(lat) > 90) | (np.abs(lng) > 180), "coordinates out of range")
+    # Float fields store blanks as 0; (0, 0) is never a real site here
+    has_coords = np.isfinite(lat) & np.isfinite(lng) & ~((lat == 0) & (lng == 0)) & ~report.bad
+
+    status = cols["status"]
+    report.add(~np.isin(status, [*statuses, ""]), f"status must be one of {', '.join(statuses)}")
+
+    report.add(_repeats(cols["address"], cols["address"] != ""), "address repeated in the file")
+    report.add(_repeats(cols["site_uuid"], cols["site_uuid"] != ""), "site_uuid repeated in the file")
+
+    cols.update(latitude=lat, longitude=lng, has_coords=has_coords)
+    return cols, report
+
+
+# ------------------------------
+# Set-based checks against the database
+# ------------------------------
+
+
+def _existing(doctype: str, field: str, values) -> set:
+    values = sorted({v for v in values if v})
+    found = set()
+    for start in range(0, len(values), IN_CHUNK):
+        found.update(
+            frappe.db.sql_list(
+                f"SELECT `{field}` FROM `tab{doctype}` WHERE `{field}` IN %(values)s",
+                {"values": tuple(values[start : start + IN_CHUNK])},
+            )
+        )
+    return found
+
+
+def _existing_coordinates(lat: np.ndarray, lng: np.ndarray, radius_m: float):
+    """(names, (m, 2) coords) of existing sites inside the file's bounding box plus the radius."""
+    margin = 2 * radius_m / METRES_PER_DEGREE
+    lng_margin = margin / max(np.cos(np.radians(min(float(np.abs(lat).max()), 89.0))), 1e-6)
+    rows = frappe.db.sql(
+        f"""
+        SELECT name, latitude, longitude FROM `tab{SITE_DOCTYPE}`
+        WHERE latitude BETWEEN %(lat_lo)s AND %(lat_hi)s
+            AND longitude BETWEEN %(lng_lo)s AND %(lng_hi)s
+            AND NOT (latitude = 0 AND longitude = 0)
+        """,
+        {
+            "lat_lo": float(lat.min()) - margin,
+            "lat_hi": float(lat.max()) + margin,
+            "lng_lo": float(lng.min()) - lng_margin,
+            "lng_hi": float(lng.max()) + lng_margin,
+        },
+    )
+    names = [r[0] for r in rows]
+    coords = np.array([(flt(r[1]), flt(r[2])) for r in rows], dtype=np.float64).reshape(-1, 2)
+    return names, coords
+
+
+def check_database(cols: dict, report: Report):
+    for column, doctype in (("customer", "Customer"), ("address", "Address")):
+        known = _existing(doctype, "name", cols[column])
+        report.add(
+            (cols[column] != "") & ~np.isin(cols[column], list(known)),
+            f"{doctype} not found",
+        )
+
+    for column in ("address", "site_uuid"):
+        taken = _existing(SITE_DOCTYPE, column, cols[column])
+        report.add(
+            (cols[column] != "") & np.isin(cols[column], list(taken)),
+            f"{column} already used by another Customer Site",
+        )
+
+
+def check_near_duplicates(cols: dict, report: Report, radius_m: float, reject: bool):
+    idx = np.flatnonzero(cols["has_coords"] & ~report.bad)
+    if radius_m <= 0 or not len(idx):
+        return
+    lat, lng = cols["latitude"][idx], cols["longitude"][idx]
+    coords = np.column_stack([lat, lng])
+
+    # within the file: the later row is the duplicate
+    i, j, dist = near_pairs(coords, coords, radius_m)
+    keep = i < j
+    if keep.any():
+        first = dict(
+            zip(idx[j[keep]].tolist(), zip(idx[i[keep]].tolist(), dist[keep].tolist(), strict=True), strict=True)
+        )
+        mask = np.zeros(len(report.bad), dtype=bool)
+        mask[list(first)] = True
+        report.add(mask, lambda r: f"{first[r][1]:.0f} m from line {first[r][0] + 2}", reject=reject)
+
+    names, existing = _existing_coordinates(lat, lng, radius_m)
+    i, j, dist = near_pairs(coords, existing, radius_m)
+    if len(i):
+        nearest = {}
+        for row, site, d in zip(idx[i].tolist(), j.tolist(), dist.tolist(), strict=True):
+            if row not in nearest or d < nearest[row][1]:
+                nearest[row] = (names[site], d)
+        mask = np.zeros(len(report.bad), dtype=bool)
+        mask[list(nearest)] = True
+        report.add(mask, lambda r: f"{nearest[r][1]:.0f} m from {nearest[r][0]}", reject=reject)
+
+
+# ------------------------------
+# Insert
+# ------------------------------
+
+
+def _insert(cols: dict, rows: np.ndarray, user: str, default_status: str | None) -> int:
+    now = now_datetime()
+    has_coords = cols["has_coords"]
+    values = [
+        (
+            frappe.generate_hash(length=10),
+            now,
+            now,
+            user,
+            user,
+            cols["customer"][r],
+            cols["address"][r],
+            cols["site_uuid"][r] or None,  # unique: blanks must be NULL
+            cols["status"][r] or default_status,
+            cols["service_window"][r] or None,
+            float(cols["latitude"][r]) if has_coords[r] else 0,
+            float(cols["longitude"][r]) if has_coords[r] else 0,
+        )
+        for r in rows.tolist()
+    ]
+    frappe.db.bulk_insert(
+        SITE_DOCTYPE,
+        fields=["name", "creation", "modified", "owner", "modified_by", *COLUMNS],
+        values=values,
+    )
+    return len(values)
+
+
+def import_sites(content, dry_run: bool = True, allow_near_duplicates: bool = False, user=None) -> dict:
+    """Validate CSV `content` and insert the valid rows unless `dry_run`."""
+    user = user or frappe.session.user
+    status_field = frappe.get_meta(SITE_DOCTYPE).get_field("status")
+    statuses = [s for s in (status_field.options or "").split("\n") if s]
+    radius_m = flt(frappe.conf.get("customer_site_import_radius_m", 15))
+
+    cols, report = check_columns(read_columns(content), statuses)
+    check_database(cols, report)
+    check_near_duplicates(cols, report, radius_m, reject=not allow_near_duplicates)
+
+    valid = np.flatnonzero(~report.bad)
+    inserted = 0
+    if not dry_run and len(valid):
+        inserted = _insert(cols, valid, user, status_field.default)  # blank status: same default as the form
+        frappe.db.commit()
+
+    problems = report.rows()
+    return {
+        "rows": len(report.bad),
+        "valid": len(valid),
+        "inserted": inserted,
+        "skipped": int(report.bad.sum()),
+        "dry_run": bool(dry_run),
+        "problem_count": len(problems),
+        "problems": problems[:REPORT_LIMIT],
+    }
+
+
+def import_sites_job(file_url: str, dry_run=True, allow_near_duplicates=False, user=None):
+    """Background job behind start_customer_site_import; result arrives on DONE_EVENT."""
+    user = user or frappe.session.user
+    try:
+        content = frappe.get_doc("File", {"file_url": file_url}).get_content()
+        result = import_sites(content, dry_run, allow_near_duplicates, user)
+    except SiteImportError as e:
+        frappe.publish_realtime(DONE_EVENT, {"error": str(e), "file_url": file_url}, user=user)
+        return
+    frappe.publish_realtime(DONE_EVENT, {**result, "file_url": file_url}, user=user)
+    return result
@@ -0,0 +1,130 @@
+"""
+Mergeable running statistics for FSL weights (no DB access).
+
+RunningStats keeps count/mean/M2 (Welford, merged with Chan's formula),
+min/max and a LogSketch. LogSketch is a DDSketch-style histogram over
+log-spaced buckets: every quantile it reports is within ALPHA relative error
+of a true sample value, it updates in O(1) and its size grows with the
+spread of the data (a few hundred buckets), not with the number of values.
+"""
+
+import json
+import math
+
+ALPHA = 0.02  # relative accuracy of quantiles
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+LOG_GAMMA = math.log(GAMMA)
+MAX_BUCKETS = 512  # the lowest buckets are folded together past this
+
+
+class LogSketch:
+    def __init__(self, buckets=None, zeros=0):
+        self.buckets = buckets or {}  # bucket index -> count
+        self.zeros = zeros
+
+    @staticmethod
+    def _index(value: float) -> int:
+        return math.ceil(math.log(value) / LOG_GAMMA)
+
+    @staticmethod
+    def _value(index: int) -> float:
+        return 2 * GAMMA**index / (GAMMA + 1)
+
+    @property
+    def count(self) -> int:
+        return self.zeros + sum(self.buckets.values())
+
+    def add(self, value: float, n: int = 1):
+        if value <= 0:
+            self.zeros += n
+            return
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + n
+        if len(self.buckets) > MAX_BUCKETS:
+            self._collapse()
+
+    def merge(self, other: "LogSketch"):
+        self.zeros += other.zeros
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        if len(self.buckets) > MAX_BUCKETS:
+            self._collapse()
+
+    def _collapse(self):
+        indexes = sorted(self.buckets)
+        excess = indexes[: len(indexes) - MAX_BUCKETS + 1]
+        folded = sum(self.buckets.pop(i) for i in excess)
+        target = indexes[len(excess)]
+        self.buckets[target] += folded
+
+    def quantile(self, q: float) -> float | None:
+        total = self.count
+        if not total:
+            return None
+        rank = q * (total - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if rank < seen:
+                return self._value(index)
+        return self._value(max(self.buckets))
+
+    def to_json(self) -> str:
+        return json.dumps({"z": self.zeros, "b": {str(i): n for i, n in self.buckets.items()}}, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, text: str | None) -> "LogSketch":
+        if not text:
+            return cls()
+        data = json.loads(text)
+        return cls({int(i): n for i, n in data.get("b", {}).items()}, data.get("z", 0))
+
+
+class RunningStats:
+    def __init__(self, count=0, mean=0.0, m2=0.0, min_value=None, max_value=None, sketch=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min_value = min_value
+        self.max_value = max_value
+        self.sketch = sketch or LogSketch()
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+        self.max_value = value if self.max_value is None else max(self.max_value, value)
+        self.sketch.add(value)
+
+    def merge(self, other: "RunningStats"):
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min_value, self.max_value = other.min_value, other.max_value
+            self.sketch.merge(other.sketch)
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / total
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.count = total
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self.sketch.merge(other.sketch)
+
+    def expected_range(self, factor: float) -> tuple[float, float]:
+        """[p01 / factor, p99 * factor]: wide enough for real variation, not for a misplaced decimal point."""
+        return (self.sketch.quantile(0.01) or 0.0) / factor, (self.sketch.quantile(0.99) or 0.0) * factor
@@ -0,0 +1,226 @@
+"""
+Per-customer and per-site weight statistics for outlier checks.
+
+One `FSL Weight Stats` row per (scope, reference) holds the running stats of
+qty_or_weight over Final FSLs (see transport.stats.sketch) plus the derived
+expected range. update_weight_stats is an `fsl_on_finalize` hook, so the rows
+change in the same transaction that finalizes the FSLs. upsert_draft_fsl calls
+flag_weight, which reads at most two rows by primary key: no history scan.
+
+rebuild_weight_stats recomputes every row from Final FSLs (backfill, or after
+bulk corrections). Finalizations that land while it runs are not counted;
+run it off-hours.
+
+Site config (all optional):
+- fsl_weight_min_samples (default 20; fewer Final FSLs means no check)
+- fsl_weight_outlier_factor (default 3)
+"""
+
+import re
+
+import frappe
+from frappe.utils import flt, now_datetime
+
+from transport.stats.sketch import LogSketch, RunningStats
+
+FSL_DOCTYPE = "Field Service Log"
+STATS_DOCTYPE = "FSL Weight Stats"
+SCOPES = (("Site", "site"), ("Customer", "customer"))  # most specific first
+
+STATS_FIELDS = ["sample_count", "mean", "variance", "min_value", "max_value", "sketch"]
+DERIVED_FIELDS = ["stddev", "p01", "p50", "p99", "low_bound", "high_bound"]
+_WEIGHT_NOTE = re.compile(r"Weight \S+ outside ")  # see flag_weight
+
+
+def stats_name(scope: str, reference: str) -> str:
+    return f"WST-{scope}-{reference}"
+
+
+def _conf_float(key: str, default: float) -> float:
+    return flt(frappe.conf.get(key)) or default
+
+
+def _derived(stats: RunningStats) -> dict:
+    low, high = stats.expected_range(_conf_float("fsl_weight_outlier_factor", 3))
+    return {
+        "stddev": stats.stddev,
+        "p01": stats.sketch.quantile(0.01),
+        "p50": stats.sketch.quantile(0.5),
+        "p99": stats.sketch.quantile(0.99),
+        "low_bound": low,
+        "high_bound": high,
+    }
+
+
+def _from_row(row) -> RunningStats:
+    return RunningStats(
+        row.sample_count,
+        row.mean,
+        row.variance * max(row.sample_count - 1, 0),  # back to Welford's M2
+        row.min_value,
+        row.max_value,
+        LogSketch.from_json(row.sketch),
+    )
+
+
+def _row_values(stats: RunningStats) -> dict:
+    return {
+        "sample_count": stats.count,
+        "mean": stats.mean,
+        "variance": stats.variance,
+        "min_value": stats.min_value,
+        "max_value": stats.max_value,
+        "sketch": stats.sketch.to_json(),
+        **_derived(stats),
+    }
+
+
+def _collect(rows) -> dict:
+    """{(scope, reference): RunningStats} for rows with customer/site/qty_or_weight."""
+    out = {}
+    for row in rows:
+        value = flt(row.qty_or_weight)
+        if value <= 0:
+            continue  # nothing collected: says nothing about the usual weight
+        for scope, field in SCOPES:
+            if row.get(field):
+                out.setdefault((scope, row[field]), RunningStats()).add(value)
+    return out
+
+
+# ------------------------------
+# Incremental update (fsl_on_finalize)
+# ------------------------------
+
+
+def update_weight_stats(names: list[str]):
+    rows = frappe.db.sql(
+        f"SELECT customer, site, qty_or_weight FROM `tab{FSL_DOCTYPE}` WHERE name IN %(names)s",
+        {"names": tuple(names)},
+        as_dict=True,
+    )
+    now = now_datetime()
+    user = frappe.session.user
+    # fixed lock order, so concurrent finalizations cannot deadlock
+    for (scope, reference), batch in sorted(_collect(rows).items()):
+        name = stats_name(scope, reference)
+        # make sure the row exists before locking it: FOR UPDATE on a missing
+        # row only takes a gap lock, and two first finalizations would race
+        # on the insert (duplicate key or deadlock)
+        frappe.db.sql(
+            f"""
+            INSERT INTO `tab{STATS_DOCTYPE}`
+                (name, creation, modified, owner, modified_by, scope, reference, sample_count)
+            VALUES (%(name)s, %(now)s, %(now)s, %(user)s, %(user)s, %(scope)s, %(reference)s, 0)
+            ON DUPLICATE KEY UPDATE name = name
+            """,
+            {"name": name, "now": now, "user": user, "scope": scope, "reference": reference},
+        )
+        existing = frappe.db.sql(
+            f"SELECT {', '.join(STATS_FIELDS)} FROM `tab{STATS_DOCTYPE}` WHERE name = %s FOR UPDATE",
+            name,
+            as_dict=True,
+        )[0]
+        stats = batch
+        if existing.sample_count:
+            stats = _from_row(existing)
+            stats.merge(batch)
+        frappe.db.set_value(STATS_DOCTYPE, name, _row_values(stats))
+
+
+# ------------------------------
+# Outlier check (upsert_draft_fsl)
+# ------------------------------
+
+
+def expected_range(customer: str, site: str | None = None) -> dict | None:
+    """Bounds from the site's stats, else the customer's; None until enough Final FSLs exist."""
+    keys = [stats_name(scope, ref) for scope, ref in (("Site", site), ("Customer", customer)) if ref]
+    if not keys:
+        return None
+    rows = frappe.db.sql(
+        f"""
+        SELECT name, scope, reference, sample_count, low_bound, high_bound
+        FROM `tab{STATS_DOCTYPE}` WHERE name IN %(keys)s
+        """,
+        {"keys": tuple(keys)},
+        as_dict=True,
+    )
+    min_samples = _conf_float("fsl_weight_min_samples", 20)
+    by_name = {r.name: r for r in rows}
+    for key in keys:
+        row = by_name.get(key)
+        if row and row.sample_count >= min_samples:
+            return row
+    return None
+
+
+def flag_weight(doc) -> bool:
+    """Set or clear weight_outlier (and its review note) on an FSL being saved; True if flagged."""
+    value = flt(doc.get("qty_or_weight"))
+    bounds = expected_range(doc.customer, doc.get("site")) if value > 0 else None
+    outlier = bool(bounds) and not (bounds.low_bound <= value <= bounds.high_bound)
+
+    doc.weight_outlier = 1 if outlier else 0
+    if outlier:
+        note = (
+            f"Weight {value:g} outside {bounds.low_bound:.4g}-{bounds.high_bound:.4g} "
+            f"({bounds.scope} {bounds.reference}, {bounds.sample_count} pickups)"
+        )
+        reason = doc.get("review_reason") or ""
+        doc.needs_review = 1
+        if note not in reason:
+            doc.review_reason = f"{reason}\n{note}" if reason else note
+    elif doc.get("review_reason"):
+        # a corrected weight drops its note; other reasons keep the FSL in review
+        lines = doc.review_reason.split("\n")
+        kept = [line for line in lines if not _WEIGHT_NOTE.match(line)]
+        if len(kept) < len(lines):
+            doc.review_reason = "\n".join(kept) or None
+            if not kept:
+                doc.needs_review = 0
+    return outlier
+
+
+# ------------------------------
+# Rebuild
+# ------------------------------
+
+
+def rebuild_weight_stats(user=None):
+    """Background job: recompute every stats row from Final FSLs."""
+    with frappe.db.unbuffered_cursor():
+        rows = frappe.db.sql(
+            f"""
+            SELECT customer, site, qty_or_weight FROM `tab{FSL_DOCTYPE}`
+            WHERE status = 'Final' AND qty_or_weight > 0
+            """,
+            as_dict=True,
+            as_iterator=True,
+        )
+        totals = _collect(rows)
+
+    now = now_datetime()
+    user = user or frappe.session.user
+    frappe.db.delete(STATS_DOCTYPE)
+    frappe.db.bulk_insert(
+        STATS_DOCTYPE,
+        fields=[
+            "name",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+            "scope",
+            "reference",
+            *STATS_FIELDS,
+            *DERIVED_FIELDS,  # same order as _row_values
+        ],
+        values=[
+            (stats_name(scope, reference), now, now, user, user, scope, reference, *_row_values(stats).values())
+            for (scope, reference), stats in totals.items()
+        ],
+    )
+    frappe.db.commit()
+    frappe.publish_realtime("fsl_weight_stats_rebuilt", {"rows": len(totals)}, user=user)
+    return {"rows": len(totals)}
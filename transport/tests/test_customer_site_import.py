@@ -0,0 +1,50 @@
+import time
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from transport.sites.grid import haversine_m, near_pairs
+from transport.sites.importer import check_columns, read_columns
+
+STATUSES = ["Planned", "Active", "Suspended"]
+
+
+class TestCustomerSiteImport(FrappeTestCase):
+    def _random_sites(self, n: int, seed: int = 3):
+        rng = np.random.default_rng(seed)
+        return np.column_stack([35.6 + rng.random(n) * 0.3, 51.2 + rng.random(n) * 0.4])
+
+    def test_near_pairs_match_brute_force(self):
+        coords = self._random_sites(1500)
+        i, j, _ = near_pairs(coords, coords, 250)
+        found = {(a, b) for a, b in zip(i.tolist(), j.tolist(), strict=True) if a < b}
+
+        dist = haversine_m(coords[:, None, 0], coords[:, None, 1], coords[None, :, 0], coords[None, :, 1])
+        a, b = np.nonzero(np.triu(dist <= 250, k=1))
+        self.assertEqual(found, set(zip(a.tolist(), b.tolist(), strict=True)))
+        self.assertTrue(found)
+
+    def test_50k_sites_in_seconds(self):
+        coords = self._random_sites(50_000)
+        start = time.perf_counter()
+        near_pairs(coords, coords, 15)
+        self.assertLess(time.perf_counter() - start, 2.0)
+
+    def test_column_checks(self):
+        cols = read_columns(
+            "Customer,Address,site_uuid,status,latitude,longitude\n"
+            "C1,A1,u1,Active,35.7,51.4\n"
+            "C1,A1,u2,,35.8,51.5\n"  # address repeated
+            "C2,A3,u1,Closed,\u06f3\u06f5\u066b\u06f6,51.3\n"  # uuid repeated, bad status, Persian digits are fine
+            ",A4,,,abc,51.3\n"  # no customer, bad latitude
+            "C3,A5,,,35.9,\n"  # latitude without longitude
+            "C3,A6\n"  # short row: no coordinates is fine
+        )
+        cols, report = check_columns(cols, STATUSES)
+        self.assertEqual(report.bad.tolist(), [False, True, True, True, True, False])
+        self.assertAlmostEqual(cols["latitude"][2], 35.6)
+        self.assertEqual(cols["has_coords"].tolist(), [True, True, True, False, False, False])
+        problems = {r["line"]: r["problems"] for r in report.rows()}
+        self.assertEqual(problems[3], ["address repeated in the file"])
+        self.assertIn("site_uuid repeated in the file", problems[4])
+        self.assertIn("customer is required", problems[5])
@@ -0,0 +1,69 @@
+import base64
+import json
+import zlib
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from transport.tracking.codec import TrackPayloadError, decode_chunk, decode_wire, encode_chunk
+from transport.tracking.store import _merge, path_length_km
+
+
+def _wire_segment(t, lat, lng):
+    return {
+        "t": np.diff(t, prepend=0).tolist(),
+        "lat": np.diff(lat, prepend=0).tolist(),
+        "lng": np.diff(lng, prepend=0).tolist(),
+    }
+
+
+class TestDriverTrack(FrappeTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.t = 1760860800 + np.cumsum(rng.integers(4, 7, 500))
+        self.lat = 3570000 + np.cumsum(rng.integers(-20, 21, 500))
+        self.lng = 5140000 + np.cumsum(rng.integers(-20, 21, 500))
+
+    def test_wire_json_and_deflate(self):
+        segments = [
+            _wire_segment(self.t[:200], self.lat[:200], self.lng[:200]),
+            _wire_segment(self.t[200:], self.lat[200:], self.lng[200:]),
+        ]
+        t, lat, lng = decode_wire(segments=segments)
+        np.testing.assert_array_equal(t, self.t)
+        np.testing.assert_array_equal(lat, self.lat)
+        np.testing.assert_array_equal(lng, self.lng)
+
+        data = base64.b64encode(zlib.compress(json.dumps(segments).encode())).decode()
+        t2, lat2, lng2 = decode_wire(data=data, encoding="deflate")
+        np.testing.assert_array_equal(t2, self.t)
+        np.testing.assert_array_equal(lat2, self.lat)
+        np.testing.assert_array_equal(lng2, self.lng)
+
+    def test_wire_rejects_bad_input(self):
+        self.assertRaises(TrackPayloadError, decode_wire, [{"t": [1, 2], "lat": [1], "lng": [1]}])
+        self.assertRaises(TrackPayloadError, decode_wire, [{"t": ["a"], "lat": [1], "lng": [1]}])
+        self.assertRaises(TrackPayloadError, decode_wire, data="not base64!", encoding="deflate")
+        self.assertRaises(TrackPayloadError, decode_wire, [], encoding="gzip")
+
+    def test_chunk_round_trip_is_compact(self):
+        offsets = self.t[:600] - self.t[0]
+        blob = encode_chunk(offsets, self.lat, self.lng)
+        back = decode_chunk(blob)
+        np.testing.assert_array_equal(back[0], offsets)
+        np.testing.assert_array_equal(back[2], self.lng)
+        # well under one JSON object per point
+        self.assertLess(len(blob), len(self.t) * 8)
+
+    def test_merge_sorts_and_drops_repeated_timestamps(self):
+        first, _ = _merge(None, np.array([10, 30]), np.array([1, 3]), np.array([1, 3]))
+        merged, count = _merge(first, np.array([20, 30]), np.array([2, 9]), np.array([2, 9]))
+        offsets, lat, _ = decode_chunk(merged)
+        self.assertEqual(count, 3)
+        np.testing.assert_array_equal(offsets, [10, 20, 30])
+        np.testing.assert_array_equal(lat, [1, 2, 3])
+
+    def test_path_length(self):
+        # 0.01 degree of latitude is about 1.11 km
+        self.assertAlmostEqual(path_length_km(np.array([35.70, 35.71]), np.array([51.4, 51.4])), 1.112, places=2)
+        self.assertEqual(path_length_km(np.array([35.7]), np.array([51.4])), 0.0)
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from frappe.tests.utils import FrappeTestCase
+
+from transport.api.field_assets import IMMUTABLE, build_manifest, set_asset_cache_headers, versioned_urls
+
+
+def _exchange(path, version):
+    request = SimpleNamespace(path=path, args={"v": version} if version else {})
+    response = SimpleNamespace(status_code=200, headers={"Cache-Control": "no-cache"})
+    set_asset_cache_headers(response=response, request=request)
+    return response.headers["Cache-Control"]
+
+
+class TestFieldAssets(FrappeTestCase):
+    def test_manifest_lists_hashed_assets(self):
+        manifest = build_manifest()
+        fsl_js = manifest["assets"]["/field/fsl/fsl.js"]
+        self.assertEqual(len(fsl_js["hash"]), 16)
+        self.assertGreater(fsl_js["bytes"], 0)
+        self.assertNotIn("/field/fsl/sw.js", manifest["assets"])
+        self.assertIs(build_manifest(), manifest)  # cached until a file changes
+
+    def test_only_current_versioned_urls_are_immutable(self):
+        current = build_manifest()["assets"]["/field/fsl/fsl.js"]["hash"]
+        self.assertEqual(_exchange("/field/fsl/fsl.js", current), IMMUTABLE)
+        self.assertEqual(_exchange("/field/fsl/fsl.js", "0000000000000000"), "no-cache")
+        self.assertEqual(_exchange("/field/fsl/fsl.js", None), "no-cache")
+        self.assertEqual(_exchange("/field/fsl/sw.js", current), "no-cache")
+
+    def test_versioned_urls_for_template(self):
+        url = versioned_urls()["fsl.js"]
+        self.assertTrue(url.startswith("/field/fsl/fsl.js?v="))
@@ -0,0 +1,27 @@
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.api.field_bootstrap import bootstrap_json, build_field_bootstrap, get_queue_policy
+
+
+class TestFieldBootstrap(FrappeTestCase):
+    def test_json_is_safe_inside_script_tag(self):
+        data = {"notes": "</script><script>alert(1)</script>", "a&b": "<x>"}
+        out = bootstrap_json(data)
+        self.assertNotIn("</script>", out)
+        self.assertNotIn("<", out)
+        self.assertEqual(json.loads(out), data)
+
+    def test_guest_gets_no_profile(self):
+        self.assertEqual(build_field_bootstrap("Guest")["error"], "NOT_LOGGED_IN")
+
+    def test_queue_policy_override(self):
+        frappe.conf.fsl_queue_policy = {"max_retries": 7}
+        try:
+            policy = get_queue_policy()
+        finally:
+            frappe.conf.pop("fsl_queue_policy", None)
+        self.assertEqual(policy["max_retries"], 7)
+        self.assertEqual(policy["max_queue_items"], 10)
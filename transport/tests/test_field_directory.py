@@ -0,0 +1,62 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.directory import snapshot
+from transport.directory.snapshot import build_directory, diff_tables, get_update, unpack
+
+TERRITORY = "_Test Directory Territory"
+
+
+def _tables(**sites):
+    return {
+        "customers": {"C1": ["Bakery"], "C2": ["Clinic"]},
+        "sites": {"S1": ["C1", "u1", "Active", 35.7, 51.4, "08:00-12:00"], **sites},
+    }
+
+
+class TestFieldDirectory(FrappeTestCase):
+    def setUp(self):
+        frappe.cache().delete_keys(f"{snapshot.CACHE_PREFIX}:{TERRITORY}")
+
+    def test_diff_tables(self):
+        old = _tables(S2=["C2", "u2", "Active", None, None, None])
+        new = _tables(S3=["C2", "u3", "Planned", None, None, None])
+        new["customers"]["C1"] = ["Bakery No. 2"]
+        delta = diff_tables(old, new)
+        self.assertEqual(delta["customers"], {"upsert": {"C1": ["Bakery No. 2"]}, "delete": []})
+        self.assertEqual(delta["sites"]["delete"], ["S2"])
+        self.assertEqual(list(delta["sites"]["upsert"]), ["S3"])
+
+    def test_versions_and_deltas(self):
+        with patch.object(snapshot, "load_tables", return_value=_tables()):
+            v1 = build_directory(TERRITORY)["version"]
+            self.assertEqual(build_directory(TERRITORY)["version"], v1)  # same content, same version
+
+        full = unpack(get_update(TERRITORY))
+        self.assertTrue(full["full"])
+        self.assertEqual(full["customers"]["C1"], ["Bakery"])
+
+        with patch.object(snapshot, "load_tables", return_value=_tables(S2=["C2", "u2", "Active", None, None, None])):
+            v2 = build_directory(TERRITORY)["version"]
+        self.assertGreater(v2, v1)
+
+        delta = unpack(get_update(TERRITORY, v1))
+        self.assertFalse(delta["full"])
+        self.assertEqual((delta["base"], delta["version"]), (v1, v2))
+        self.assertEqual(list(delta["sites"]["upsert"]), ["S2"])
+
+        self.assertTrue(unpack(get_update(TERRITORY, v2))["unchanged"])
+        # a version the server no longer has: full snapshot
+        self.assertTrue(unpack(get_update(TERRITORY, v1 - 1))["full"])
+
+    def test_snapshot_evicted_after_head_read(self):
+        stale = {"version": 1, "digest": "gone"}
+        with (
+            patch.object(snapshot, "load_tables", return_value=_tables()),
+            patch.object(snapshot, "get_head", side_effect=[stale, None]),
+        ):
+            full = unpack(get_update(TERRITORY))
+        self.assertTrue(full["full"])
+        self.assertGreater(full["version"], 1)
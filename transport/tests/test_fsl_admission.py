@@ -0,0 +1,24 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.api.admission import ServerBusyError, admission_slot
+from transport.loadtest.reconnect_burst import percentile
+
+
+class TestFSLAdmission(FrappeTestCase):
+    def test_rejects_when_slots_are_taken(self):
+        with admission_slot("test_pool", slots=1):
+            with self.assertRaises(ServerBusyError):
+                with admission_slot("test_pool", slots=1):
+                    pass
+            self.assertGreaterEqual(frappe.local.response.get("retry_after"), 1)
+
+        # slot was released on exit
+        with admission_slot("test_pool", slots=1):
+            pass
+
+    def test_percentile(self):
+        values = [10, 20, 30, 40, 50]
+        self.assertEqual(percentile(values, 50), 30)
+        self.assertEqual(percentile(values, 100), 50)
+        self.assertEqual(percentile([], 95), 0.0)
@@ -0,0 +1,36 @@
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.archival.jobs import _in_working_hours
+from transport.archival.store import decode_payload, encode_payload
+
+
+class TestFSLArchive(FrappeTestCase):
+    def test_payload_round_trip(self):
+        row = frappe._dict(
+            name="abc123",
+            trip_id="t" * 32,
+            qty_or_weight=12.5,
+            trip_date=frappe.utils.getdate("2025-01-02"),
+            notes="پسماند",
+        )
+        data = decode_payload(encode_payload(row))
+        self.assertEqual(data["trip_id"], row.trip_id)
+        self.assertEqual(data["qty_or_weight"], 12.5)
+        self.assertEqual(data["trip_date"], "2025-01-02")
+        self.assertEqual(data["notes"], "پسماند")
+
+    def test_working_hours_window(self):
+        with patch.dict(frappe.conf, {"archive_working_hours": "07:00-19:00"}):
+            self.assertTrue(_in_working_hours("2026-01-01 10:30:00"))
+            self.assertFalse(_in_working_hours("2026-01-01 02:00:00"))
+            self.assertFalse(_in_working_hours("2026-01-01 19:00:00"))
+
+    def test_working_hours_past_midnight(self):
+        with patch.dict(frappe.conf, {"archive_working_hours": "22:00-06:00"}):
+            self.assertTrue(_in_working_hours("2026-01-01 23:30:00"))
+            self.assertTrue(_in_working_hours("2026-01-01 02:00:00"))
+            self.assertFalse(_in_working_hours("2026-01-01 06:00:00"))
+            self.assertFalse(_in_working_hours("2026-01-01 12:00:00"))
@@ -0,0 +1,57 @@
+from datetime import date, datetime
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.board import events
+from transport.board.events import BOARD_FIELDS, compact_row, flush_board, stage_changes
+
+TERRITORY = "_Test Board Territory"
+
+
+def _row(name, status="Draft", qty=10):
+    return compact_row(
+        (name, status, date(2026, 10, 19), "DRV-1", "Driver One", "C1", qty, 0, datetime(2026, 10, 19, 9, 0))
+    )
+
+
+class TestFSLBoard(FrappeTestCase):
+    def setUp(self):
+        cache = frappe.cache()
+        for prefix in (events.PENDING_PREFIX, events.SCHEDULED_PREFIX):
+            cache.delete(cache.make_key(f"{prefix}:{TERRITORY}"))
+
+    def test_compact_row(self):
+        row = _row("FSL-1", qty=None)
+        self.assertEqual(len(row), len(BOARD_FIELDS))
+        self.assertEqual(row[2], "2026-10-19")
+        self.assertEqual(row[6], 0.0)
+        frappe.parse_json(frappe.as_json(row))  # JSON-ready
+
+    def test_burst_becomes_one_event(self):
+        batches = [
+            [(TERRITORY, _row("FSL-1", qty=10)), (TERRITORY, _row("FSL-2"))],
+            [(TERRITORY, _row("FSL-1", qty=12))],
+            [(TERRITORY, _row("FSL-1", status="Final", qty=12))],
+        ]
+        with (
+            patch.object(events, "board_rows", side_effect=batches),
+            patch.object(events.frappe, "enqueue") as enqueue,
+        ):
+            for _ in batches:
+                stage_changes(["FSL-1"])
+        self.assertEqual(enqueue.call_count, 1)  # only the first change schedules a flush
+
+        with (
+            patch.object(events.time, "sleep"),
+            patch.object(events.frappe, "publish_realtime") as publish,
+        ):
+            self.assertEqual(flush_board(TERRITORY), 2)
+            self.assertEqual(flush_board(TERRITORY), 0)  # drained
+
+        publish.assert_called_once()
+        message = publish.call_args.args[1]
+        self.assertEqual(message["territory"], TERRITORY)
+        self.assertEqual([r[0] for r in message["rows"]], ["FSL-1", "FSL-2"])
+        self.assertEqual(message["rows"][0][1], "Final")  # latest state wins
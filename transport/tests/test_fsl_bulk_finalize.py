@@ -0,0 +1,29 @@
+from unittest.mock import MagicMock, patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.finalization.bulk import invalid_reason, mark_final, run_finalize_hooks
+
+
+class TestFSLBulkFinalize(FrappeTestCase):
+    def test_invalid_reason(self):
+        ok = frappe._dict(name="a", driver="DRV-1", driver_name="DRV-1", service_type="Pickup")
+        self.assertIsNone(invalid_reason(ok))
+        self.assertEqual(
+            invalid_reason(frappe._dict(ok, driver="")),
+            "FSL has no driver set",
+        )
+        self.assertIn("does not exist", invalid_reason(frappe._dict(ok, driver_name=None)))
+
+    def test_nothing_to_finalize(self):
+        self.assertEqual(mark_final([]), [])
+        self.assertEqual(mark_final(["does-not-exist"]), [])
+
+    def test_hooks_receive_names(self):
+        hook = MagicMock()
+        with patch("frappe.get_hooks", return_value=["transport.some.hook"]), patch(
+            "frappe.get_attr", return_value=hook
+        ):
+            run_finalize_hooks(["x", "y"])
+        hook.assert_called_once_with(["x", "y"])
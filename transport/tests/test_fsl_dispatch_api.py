@@ -0,0 +1,29 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.api.dispatch import build_page_query, decode_cursor, encode_cursor, parse_fields
+
+
+class TestFSLDispatchAPI(FrappeTestCase):
+    def test_cursor_round_trip(self):
+        cursor = encode_cursor("2026-10-19", "abc123")
+        self.assertNotIn("=", cursor)
+        self.assertEqual(decode_cursor(cursor), ("2026-10-19", "abc123"))
+        self.assertRaises(frappe.ValidationError, decode_cursor, "not-a-cursor")
+
+    def test_projection(self):
+        self.assertEqual(parse_fields("status,customer"), ["status", "customer", "trip_date", "name"])
+        self.assertEqual(parse_fields('["name", "trip_date"]'), ["name", "trip_date"])
+        self.assertRaises(frappe.ValidationError, parse_fields, ["status", "qr_token"])
+
+    def test_page_query_is_keyset(self):
+        cursor = encode_cursor("2026-10-19", "abc123")
+        sql, params = build_page_query(
+            {"territory": "North", "is_safety_critical": "1"}, ["name", "trip_date"], cursor, 50
+        )
+        self.assertNotIn("OFFSET", sql.upper())
+        self.assertIn("f.trip_date < %(cursor_date)s", sql)
+        self.assertIn("ORDER BY f.trip_date DESC, f.name DESC", sql)
+        self.assertEqual(params["limit"], 51)
+        self.assertEqual(params["is_safety_critical"], 1)
+        self.assertEqual(params["territory"], "North")
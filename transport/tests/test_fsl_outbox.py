@@ -0,0 +1,120 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.outbox.dispatcher import backoff_seconds, dispatch_batch
+from transport.outbox.events import OUTBOX_DOCTYPE
+from transport.outbox.sinks import HttpSink, SinkUnavailable, batch_key
+
+
+class _StubAccounting(BaseHTTPRequestHandler):
+    """Accounting bridge stand-in; behaviour is set per test on the server object."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append({"headers": dict(self.headers), "body": body})
+
+        status, reply, headers = self.server.respond(body)
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(reply).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class TestFSLOutbox(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubAccounting)
+        cls.server.requests = []
+        cls.server.respond = lambda body: (200, {}, {})
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}/events"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.requests.clear()
+        self.server.respond = lambda body: (200, {}, {})
+
+    def _events(self, n=3):
+        return [
+            {"idempotency_key": f"fsl.finalized:TEST-{i}", "event_type": "fsl.finalized", "payload": {"i": i}}
+            for i in range(n)
+        ]
+
+    def test_sink_posts_batch_with_idempotency_key(self):
+        events = self._events()
+        result = HttpSink(self.url).send(events)
+
+        self.assertEqual(result.status, 200)
+        self.assertEqual(result.rejected, {})
+        sent = self.server.requests[0]
+        self.assertEqual(sent["headers"]["Idempotency-Key"], batch_key(events))
+        self.assertEqual(sent["body"]["events"], events)
+
+    def test_sink_reports_per_event_rejections(self):
+        self.server.respond = lambda body: (200, {"rejected": {"fsl.finalized:TEST-1": "unknown customer"}}, {})
+        result = HttpSink(self.url).send(self._events())
+        self.assertEqual(result.rejected, {"fsl.finalized:TEST-1": "unknown customer"})
+
+    def test_sink_unavailable_on_5xx_and_429(self):
+        self.server.respond = lambda body: (503, {}, {"Retry-After": "7"})
+        with self.assertRaises(SinkUnavailable) as ctx:
+            HttpSink(self.url).send(self._events())
+        self.assertEqual(ctx.exception.retry_after, 7)
+
+        self.server.respond = lambda body: (429, {}, {})
+        self.assertRaises(SinkUnavailable, HttpSink(self.url).send, self._events())
+
+    def test_duplicate_batch_counts_as_delivered(self):
+        self.server.respond = lambda body: (409, {}, {})
+        self.assertEqual(HttpSink(self.url).send(self._events()).rejected, {})
+
+    def test_backoff_grows_and_is_capped(self):
+        self.assertEqual(backoff_seconds(1, base=30, rand=lambda: 0), 15)
+        self.assertEqual(backoff_seconds(3, base=30, rand=lambda: 1), 120)
+        self.assertEqual(backoff_seconds(20, base=30, cap=3600, rand=lambda: 1), 3600)
+
+    def test_dispatch_marks_sent_and_retries(self):
+        # dispatch_batch commits per round; keep this test's rows in the transaction FrappeTestCase rolls back
+        with patch.object(frappe.db, "commit"):
+            names = []
+            for event in self._events(2):
+                doc = frappe.get_doc(
+                    {
+                        "doctype": OUTBOX_DOCTYPE,
+                        "event_type": event["event_type"],
+                        "idempotency_key": event["idempotency_key"] + frappe.generate_hash(length=6),
+                        "status": "Pending",
+                        "next_attempt_at": frappe.utils.add_to_date(frappe.utils.now_datetime(), seconds=-1),
+                        "payload": json.dumps(event["payload"]),
+                    }
+                ).insert(ignore_permissions=True)
+                names.append(doc.name)
+
+            self.server.respond = lambda body: (503, {}, {})
+            outcome = dispatch_batch(HttpSink(self.url), size=500)
+            self.assertTrue(outcome["unavailable"])
+            for name in names:
+                event = frappe.get_doc(OUTBOX_DOCTYPE, name)
+                self.assertEqual((event.status, event.attempts), ("Pending", 1))
+                frappe.db.set_value(OUTBOX_DOCTYPE, name, "next_attempt_at", frappe.utils.now_datetime())
+
+            self.server.respond = lambda body: (200, {}, {})
+            outcome = dispatch_batch(HttpSink(self.url), size=500)
+            self.assertGreaterEqual(outcome["sent"], 2)
+            for name in names:
+                self.assertEqual(frappe.db.get_value(OUTBOX_DOCTYPE, name, "status"), "Sent")
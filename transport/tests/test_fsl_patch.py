@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.api.fsl import _changed_fields, _is_stale
+
+
+def _stored(**values):
+    doc = frappe._dict(
+        qty_or_weight=40.0,
+        package_count=3,
+        is_waste_safe=1,
+        safety_issue_reason=None,
+        photo="/files/a.jpg",
+        performed_at="2026-10-19 08:00:00",
+        fsl_version=4,
+    )
+    doc.update(values)
+    return doc
+
+
+class TestFSLPatch(FrappeTestCase):
+    def test_identical_payload_changes_nothing(self):
+        payload = {
+            "qty_or_weight": 40,
+            "package_count": 3,
+            "is_waste_safe": 1,
+            "safety_issue_reason": "",
+            "photo": "/files/a.jpg",
+            "performed_at": datetime(2026, 10, 19, 8, 30),
+        }
+        self.assertEqual(_changed_fields(_stored(), payload), {})
+
+    def test_only_differing_fields_are_written(self):
+        payload = {"qty_or_weight": 42.5, "is_waste_safe": 0, "photo": "/files/a.jpg"}
+        self.assertEqual(_changed_fields(_stored(), payload), {"qty_or_weight": 42.5, "is_waste_safe": 0})
+
+    def test_older_performed_at_is_stale(self):
+        doc = _stored()
+        self.assertTrue(_is_stale(doc, {"performed_at": datetime(2026, 10, 19, 7, 59)}))
+        self.assertFalse(_is_stale(doc, {"performed_at": datetime(2026, 10, 19, 8, 0)}))
+        self.assertFalse(_is_stale(doc, {"qty_or_weight": 1}))
+        self.assertFalse(_is_stale(_stored(performed_at=None), {"performed_at": datetime(2026, 1, 1)}))
@@ -0,0 +1,68 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.api import fsl_schema
+from transport.api.fsl import ALLOWED_FIELDS
+from transport.api.fsl_schema import PayloadError, parse_payload
+from transport.loadtest.payload_bench import make_payloads
+
+
+class TestFSLPayloadSchema(FrappeTestCase):
+    def test_coerces_form_values(self):
+        out = parse_payload(
+            '{"qty_or_weight": "\u06f1\u06f2\u066b\u06f5", "package_count": "3", "is_waste_safe": true,'
+            ' "is_waste_collected": "0", "performed_at": "2026-10-19T08:00:00.123Z"}',
+            ALLOWED_FIELDS,
+        )
+        self.assertEqual(out["qty_or_weight"], 12.5)
+        self.assertEqual(out["package_count"], 3)
+        self.assertEqual(out["is_waste_safe"], 1)
+        self.assertEqual(out["is_waste_collected"], 0)
+        self.assertEqual(out["performed_at"], datetime(2026, 10, 19, 8, 0, 0, 123000))
+
+    def test_drops_unknown_keys(self):
+        out = parse_payload('{"photo_data_url": "data:...", "status": "Final", "gps_lat": 35.7}', ALLOWED_FIELDS)
+        self.assertEqual(out, {"gps_lat": 35.7})
+
+    def test_rejects_bad_values_together(self):
+        with self.assertRaises(PayloadError) as ctx:
+            parse_payload(
+                '{"qty_or_weight": "abc", "package_count": 1.5, "is_waste_safe": 2, "performed_at": "yesterday"}',
+                ALLOWED_FIELDS,
+            )
+        message = str(ctx.exception)
+        for field in ("qty_or_weight", "package_count", "is_waste_safe", "performed_at"):
+            self.assertIn(field, message)
+
+    def test_rejects_malformed_whole_numbers(self):
+        for value in ("--5", "\u00b2", "5\u00b2"):
+            with self.assertRaises(PayloadError):
+                parse_payload(frappe.as_json({"package_count": value}), ALLOWED_FIELDS)
+
+    def test_long_attach_url_accepted(self):
+        url = "/private/files/" + "x" * 200 + ".jpg"
+        self.assertEqual(parse_payload(frappe.as_json({"photo": url}), ALLOWED_FIELDS), {"photo": url})
+
+    def test_rejects_non_finite_and_bad_json(self):
+        self.assertRaises(PayloadError, parse_payload, '{"gps_lat": NaN}', ALLOWED_FIELDS)
+        self.assertRaises(PayloadError, parse_payload, "{not json", ALLOWED_FIELDS)
+
+    def test_rejected_before_db_access(self):
+        fsl_schema.get_schema(ALLOWED_FIELDS)  # meta may be loaded from the DB on first use
+        with patch.object(frappe.db, "sql") as sql, patch.object(frappe.db, "get_value") as get_value:
+            with self.assertRaises(PayloadError):
+                frappe.get_attr("transport.api.fsl.upsert_draft_fsl")(
+                    qr_token="x", driver_canonical_id="y", payload_json='{"package_count": "many"}'
+                )
+        sql.assert_not_called()
+        get_value.assert_not_called()
+
+    def test_same_result_without_orjson(self):
+        payloads = make_payloads(20)
+        fast = [parse_payload(p, ALLOWED_FIELDS) for p in payloads]
+        with patch.object(fsl_schema, "orjson", None):
+            slow = [parse_payload(p, ALLOWED_FIELDS) for p in payloads]
+        self.assertEqual(fast, slow)
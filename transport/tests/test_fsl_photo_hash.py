@@ -0,0 +1,67 @@
+import io
+import random
+
+import frappe
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+from PIL import Image
+
+from transport.photos.dhash import bands, dhash_image, hamming, is_informative, probe_radius, probes, to_hex
+from transport.photos.jobs import HASH_DOCTYPE, find_near_duplicate
+
+
+def _photo(seed, size=(640, 480)):
+    rng = np.random.default_rng(seed)
+    # smooth random scene, closer to a photo than white noise
+    small = rng.integers(0, 256, (12, 16, 3), dtype=np.uint8)
+    return Image.fromarray(small).resize(size, Image.Resampling.BICUBIC)
+
+
+def _jpeg(img, quality):
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return Image.open(io.BytesIO(buf.getvalue()))
+
+
+class TestFSLPhotoHash(FrappeTestCase):
+    def test_reupload_is_near_other_photo_is_far(self):
+        original = dhash_image(_photo(1))
+        recompressed = dhash_image(_jpeg(_photo(1).resize((320, 240)), quality=40))
+        other = dhash_image(_photo(2))
+
+        self.assertLessEqual(hamming(original, recompressed), 6)
+        self.assertGreater(hamming(original, other), 16)
+
+    def test_blank_photo_is_not_informative(self):
+        self.assertFalse(is_informative(dhash_image(Image.new("RGB", (200, 200), "white"))))
+        self.assertTrue(is_informative(dhash_image(_photo(3))))
+
+    def test_band_probes_cover_the_distance(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            a = rng.getrandbits(64)
+            b = a
+            for bit in rng.sample(range(64), 6):
+                b ^= 1 << bit
+            radius = probe_radius(6)
+            self.assertTrue(any(bb in probes(ba, radius) for ba, bb in zip(bands(a), bands(b), strict=True)))
+
+    def test_find_near_duplicate_skips_same_trip(self):
+        base = dhash_image(_photo(4))
+        near = base ^ 0b101  # 2 bits away
+        rows = [("FSL-PH-1", "TRIP-A", base), ("FSL-PH-2", "TRIP-B", dhash_image(_photo(5)))]
+        for name, trip_id, value in rows:
+            doc = frappe.get_doc(
+                {
+                    "doctype": HASH_DOCTYPE,
+                    "fsl": name,
+                    "trip_id": trip_id,
+                    "phash": to_hex(value),
+                    **{f"band_{i}": band for i, band in enumerate(bands(value))},
+                }
+            )
+            doc.flags.ignore_links = True
+            doc.insert(ignore_permissions=True)
+
+        self.assertEqual(find_near_duplicate(near, "TRIP-C", 6), ("FSL-PH-1", 2))
+        self.assertIsNone(find_near_duplicate(near, "TRIP-A", 6))
@@ -0,0 +1,71 @@
+import json
+
+from frappe.tests.utils import FrappeTestCase
+
+from transport.tracing.spans import compute_spans, latency_percentiles, parse_trace
+
+TRACE_ID = "0123456789abcdef0123456789abcdef"
+
+
+class TestFslTrace(FrappeTestCase):
+    def test_parse_keeps_known_device_stages(self):
+        trace = parse_trace(
+            json.dumps(
+                {
+                    "id": TRACE_ID,
+                    "retry_count": 2,
+                    "stages": {"captured": 1000, "sent": 4000, "accepted": 1, "queued": "x"},
+                }
+            )
+        )
+        self.assertEqual(trace["stages"], {"captured": 1000.0, "sent": 4000.0})
+        self.assertEqual(trace["retry_count"], 2)
+
+    def test_parse_rejects_unusable_traces(self):
+        self.assertIsNone(parse_trace("not json"))
+        self.assertIsNone(parse_trace(json.dumps({"id": "<script>", "stages": {"captured": 1}})))
+        self.assertIsNone(parse_trace(json.dumps({"id": TRACE_ID, "stages": {"sent": 1}})))
+
+    def test_spans_do_not_mix_clocks(self):
+        # device clock an hour ahead of the server: spans stay within each clock
+        device = 3_600_000
+        spans = compute_spans(
+            {
+                "captured": device + 0,
+                "queued": device + 500,
+                "first_attempt": device + 60_000,
+                "sent": device + 90_000,
+                "accepted": 90_200,
+                "committed": 90_260,
+            }
+        )
+        self.assertEqual(spans["device_ms"], 90_000)
+        self.assertEqual(spans["queue_ms"], 89_500)
+        self.assertEqual(spans["retry_ms"], 30_000)
+        self.assertEqual(spans["server_ms"], 60)
+        self.assertEqual(spans["end_to_end_ms"], 90_060)
+
+    def test_online_trace_has_no_queue_span(self):
+        spans = compute_spans({"captured": 0, "first_attempt": 10, "sent": 10, "accepted": 5, "committed": 25})
+        self.assertIsNone(spans["queue_ms"])
+        self.assertEqual(spans["end_to_end_ms"], 30)
+
+    def test_percentiles_per_group(self):
+        rows = [
+            {"driver": "D1", "was_queued": 0, "end_to_end_ms": float(ms), "server_ms": 20.0}
+            for ms in range(1, 101)
+        ] + [
+            {"driver": "D2", "was_queued": 1, "end_to_end_ms": 60_000.0, "queue_ms": 50_000.0},
+            {"driver": "D2", "was_queued": 1, "end_to_end_ms": None},
+        ]
+        out = latency_percentiles(rows, "driver")
+
+        self.assertEqual([g["driver"] for g in out], ["D2", "D1"])  # slowest first
+        d2, d1 = out
+        self.assertEqual(d1["count"], 100)
+        self.assertAlmostEqual(d1["p50_ms"], 50.5)
+        self.assertAlmostEqual(d1["p99_ms"], 99.01)
+        self.assertEqual(d1["server_p90_ms"], 20.0)
+        self.assertIsNone(d1["queue_p90_ms"])
+        self.assertEqual(d2["queued_pct"], 100.0)
+        self.assertEqual(d2["p50_ms"], 60_000.0)
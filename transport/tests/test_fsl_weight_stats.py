@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+import frappe
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from transport.stats.sketch import ALPHA, LogSketch, RunningStats
+from transport.stats.weights import flag_weight
+
+
+def _stats(values) -> RunningStats:
+    stats = RunningStats()
+    for v in values:
+        stats.add(float(v))
+    return stats
+
+
+class TestFSLWeightStats(FrappeTestCase):
+    def setUp(self):
+        self.values = np.random.default_rng(11).lognormal(mean=3.5, sigma=0.4, size=5000)
+
+    def test_welford_matches_numpy_and_merges(self):
+        whole = _stats(self.values)
+        left, right = _stats(self.values[:1234]), _stats(self.values[1234:])
+        left.merge(right)
+
+        for stats in (whole, left):
+            self.assertEqual(stats.count, 5000)
+            self.assertAlmostEqual(stats.mean, self.values.mean(), places=9)
+            self.assertAlmostEqual(stats.variance, self.values.var(ddof=1), places=6)
+            self.assertEqual(stats.max_value, self.values.max())
+
+    def test_sketch_quantiles_within_relative_error(self):
+        sketch = LogSketch.from_json(_stats(self.values).sketch.to_json())
+        for q in (0.01, 0.5, 0.99):
+            exact = np.quantile(self.values, q, method="lower")
+            self.assertLessEqual(abs(sketch.quantile(q) - exact) / exact, ALPHA * 1.01)
+        self.assertLess(len(sketch.buckets), 200)
+
+    def test_misplaced_decimal_point_is_out_of_range(self):
+        low, high = _stats(self.values).expected_range(factor=3)
+        median = float(np.median(self.values))
+        self.assertTrue(low <= median <= high)
+        self.assertGreater(median * 100, high)
+        self.assertLess(median / 100, low)
+
+    def test_flag_weight_sets_review_once(self):
+        bounds = frappe._dict(scope="Customer", reference="CUST-1", sample_count=40, low_bound=5, high_bound=300)
+        doc = frappe._dict(customer="CUST-1", qty_or_weight=4000, review_reason=None)
+        with patch("transport.stats.weights.expected_range", return_value=bounds):
+            self.assertTrue(flag_weight(doc))
+            flag_weight(doc)
+            self.assertEqual(doc.needs_review, 1)
+            self.assertEqual(doc.review_reason.count("Weight 4000"), 1)
+
+            doc.qty_or_weight = 40
+            self.assertFalse(flag_weight(doc))
+            self.assertEqual(doc.weight_outlier, 0)
+            self.assertEqual(doc.needs_review, 0)
+            self.assertIsNone(doc.review_reason)
+
+    def test_corrected_weight_keeps_other_review_reasons(self):
+        bounds = frappe._dict(scope="Customer", reference="CUST-1", sample_count=40, low_bound=5, high_bound=300)
+        doc = frappe._dict(customer="CUST-1", qty_or_weight=4000, review_reason="Photo reused")
+        with patch("transport.stats.weights.expected_range", return_value=bounds):
+            flag_weight(doc)
+            doc.qty_or_weight = 40
+            flag_weight(doc)
+        self.assertEqual(doc.needs_review, 1)
+        self.assertEqual(doc.review_reason, "Photo reused")
@@ -0,0 +1,73 @@
+from datetime import date
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.portal import history
+from transport.portal.history import (
+    decode_cursor,
+    encode_cursor,
+    fetch_page,
+    get_history_page,
+    invalidate_customers,
+)
+
+CUSTOMER = "_Test Portal Customer"
+
+
+def _db_row(name, trip_date, **values):
+    return frappe._dict(
+        {
+            "name": name,
+            "trip_date": trip_date,
+            "performed_at": None,
+            "site": "SITE-1",
+            "address": "Main St",
+            "qty_or_weight": 12.5,
+            "package_count": 2,
+            "is_waste_safe": 1,
+            "safety_issue_reason": None,
+            "is_safety_resolved": 0,
+            "photo": None,
+            "safety_issue_photo": None,
+            **values,
+        }
+    )
+
+
+class TestPortalHistory(FrappeTestCase):
+    def test_cursor_roundtrip(self):
+        cursor = encode_cursor(date(2026, 10, 19), "FSL|odd")
+        self.assertEqual(decode_cursor(cursor), (date(2026, 10, 19), "FSL|odd"))
+        self.assertIsNone(decode_cursor(None))
+        self.assertIsNone(decode_cursor("garbage"))
+
+    def test_keyset_page(self):
+        rows = [_db_row(f"FSL-{i}", date(2026, 10, 19 - i)) for i in range(3)]
+        rows[1].update(is_waste_safe=0, safety_issue_reason="Leaking drum", photo="/private/files/a.jpg")
+        with patch.object(history.frappe.db, "sql", return_value=rows) as sql:
+            page = fetch_page(CUSTOMER, (date(2026, 10, 20), "FSL-9"), limit=2)
+
+        params = sql.call_args.args[1]
+        self.assertEqual(params["limit"], 3)  # one extra row tells whether there is a next page
+        self.assertEqual((params["after_date"], params["after_name"]), (date(2026, 10, 20), "FSL-9"))
+        self.assertIn("f.trip_date < %(after_date)s", sql.call_args.args[0])
+
+        self.assertEqual([r["name"] for r in page["rows"]], ["FSL-0", "FSL-1"])
+        self.assertEqual(page["next"], "2026-10-18|FSL-1")
+        self.assertEqual(page["rows"][1]["safety_note"], "Leaking drum")
+        self.assertEqual(len(page["rows"][1]["thumbnails"]), 1)
+        self.assertNotIn("/private/files", page["rows"][1]["thumbnails"][0])
+        frappe.parse_json(frappe.as_json(page))  # cacheable and JSON-ready
+
+    def test_finalize_invalidates_cached_pages(self):
+        first = {"rows": [], "next": None}
+        second = {"rows": [{"name": "FSL-1"}], "next": None}
+        with patch.object(history, "fetch_page", side_effect=[first, second]) as fetch:
+            invalidate_customers([CUSTOMER])  # start from a fresh generation
+            get_history_page(CUSTOMER)
+            self.assertEqual(get_history_page(CUSTOMER)["rows"], [])  # served from cache
+            invalidate_customers([CUSTOMER])
+            self.assertEqual(get_history_page(CUSTOMER)["rows"], [{"name": "FSL-1"}])
+        self.assertEqual(fetch.call_count, 2)
@@ -0,0 +1,43 @@
+import unittest
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from transport.utils.replica import LAG_CACHE_KEY, is_on_replica, replica_read
+
+HAS_REPLICA = bool(frappe.conf.get("read_from_replica") and frappe.conf.get("replica_host"))
+
+
+@replica_read
+def _where_am_i():
+    return is_on_replica()
+
+
+class TestReplicaRouting(FrappeTestCase):
+    def test_primary_when_no_replica_configured(self):
+        if HAS_REPLICA:
+            self.skipTest("replica configured")
+        self.assertFalse(_where_am_i())
+
+    def test_request_args_are_filtered(self):
+        @replica_read
+        def fn(a=None):
+            return a
+
+        self.assertEqual(fn(a=1, cmd="transport.api.x"), 1)
+
+    @unittest.skipUnless(HAS_REPLICA, "needs read_from_replica + replica_host in site_config")
+    def test_reads_go_to_replica_and_back(self):
+        primary = frappe.db
+        frappe.cache().delete_value(LAG_CACHE_KEY)
+
+        self.assertTrue(_where_am_i())
+        self.assertIs(frappe.db, primary)
+
+    @unittest.skipUnless(HAS_REPLICA, "needs read_from_replica + replica_host in site_config")
+    def test_lagging_replica_falls_back_to_primary(self):
+        frappe.cache().set_value(LAG_CACHE_KEY, 3600, expires_in_sec=5)
+        try:
+            self.assertFalse(_where_am_i())
+        finally:
+            frappe.cache().delete_value(LAG_CACHE_KEY)
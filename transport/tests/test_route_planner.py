@@ -0,0 +1,51 @@
+import time
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from transport.routing.planner import parse_service_window, plan_route, sweep_partition
+
+
+class TestRoutePlanner(FrappeTestCase):
+    def _random_sites(self, n: int, seed: int = 7):
+        rng = np.random.default_rng(seed)
+        return np.column_stack([35.6 + rng.random(n) * 0.3, 51.2 + rng.random(n) * 0.4])
+
+    def test_parse_service_window(self):
+        self.assertEqual(parse_service_window("08:00-12:30"), (480, 750))
+        self.assertEqual(parse_service_window("8-12"), (480, 720))
+        self.assertEqual(parse_service_window("\u06f1\u06f0:\u06f0\u06f0 تا \u06f1\u06f4:\u06f0\u06f0"), (600, 840))
+        self.assertEqual(parse_service_window(""), (0, 1440))
+        self.assertEqual(parse_service_window("whenever"), (0, 1440))
+
+    def test_order_is_a_permutation(self):
+        coords = self._random_sites(40)
+        result = plan_route(coords)
+        self.assertEqual(sorted(result["order"]), list(range(40)))
+        self.assertEqual(len(result["eta"]), 40)
+
+    def test_improves_on_construction(self):
+        coords = self._random_sites(120)
+        construction = plan_route(coords, service_minutes=2, max_seconds=0)
+        improved = plan_route(coords, service_minutes=2, max_seconds=2)
+        self.assertLess(improved["distance_km"], construction["distance_km"])
+
+    def test_service_windows_respected(self):
+        # two far-apart groups; the east group only opens in the afternoon
+        coords = [(35.70, 51.30), (35.70, 51.31), (35.70, 51.60), (35.70, 51.61)]
+        windows = [(420, 720), (420, 720), (780, 1020), (780, 1020)]
+        result = plan_route(coords, windows)
+        self.assertEqual(result["late_stops"], 0)
+        self.assertEqual(set(result["order"][:2]), {0, 1})
+
+    def test_200_stops_under_a_second(self):
+        coords = self._random_sites(200)
+        start = time.perf_counter()
+        plan_route(coords, service_minutes=2)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+    def test_sweep_partition_covers_all_stops(self):
+        coords = self._random_sites(31)
+        parts = sweep_partition(coords, 3)
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(sorted(np.concatenate(parts).tolist()), list(range(31)))
@@ -0,0 +1,45 @@
+import time
+
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from transport.forecasting.holt_winters import fit_forecast, param_grid
+
+
+class TestSiteVolumeForecast(FrappeTestCase):
+    def _weekly(self, n: int, weeks: int = 12, seed: int = 5):
+        rng = np.random.default_rng(seed)
+        pattern = np.array([40.0, 55.0, 50.0, 60.0, 45.0, 10.0, 0.0])
+        scale = 0.5 + rng.random((n, 1))
+        y = np.tile(pattern, weeks)[None, :] * scale
+        return y + rng.normal(0, 2, y.shape), pattern[None, :] * scale
+
+    def test_recovers_weekly_pattern(self):
+        y, truth = self._weekly(50)
+        out = fit_forecast(y, horizon=7)
+        # history is a whole number of weeks, so the forecast starts on the pattern's first day
+        error = np.abs(out["forecast"] - truth).mean() / truth.mean()
+        self.assertLess(error, 0.1)
+        self.assertTrue((out["upper"] >= out["forecast"]).all())
+
+    def test_shapes_and_non_negative(self):
+        y = np.zeros((3, 28))
+        y[1, ::7] = 5.0
+        y[2, -3:] = [30.0, 1.0, 0.0]  # sharp drop pulls a trend model below zero
+        out = fit_forecast(y, horizon=10)
+        self.assertEqual(out["forecast"].shape, (3, 10))
+        self.assertEqual(out["rmse"].shape, (3,))
+        self.assertEqual(out["params"].shape, (3, 3))
+        self.assertTrue((out["forecast"] >= 0).all())
+        np.testing.assert_allclose(out["forecast"][0], 0)
+        self.assertTrue(set(map(tuple, out["params"])) <= set(map(tuple, param_grid())))
+
+    def test_short_history_rejected(self):
+        with self.assertRaises(ValueError):
+            fit_forecast(np.ones((2, 10)))
+
+    def test_30k_sites_in_seconds(self):
+        y, _ = self._weekly(30_000)
+        start = time.perf_counter()
+        fit_forecast(y, horizon=7)
+        self.assertLess(time.perf_counter() - start, 5.0)
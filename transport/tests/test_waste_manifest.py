@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from PIL import Image
+
+from transport.manifests import jobs, render
+from transport.manifests.jobs import TEMPLATE_PATH, content_hash, manifest_signature
+
+
+def _row(**kw):
+    row = frappe._dict(
+        name="FSL-1",
+        modified="2026-10-19 10:00:00",
+        trip_id="t" * 32,
+        performed_at="2026-10-19 09:12:00",
+        qty_or_weight=12.5,
+        package_count=2,
+        is_waste_safe=1,
+        safety_issue_reason=None,
+        is_safety_critical=0,
+        is_safety_resolved=0,
+    )
+    row.update(kw)
+    return row
+
+
+class TestWasteManifest(FrappeTestCase):
+    def setUp(self):
+        with open(frappe.get_app_path("transport", *TEMPLATE_PATH), encoding="utf-8") as f:
+            render.init_worker(f.read())
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _manifest(self, rows):
+        return {
+            "name": "WM-CUST-2026-10-19",
+            "customer": "CUST",
+            "customer_name": "Customer <b>One</b>",
+            "manifest_date": "2026-10-19",
+            "generated_at": "2026-10-20 02:00",
+            "signature": "sig",
+            "content_hash": "hash",
+            "fsl_count": len(rows),
+            "total_weight": 12.5,
+            "total_packages": 2,
+            "safety_issues": 0,
+            "rows": rows,
+        }
+
+    def test_signature_covers_content(self):
+        secret = b"s3cret"
+        base = manifest_signature("CUST", "2026-10-19", [_row()], secret)
+        self.assertEqual(base, manifest_signature("CUST", "2026-10-19", [_row()], secret))
+        self.assertNotEqual(base, manifest_signature("CUST", "2026-10-19", [_row(qty_or_weight=13)], secret))
+        self.assertNotEqual(base, manifest_signature("CUST", "2026-10-19", [_row()], b"other"))
+
+    def test_nightly_job_skipped_without_secret(self):
+        with (
+            patch.dict(frappe.conf, {"manifest_hmac_secret": None}),
+            patch.object(jobs, "render_daily_manifests") as run,
+        ):
+            self.assertEqual(jobs.render_previous_day(), {"manifests": 0})
+        run.assert_not_called()
+
+    def test_content_hash_tracks_edits(self):
+        self.assertNotEqual(content_hash([_row()]), content_hash([_row(modified="2026-10-19 11:00:00")]))
+
+    def test_thumbnail_embedded_and_html_escaped(self):
+        photo = os.path.join(self.tmp, "photo.jpg")
+        Image.new("RGB", (2000, 1500), "green").save(photo)
+
+        html = render.render_html(self._manifest([dict(_row(), photo_paths=[photo, "/missing.jpg"])]))
+        self.assertEqual(html.count("data:image/jpeg;base64,"), 1)
+        self.assertIn("Customer &lt;b&gt;One&lt;/b&gt;", html)
+
+    def test_thumbnail_is_small(self):
+        photo = os.path.join(self.tmp, "big.png")
+        Image.new("RGB", (3000, 3000), "red").save(photo)
+        self.assertLess(len(render.thumbnail_data_uri(photo)), 20_000)
+
+    @unittest.skipUnless(shutil.which("wkhtmltopdf"), "wkhtmltopdf not installed")
+    def test_renders_pdf(self):
+        result = render.render_manifest(self._manifest([dict(_row(), photo_paths=[])] * 60))
+        self.assertNotIn("error", result)
+        self.assertTrue(result["pdf"].startswith(b"%PDF"))
+        self.assertGreaterEqual(result["pages"], 2)
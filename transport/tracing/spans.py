@@ -0,0 +1,239 @@
+"""
+Offline-to-commit latency traces for FSL writes.
+
+The field app sends `trace_json` with each upsert: a trace id, the device
+stage times in epoch ms (captured, queued, first_attempt, sent) and the
+retry count. upsert_draft_fsl adds `accepted` and `committed` (server clock)
+and hands the trace to record_trace, which only pushes it onto a capped Redis
+list so the write path never waits on the trace table. flush_traces (every
+minute) drains the list into `FSL Trace` rows.
+
+Spans never mix clocks: device spans come from the device clock, server spans
+from the server clock, and network time is left out of end_to_end_ms.
+"""
+
+import json
+import re
+import time
+from datetime import datetime, timezone
+
+import frappe
+import numpy as np
+from frappe.utils import convert_utc_to_system_timezone, now_datetime
+
+TRACE_DOCTYPE = "FSL Trace"
+BUFFER_KEY = "fsl_trace_buffer"
+BUFFER_MAX = 50000  # oldest traces are dropped past this if the flush job stalls
+FLUSH_BATCH = 2000
+
+DEVICE_STAGES = ("captured", "queued", "first_attempt", "sent")
+_TRACE_ID = re.compile(r"^[0-9a-f]{8,64}$")
+_MAX_STAGE_MS = 7 * 24 * 3600 * 1000  # anything longer is a broken device clock
+
+
+def now_ms() -> float:
+    return time.time() * 1000
+
+
+def _span(stages, start, end):
+    if stages.get(start) is None or stages.get(end) is None:
+        return None
+    ms = stages[end] - stages[start]
+    return ms if 0 <= ms <= _MAX_STAGE_MS else None
+
+
+def parse_trace(trace_json) -> dict | None:
+    """Validated {id, stages, retry_count} from the client, or None if unusable."""
+    try:
+        data = json.loads(trace_json) if isinstance(trace_json, str) else trace_json
+    except ValueError:
+        return None
+    if not isinstance(data, dict) or not _TRACE_ID.match(str(data.get("id") or "")):
+        return None
+
+    raw = data.get("stages") if isinstance(data.get("stages"), dict) else {}
+    stages = {}
+    for stage in DEVICE_STAGES:
+        value = raw.get(stage)
+        if isinstance(value, int | float) and not isinstance(value, bool) and value > 0:
+            stages[stage] = float(value)
+    if "captured" not in stages:
+        return None
+
+    retries = data.get("retry_count")
+    return {
+        "id": data["id"],
+        "stages": stages,
+        "retry_count": retries if isinstance(retries, int) and retries >= 0 else 0,
+    }
+
+
+def compute_spans(stages: dict) -> dict:
+    """Per-stage durations (ms) from the device and server stage times."""
+    device_ms = _span(stages, "captured", "sent")
+    server_ms = _span(stages, "accepted", "committed")
+    return {
+        "device_ms": device_ms,
+        "queue_ms": _span(stages, "queued", "sent"),
+        "retry_ms": _span(stages, "first_attempt", "sent"),
+        "server_ms": server_ms,
+        "end_to_end_ms": None if device_ms is None or server_ms is None else device_ms + server_ms,
+    }
+
+
+def record_trace(trace_json, *, fsl, driver, mode, accepted_ms, committed_ms):
+    """Buffer one trace for flush_traces. Never raises: tracing must not fail a write."""
+    try:
+        trace = parse_trace(trace_json)
+        if not trace:
+            return
+        trace["stages"].update(accepted=accepted_ms, committed=committed_ms)
+        trace.update(fsl=fsl, driver=driver, mode=mode)
+
+        cache = frappe.cache()
+        key = cache.make_key(BUFFER_KEY)
+        pipe = cache.pipeline()
+        pipe.rpush(key, json.dumps(trace))
+        pipe.ltrim(key, -BUFFER_MAX, -1)
+        pipe.execute()
+    except Exception:
+        frappe.logger("transport").warning("fsl trace not recorded", exc_info=True)
+
+
+def _captured_at(ms: float):
+    # device epoch -> naive system-timezone datetime, like every other Datetime field
+    return convert_utc_to_system_timezone(datetime.fromtimestamp(ms / 1000, timezone.utc)).replace(tzinfo=None)
+
+
+def _pop_batch(limit: int) -> list[dict]:
+    cache = frappe.cache()
+    key = cache.make_key(BUFFER_KEY)
+    pipe = cache.pipeline()  # MULTI/EXEC: read and trim atomically
+    pipe.lrange(key, 0, limit - 1)
+    pipe.ltrim(key, limit, -1)
+    raw, _ = pipe.execute()
+
+    out = []
+    for item in raw:
+        try:
+            out.append(json.loads(item))
+        except ValueError:
+            continue
+    return out
+
+
+def flush_traces(limit: int = FLUSH_BATCH):
+    """Scheduler (every minute): move buffered traces into FSL Trace rows."""
+    traces = _pop_batch(limit)
+    if not traces:
+        return 0
+
+    drivers = {t["driver"] for t in traces if t.get("driver")}
+    territory = dict(
+        frappe.get_all(
+            "Driver",
+            filters={"name": ["in", list(drivers)]},
+            fields=["name", "custom_territory"],
+            as_list=True,
+        )
+    )
+
+    now = now_datetime()
+    values = []
+    for t in traces:
+        spans = compute_spans(t["stages"])
+        values.append(
+            (
+                t["id"],
+                now,
+                now,
+                "Administrator",
+                "Administrator",
+                t["id"],
+                t.get("fsl"),
+                t.get("driver"),
+                territory.get(t.get("driver")),
+                t.get("mode"),
+                _captured_at(t["stages"]["captured"]),
+                1 if "queued" in t["stages"] else 0,
+                t.get("retry_count") or 0,
+                spans["end_to_end_ms"],
+                spans["device_ms"],
+                spans["queue_ms"],
+                spans["retry_ms"],
+                spans["server_ms"],
+                json.dumps(t["stages"]),
+            )
+        )
+
+    # a resend after a lost response reuses the trace id: the first commit wins
+    frappe.db.bulk_insert(
+        TRACE_DOCTYPE,
+        fields=[
+            "name",
+            "creation",
+            "modified",
+            "owner",
+            "modified_by",
+            "trace_id",
+            "fsl",
+            "driver",
+            "territory",
+            "mode",
+            "captured_at",
+            "was_queued",
+            "retry_count",
+            "end_to_end_ms",
+            "device_ms",
+            "queue_ms",
+            "retry_ms",
+            "server_ms",
+            "stages",
+        ],
+        values=values,
+        ignore_duplicates=True,
+    )
+    frappe.db.commit()
+    return len(values)
+
+
+# ------------------------------
+# Reporting
+# ------------------------------
+
+SPAN_FIELDS = ("end_to_end_ms", "device_ms", "queue_ms", "retry_ms", "server_ms")
+PERCENTILES = (50, 90, 99)
+
+
+def latency_percentiles(rows, group_by: str) -> list[dict]:
+    """
+    rows: dicts with `group_by` and the SPAN_FIELDS (None where a stage is missing).
+    Returns one dict per group: count, queued share, p50/p90/p99 end to end and
+    p90 per stage, slowest groups (p90 end to end) first.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.get(group_by) or "", []).append(row)
+
+    out = []
+    for key, members in groups.items():
+        spans = {
+            field: np.array([np.nan if r.get(field) is None else float(r[field]) for r in members])
+            for field in SPAN_FIELDS
+        }
+        e2e = spans["end_to_end_ms"][~np.isnan(spans["end_to_end_ms"])]
+        item = {
+            group_by: key,
+            "count": len(members),
+            "queued_pct": 100.0 * sum(1 for r in members if r.get("was_queued")) / len(members),
+        }
+        empty = (None,) * len(PERCENTILES)
+        for p, value in zip(PERCENTILES, np.percentile(e2e, PERCENTILES) if e2e.size else empty, strict=True):
+            item[f"p{p}_ms"] = None if value is None else float(value)
+        for field in SPAN_FIELDS[1:]:
+            values = spans[field][~np.isnan(spans[field])]
+            item[f"{field[:-3]}_p90_ms"] = float(np.percentile(values, 90)) if values.size else None
+        out.append(item)
+
+    out.sort(key=lambda g: -(g["p90_ms"] or 0))
+    return out
@@ -0,0 +1,105 @@
+"""
+Wire and storage formats for GPS breadcrumbs.
+
+Coordinates are integers in units of 1e-5 degrees (about 1.1 m) and times are
+integer Unix seconds. On the wire (see encodeTrackSegment in fsl.logic.js)
+each segment is {"lat": [...], "lng": [...], "t": [...]}. The first value of
+each array is absolute and the rest are deltas from the previous point.
+The whole segment list may be deflate-compressed and base64-encoded.
+
+A stored chunk is one driver-hour: three delta-encoded little-endian int32
+columns (seconds into the hour, lat, lng), concatenated, zlib-compressed and
+base64-encoded so it fits a Long Text column.
+"""
+
+import base64
+import binascii
+import json
+import zlib
+
+import frappe
+import numpy as np
+
+COORD_SCALE = 100_000
+MAX_WIRE_BYTES = 4 * 1024 * 1024  # decompressed request body
+
+
+class TrackPayloadError(frappe.ValidationError):
+    pass
+
+
+def _undelta(values) -> np.ndarray:
+    try:
+        arr = np.asarray(values, dtype=np.int64)
+    except (TypeError, ValueError, OverflowError):
+        frappe.throw("Track arrays must contain integers", TrackPayloadError)
+    if arr.ndim != 1:
+        frappe.throw("Track arrays must be flat", TrackPayloadError)
+    return np.cumsum(arr)
+
+
+def _inflate(data: str) -> bytes:
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        frappe.throw("Track data is not valid base64", TrackPayloadError)
+
+    inflater = zlib.decompressobj()
+    try:
+        out = inflater.decompress(raw, MAX_WIRE_BYTES)
+    except zlib.error:
+        frappe.throw("Track data is not valid deflate", TrackPayloadError)
+    if inflater.unconsumed_tail:
+        frappe.throw("Track data is too large", TrackPayloadError)
+    return out
+
+
+def decode_wire(segments=None, data=None, encoding="json") -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Request body -> absolute (t, lat, lng) int64 arrays, all segments joined."""
+    if encoding not in ("json", "deflate"):
+        frappe.throw(f"Unknown track encoding: {encoding}", TrackPayloadError)
+    try:
+        if encoding == "deflate":
+            segments = json.loads(_inflate(data or ""))
+        elif isinstance(segments, str):
+            segments = json.loads(segments)
+    except ValueError:
+        frappe.throw("Track segments are not valid JSON", TrackPayloadError)
+
+    if not isinstance(segments, list):
+        frappe.throw("segments must be a list", TrackPayloadError)
+
+    ts, lats, lngs = [], [], []
+    for seg in segments:
+        if not isinstance(seg, dict):
+            frappe.throw("Each segment must be an object", TrackPayloadError)
+        t, lat, lng = _undelta(seg.get("t") or []), _undelta(seg.get("lat") or []), _undelta(seg.get("lng") or [])
+        if not (len(t) == len(lat) == len(lng)):
+            frappe.throw("Segment arrays must have the same length", TrackPayloadError)
+        ts.append(t)
+        lats.append(lat)
+        lngs.append(lng)
+
+    if not ts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(ts), np.concatenate(lats), np.concatenate(lngs)
+
+
+def _delta(arr: np.ndarray) -> np.ndarray:
+    return np.diff(arr, prepend=0)
+
+
+def encode_chunk(offsets: np.ndarray, lat: np.ndarray, lng: np.ndarray) -> str:
+    """One driver-hour (seconds into the hour, lat, lng; sorted by time) -> Long Text."""
+    cols = np.concatenate([_delta(offsets), _delta(lat), _delta(lng)]).astype("<i4")
+    return base64.b64encode(zlib.compress(cols.tobytes(), 6)).decode("ascii")
+
+
+def decode_chunk(data: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if not data:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    cols = np.frombuffer(zlib.decompress(base64.b64decode(data)), dtype="<i4").astype(np.int64)
+    offsets, lat, lng = np.split(cols, 3)
+    return np.cumsum(offsets), np.cumsum(lat), np.cumsum(lng)
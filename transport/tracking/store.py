@@ -0,0 +1,126 @@
+"""
+Driver Track Chunk storage: one row per driver per hour.
+
+Points are appended by merging into the hour's blob (sorted by time, duplicate
+timestamps dropped). Reads decode the chunks that cover a time range and return
+NumPy arrays.
+"""
+
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import frappe
+import numpy as np
+from frappe.utils import get_datetime, get_system_timezone
+
+from transport.routing.planner import EARTH_RADIUS_KM
+from transport.tracking.codec import COORD_SCALE, decode_chunk, encode_chunk
+
+TRACK_DOCTYPE = "Driver Track Chunk"
+HOUR = 3600
+
+
+def _system_tz() -> ZoneInfo:
+    return ZoneInfo(get_system_timezone())
+
+
+def to_epoch(value) -> int:
+    """Unix seconds from an int/float or a datetime in system time."""
+    if isinstance(value, int | float) or (isinstance(value, str) and value.isdigit()):
+        return int(float(value))
+    return int(get_datetime(value).replace(tzinfo=_system_tz()).timestamp())
+
+
+def _chunk_name(driver: str, hour_epoch: int) -> str:
+    return f"TRK-{driver}-{hour_epoch}"
+
+
+def _merge(existing: str | None, offsets, lat, lng) -> tuple[str, int]:
+    old_off, old_lat, old_lng = decode_chunk(existing)
+    offsets = np.concatenate([old_off, offsets])
+    lat = np.concatenate([old_lat, lat])
+    lng = np.concatenate([old_lng, lng])
+
+    # sort by time; on a repeated timestamp keep the point already stored
+    offsets, first = np.unique(offsets, return_index=True)
+    return encode_chunk(offsets, lat[first], lng[first]), len(offsets)
+
+
+def _write_hour(driver: str, hour_epoch: int, offsets, lat, lng):
+    name = _chunk_name(driver, hour_epoch)
+    existing = frappe.db.get_value(TRACK_DOCTYPE, name, "data", for_update=True)
+
+    if existing is None:
+        data, count = _merge(None, offsets, lat, lng)
+        try:
+            frappe.get_doc(
+                {
+                    "doctype": TRACK_DOCTYPE,
+                    "driver": driver,
+                    "hour_epoch": hour_epoch,
+                    "hour_start": datetime.fromtimestamp(hour_epoch, _system_tz()).replace(tzinfo=None),
+                    "point_count": count,
+                    "data": data,
+                }
+            ).insert(ignore_permissions=True)
+            return
+        except frappe.DuplicateEntryError:
+            # another upload created this hour first; merge into it
+            existing = frappe.db.get_value(TRACK_DOCTYPE, name, "data", for_update=True)
+
+    data, count = _merge(existing, offsets, lat, lng)
+    frappe.db.set_value(TRACK_DOCTYPE, name, {"data": data, "point_count": count})
+
+
+def append_points(driver: str, t: np.ndarray, lat: np.ndarray, lng: np.ndarray) -> int:
+    """Store points (absolute Unix seconds, 1e-5 degree ints) by hour. Caller commits."""
+    if not len(t):
+        return 0
+
+    order = np.argsort(t, kind="stable")
+    t, lat, lng = t[order], lat[order], lng[order]
+    hours = t // HOUR * HOUR
+
+    # boundaries between consecutive hours in the sorted array
+    cuts = np.flatnonzero(np.diff(hours)) + 1
+    for idx in np.split(np.arange(len(t)), cuts):
+        hour_epoch = int(hours[idx[0]])
+        _write_hour(driver, hour_epoch, t[idx] - hour_epoch, lat[idx], lng[idx])
+    return len(t)
+
+
+def load_series(driver: str, start: int, end: int) -> frappe._dict:
+    """
+    Points of `driver` with start <= t <= end (Unix seconds) as NumPy arrays:
+    t (int64 Unix seconds), lat and lng (float64 degrees), sorted by time.
+    """
+    rows = frappe.db.sql(
+        f"""
+        SELECT hour_epoch, data FROM `tab{TRACK_DOCTYPE}`
+        WHERE driver = %(driver)s AND hour_epoch BETWEEN %(first)s AND %(last)s
+        ORDER BY hour_epoch
+        """,
+        {"driver": driver, "first": start // HOUR * HOUR, "last": end // HOUR * HOUR},
+        as_dict=True,
+    )
+
+    ts, lats, lngs = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    for row in rows:
+        offsets, lat, lng = decode_chunk(row.data)
+        ts.append(offsets + row.hour_epoch)
+        lats.append(lat)
+        lngs.append(lng)
+
+    t, lat, lng = np.concatenate(ts), np.concatenate(lats), np.concatenate(lngs)
+    mask = (t >= start) & (t <= end)
+    return frappe._dict(t=t[mask], lat=lat[mask] / COORD_SCALE, lng=lng[mask] / COORD_SCALE)
+
+
+def path_length_km(lat: np.ndarray, lng: np.ndarray) -> float:
+    """Haversine length of a polyline in km."""
+    if len(lat) < 2:
+        return 0.0
+    lat, lng = np.radians(lat), np.radians(lng)
+    dlat, dlng = np.diff(lat), np.diff(lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(dlng / 2) ** 2
+    return float(EARTH_RADIUS_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1))).sum())
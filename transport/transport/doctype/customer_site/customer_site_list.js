@@ -0,0 +1,82 @@
+// Copyright (c) 2026, Saman Malakjan and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Customer Site"] = {
+	onload(listview) {
+		listview.page.add_inner_button(__("Bulk Import"), () => {
+			frappe.prompt(
+				[
+					{
+						fieldname: "file_url",
+						fieldtype: "Attach",
+						label: __("CSV File"),
+						reqd: 1,
+						description: __(
+							"Columns: customer, address, site_uuid, status, service_window, latitude, longitude"
+						),
+					},
+					{
+						fieldname: "dry_run",
+						fieldtype: "Check",
+						label: __("Dry Run (check only, insert nothing)"),
+						default: 1,
+					},
+					{
+						fieldname: "allow_near_duplicates",
+						fieldtype: "Check",
+						label: __("Import rows close to another site"),
+						default: 0,
+					},
+				],
+				(values) => {
+					const on_done = (data) => {
+						if (data.file_url !== values.file_url) return;
+						frappe.realtime.off("customer_site_import_done", on_done);
+						show_import_result(data);
+						if (data.inserted) listview.refresh();
+					};
+					frappe.realtime.on("customer_site_import_done", on_done);
+					frappe.call({
+						method: "transport.api.site_import.start_customer_site_import",
+						args: values,
+						callback(r) {
+							if (r.message && !r.message.queued) {
+								frappe.realtime.off("customer_site_import_done", on_done);
+								frappe.msgprint(__("This file is already being imported."));
+								return;
+							}
+							frappe.show_alert(__("Import queued"));
+						},
+						error() {
+							frappe.realtime.off("customer_site_import_done", on_done);
+						},
+					});
+				},
+				__("Bulk Import Customer Sites"),
+				__("Start")
+			);
+		});
+	},
+};
+
+function show_import_result(data) {
+	if (data.error) {
+		frappe.msgprint({ title: __("Import failed"), message: data.error, indicator: "red" });
+		return;
+	}
+	const summary = data.dry_run
+		? __("{0} rows checked: {1} valid, {2} would be skipped.", [data.rows, data.valid, data.skipped])
+		: __("{0} rows: {1} inserted, {2} skipped.", [data.rows, data.inserted, data.skipped]);
+	const problems = (data.problems || [])
+		.map((p) => `<li>${__("Line {0}", [p.line])}: ${p.problems.map(frappe.utils.escape_html).join("; ")}</li>`)
+		.join("");
+	const more =
+		data.problem_count > data.problems.length
+			? `<p>${__("{0} more rows not shown.", [data.problem_count - data.problems.length])}</p>`
+			: "";
+	frappe.msgprint({
+		title: data.dry_run ? __("Import check") : __("Import finished"),
+		message: `<p>${summary}</p>${problems ? `<ul>${problems}</ul>` : ""}${more}`,
+		indicator: data.skipped ? "orange" : "green",
+	});
+}
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Saman Malakjan and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class DriverTrackChunk(Document):
+	pass
+
+
+def on_doctype_update():
+	# time-range reads per driver (transport.tracking.store.load_series)
+	frappe.db.add_index("Driver Track Chunk", ["driver", "hour_epoch"])
@@ -26,3 +26,11 @@ class FieldServiceLog(Document):
             frappe.throw(_("Invalid Driver Canonical ID"))
 
         self.driver = driver
+
+
+def on_doctype_update():
+    # keyset pages and counts in transport.api.dispatch; InnoDB appends `name`
+    # to every secondary index, so these also serve the (trip_date, name) order
+    frappe.db.add_index("Field Service Log", ["trip_date", "status", "driver"])
+    frappe.db.add_index("Field Service Log", ["driver", "trip_date"])
+    frappe.db.add_index("Field Service Log", ["customer", "trip_date"])
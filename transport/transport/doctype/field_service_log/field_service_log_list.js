@@ -0,0 +1,117 @@
+// Copyright (c) 2026, Saman Malakjan and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Field Service Log"] = {
+	onload(listview) {
+		listview.page.add_inner_button(__("Export Date Range"), () => {
+			const dialog = new frappe.ui.Dialog({
+				title: __("Export Field Service Logs"),
+				fields: [
+					{ fieldname: "from_date", fieldtype: "Date", label: __("From Date"), reqd: 1 },
+					{ fieldname: "to_date", fieldtype: "Date", label: __("To Date"), reqd: 1 },
+					{
+						fieldname: "file_format",
+						fieldtype: "Select",
+						label: __("Format"),
+						options: "csv\nparquet",
+						default: "csv",
+					},
+				],
+				primary_action_label: __("Export"),
+				primary_action(values) {
+					dialog.hide();
+					start_fsl_export(values);
+				},
+			});
+			dialog.show();
+		});
+
+		if (frappe.user.has_role(["System Manager", "Ops Manager"])) {
+			listview.page.add_inner_button(__("Finalize Drafts"), () => bulk_finalize_dialog(listview));
+		}
+	},
+};
+
+function bulk_finalize_dialog(listview) {
+	const dialog = new frappe.ui.Dialog({
+		title: __("Finalize Draft Field Service Logs"),
+		fields: [
+			{
+				fieldname: "trip_date",
+				fieldtype: "Date",
+				label: __("Trip Date"),
+				default: frappe.datetime.get_today(),
+			},
+			{ fieldname: "territory", fieldtype: "Link", label: __("Territory"), options: "Territory" },
+			{ fieldname: "driver", fieldtype: "Link", label: __("Driver"), options: "Driver" },
+		],
+		primary_action_label: __("Finalize"),
+		primary_action(values) {
+			dialog.hide();
+			frappe.call({
+				method: "transport.api.fsl.bulk_finalize_fsl",
+				args: values,
+				freeze: true,
+				freeze_message: __("Finalizing..."),
+				callback(r) {
+					const res = r.message || {};
+					let msg = __("Finalized {0} drafts.", [res.finalized || 0]);
+					if (res.skipped_count) {
+						const rows = (res.skipped || [])
+							.map((s) => `<li>${frappe.utils.escape_html(s.name)}: ${frappe.utils.escape_html(s.reason)}</li>`)
+							.join("");
+						msg += `<br>${__("Skipped {0}:", [res.skipped_count])}<ul>${rows}</ul>`;
+					}
+					frappe.msgprint(msg);
+					listview.refresh();
+				},
+			});
+		},
+	});
+	dialog.show();
+}
+
+function start_fsl_export(values) {
+	const title = __("Exporting Field Service Logs");
+
+	const on_progress = (data) => {
+		if (data.failed) {
+			frappe.hide_progress();
+			frappe.realtime.off("fsl_export_progress", on_progress);
+			frappe.msgprint(__("Export failed. See Error Log for details."));
+			return;
+		}
+
+		if (data.done) {
+			frappe.hide_progress();
+			frappe.realtime.off("fsl_export_progress", on_progress);
+			frappe.msgprint(
+				__("Exported {0} rows: {1}", [
+					data.processed,
+					`<a href="${data.file_url}" target="_blank">${data.file_url}</a>`,
+				])
+			);
+			return;
+		}
+
+		frappe.show_progress(
+			title,
+			data.processed,
+			data.total || data.processed,
+			__("{0} of {1} rows", [data.processed, data.total])
+		);
+	};
+
+	frappe.realtime.on("fsl_export_progress", on_progress);
+
+	frappe.call({
+		method: "transport.api.export.start_fsl_export",
+		args: values,
+		callback() {
+			frappe.show_progress(title, 0, 1, __("Queued"));
+		},
+		error() {
+			frappe.realtime.off("fsl_export_progress", on_progress);
+		},
+	});
+}
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Saman Malakjan and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class FSLOutboxEvent(Document):
+	pass
+
+
+def on_doctype_update():
+	# dispatcher claim query (transport.outbox.dispatcher._claim_batch)
+	frappe.db.add_index("FSL Outbox Event", ["status", "next_attempt_at"])
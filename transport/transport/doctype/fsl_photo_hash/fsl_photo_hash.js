@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Saman Malakjan and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("FSL Photo Hash", {
+// 	refresh(frm) {
+
+// 	},
+// });
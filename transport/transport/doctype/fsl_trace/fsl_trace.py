@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Saman Malakjan and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class FSLTrace(Document):
+	pass
+
+
+def on_doctype_update():
+	# FSL Latency report: a date range per driver / per territory
+	frappe.db.add_index("FSL Trace", ["driver", "captured_at"])
+	frappe.db.add_index("FSL Trace", ["territory", "captured_at"])
@@ -0,0 +1,37 @@
+// Copyright (c) 2026, Saman Malakjan and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["FSL Weight Stats"] = {
+	onload(listview) {
+		listview.page.add_inner_button(__("Rebuild from Final FSLs"), () => {
+			frappe.confirm(
+				__("Recompute every row from Final Field Service Logs? Run this off-hours."),
+				() => {
+					const on_done = (data) => {
+						frappe.realtime.off("fsl_weight_stats_rebuilt", on_done);
+						frappe.show_alert({
+							message: __("Weight stats rebuilt: {0} rows", [data.rows]),
+							indicator: "green",
+						});
+						listview.refresh();
+					};
+					frappe.realtime.on("fsl_weight_stats_rebuilt", on_done);
+					frappe.call({
+						method: "transport.api.weight_stats.start_weight_stats_rebuild",
+						callback(r) {
+							if (r.message && !r.message.queued) {
+								frappe.realtime.off("fsl_weight_stats_rebuilt", on_done);
+								frappe.msgprint(__("A rebuild is already running."));
+								return;
+							}
+							frappe.show_alert(__("Rebuild queued"));
+						},
+						error() {
+							frappe.realtime.off("fsl_weight_stats_rebuilt", on_done);
+						},
+					});
+				}
+			);
+		});
+	},
+};
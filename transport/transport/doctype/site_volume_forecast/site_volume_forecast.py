@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Saman Malakjan and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class SiteVolumeForecast(Document):
+	pass
+
+
+def on_doctype_update():
+	# route planner and report: one day (or a range) across all sites
+	frappe.db.add_index("Site Volume Forecast", ["forecast_date", "site"])
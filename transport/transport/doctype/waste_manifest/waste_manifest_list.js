@@ -0,0 +1,77 @@
+// Copyright (c) 2026, Saman Malakjan and contributors
+// For license information, please see license.txt
+
+frappe.listview_settings["Waste Manifest"] = {
+	onload(listview) {
+		listview.page.add_inner_button(__("Render Day"), () => {
+			const dialog = new frappe.ui.Dialog({
+				title: __("Render Waste Manifests"),
+				fields: [
+					{
+						fieldname: "manifest_date",
+						fieldtype: "Date",
+						label: __("Collection Date"),
+						reqd: 1,
+						default: frappe.datetime.add_days(frappe.datetime.get_today(), -1),
+					},
+					{ fieldname: "zip_output", fieldtype: "Check", label: __("Also build a ZIP of all PDFs") },
+				],
+				primary_action_label: __("Render"),
+				primary_action(values) {
+					dialog.hide();
+					start_manifest_render(listview, values);
+				},
+			});
+			dialog.show();
+		});
+	},
+};
+
+function start_manifest_render(listview, values) {
+	const title = __("Rendering Waste Manifests");
+
+	const on_progress = (data) => {
+		const processed = data.rendered + data.failed;
+		if (data.done) {
+			frappe.hide_progress();
+			frappe.realtime.off("manifest_render_progress", on_progress);
+			let msg = __("Rendered {0} manifests ({1} pages, {2} pages/sec), {3} failed.", [
+				data.rendered,
+				data.pages,
+				data.pages_per_sec,
+				data.failed,
+			]);
+			if (data.zip_url) {
+				msg += `<br><a href="${data.zip_url}" target="_blank">${data.zip_url}</a>`;
+			}
+			frappe.msgprint(msg);
+			listview.refresh();
+			return;
+		}
+
+		frappe.show_progress(
+			title,
+			processed,
+			data.manifests || processed,
+			__("{0} of {1} ({2} pages/sec)", [processed, data.manifests, data.pages_per_sec])
+		);
+	};
+
+	frappe.realtime.on("manifest_render_progress", on_progress);
+
+	frappe.call({
+		method: "transport.api.manifest.start_manifest_render",
+		args: values,
+		callback(r) {
+			if (r.message && !r.message.queued) {
+				frappe.realtime.off("manifest_render_progress", on_progress);
+				frappe.msgprint(__("A render for this date is already running."));
+				return;
+			}
+			frappe.show_progress(title, 0, 1, __("Queued"));
+		},
+		error() {
+			frappe.realtime.off("manifest_render_progress", on_progress);
+		},
+	});
+}
@@ -0,0 +1,183 @@
+// Copyright (c) 2026, Saman Malakjan and contributors
+// For license information, please see license.txt
+
+// Today's Field Service Logs per driver. Loads one snapshot, then applies the
+// debounced `fsl_board_update` events (transport.board.events); the database
+// is only queried again after a reconnect, a territory change or at midnight.
+
+frappe.pages["fsl-live-board"].on_page_load = function (wrapper) {
+	const page = frappe.ui.make_app_page({
+		parent: wrapper,
+		title: __("FSL Live Board"),
+		single_column: true,
+	});
+	wrapper.live_board = new FslLiveBoard(page);
+};
+
+class FslLiveBoard {
+	constructor(page) {
+		this.page = page;
+		this.rows = new Map(); // FSL name -> row object
+		this.trip_date = null;
+		this.render_pending = false;
+
+		this.territory_field = page.add_field({
+			fieldname: "territory",
+			label: __("Territory"),
+			fieldtype: "Link",
+			options: "Territory",
+			change: () => this.load(),
+		});
+		this.$body = $('<div class="fsl-live-board"></div>').appendTo(page.main);
+
+		frappe.realtime.on("fsl_board_update", (data) => this.apply(data));
+		// events sent while disconnected are lost: start again from a snapshot
+		frappe.realtime.socket?.io?.on("reconnect", () => this.load());
+		this.load();
+	}
+
+	get territory() {
+		return this.territory_field.get_value() || null;
+	}
+
+	load() {
+		frappe.realtime.doctype_subscribe("Field Service Log");
+		frappe.call({
+			method: "transport.api.dispatch.get_board_snapshot",
+			args: { territory: this.territory },
+			callback: (r) => {
+				const { fields, rows } = r.message;
+				this.trip_date = frappe.datetime.get_today();
+				this.rows = new Map();
+				for (const row of rows) {
+					const obj = to_object(fields, row);
+					this.rows.set(obj.name, obj);
+				}
+				this.schedule_render();
+			},
+		});
+	}
+
+	apply(data) {
+		if (this.trip_date !== frappe.datetime.get_today()) {
+			this.load(); // a new day
+			return;
+		}
+		if (this.territory && data.territory !== this.territory) return;
+
+		for (const row of data.rows) {
+			const obj = { ...to_object(data.fields, row), territory: data.territory };
+			const current = this.rows.get(obj.name);
+			if (current && current.modified > obj.modified) continue; // older than what we show
+			if (obj.trip_date === this.trip_date) this.rows.set(obj.name, obj);
+			else this.rows.delete(obj.name);
+		}
+		this.schedule_render();
+	}
+
+	schedule_render() {
+		if (this.render_pending) return;
+		this.render_pending = true;
+		requestAnimationFrame(() => {
+			this.render_pending = false;
+			this.render();
+		});
+	}
+
+	summarize() {
+		const totals = { pickups: 0, drafts: 0, finals: 0, review: 0, weight: 0 };
+		const drivers = new Map();
+		for (const row of this.rows.values()) {
+			const key = row.driver || "";
+			if (!drivers.has(key)) {
+				drivers.set(key, {
+					driver: row.driver,
+					driver_name: row.driver_name,
+					territory: row.territory,
+					pickups: 0,
+					drafts: 0,
+					finals: 0,
+					review: 0,
+					weight: 0,
+					last: "",
+				});
+			}
+			for (const bucket of [totals, drivers.get(key)]) {
+				bucket.pickups += 1;
+				bucket.drafts += row.status === "Draft" ? 1 : 0;
+				bucket.finals += row.status === "Final" ? 1 : 0;
+				bucket.review += row.needs_review ? 1 : 0;
+				bucket.weight += row.qty_or_weight || 0;
+			}
+			const entry = drivers.get(key);
+			if (row.modified > entry.last) entry.last = row.modified;
+		}
+		return {
+			totals,
+			drivers: [...drivers.values()].sort((a, b) => (a.last < b.last ? 1 : -1)),
+		};
+	}
+
+	render() {
+		const { totals, drivers } = this.summarize();
+		const esc = frappe.utils.escape_html;
+		const card = (label, value, color) => `
+			<div class="col-sm-2">
+				<div class="frappe-card" style="padding: var(--padding-md); margin-bottom: var(--margin-md)">
+					<div class="text-muted small">${label}</div>
+					<div class="h4 ${color || ""}">${value}</div>
+				</div>
+			</div>`;
+
+		const rows = drivers
+			.map(
+				(d) => `
+				<tr>
+					<td>${esc(d.driver_name || d.driver || __("No driver"))}</td>
+					<td>${esc(d.territory || "")}</td>
+					<td class="text-right">${d.pickups}</td>
+					<td class="text-right">${d.drafts}</td>
+					<td class="text-right">${d.finals}</td>
+					<td class="text-right">${d.review ? `<span class="text-danger">${d.review}</span>` : 0}</td>
+					<td class="text-right">${format_number(d.weight, null, 1)}</td>
+					<td>${d.last ? frappe.datetime.comment_when(d.last) : ""}</td>
+				</tr>`
+			)
+			.join("");
+
+		this.$body.html(`
+			<div class="row">
+				${card(__("Pickups"), totals.pickups)}
+				${card(__("Draft"), totals.drafts, "text-warning")}
+				${card(__("Final"), totals.finals, "text-success")}
+				${card(__("Needs Review"), totals.review, totals.review ? "text-danger" : "")}
+				${card(__("Weight"), format_number(totals.weight, null, 1))}
+			</div>
+			<table class="table table-bordered frappe-card">
+				<thead>
+					<tr>
+						<th>${__("Driver")}</th>
+						<th>${__("Territory")}</th>
+						<th class="text-right">${__("Pickups")}</th>
+						<th class="text-right">${__("Draft")}</th>
+						<th class="text-right">${__("Final")}</th>
+						<th class="text-right">${__("Needs Review")}</th>
+						<th class="text-right">${__("Weight")}</th>
+						<th>${__("Last Update")}</th>
+					</tr>
+				</thead>
+				<tbody>
+					${rows || `<tr><td colspan="8" class="text-muted text-center">${__("No pickups yet today")}</td></tr>`}
+				</tbody>
+			</table>
+		`);
+	}
+}
+
+function to_object(fields, row) {
+	const obj = {};
+	fields.forEach((field, i) => {
+		obj[field] = row[i];
+	});
+	return obj;
+}
@@ -0,0 +1,55 @@
+# Copyright (c) 2026, Saman Malakjan and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import add_days, getdate
+
+from transport.tracing.spans import TRACE_DOCTYPE, latency_percentiles
+from transport.utils.replica import replica_read
+
+GROUP_BY = ("driver", "territory")
+
+
+def execute(filters=None):
+	filters = frappe._dict(filters or {})
+	group_by = filters.group_by if filters.group_by in GROUP_BY else "driver"
+	rows = _fetch(filters, group_by)
+	return _columns(group_by), latency_percentiles(rows, group_by)
+
+
+@replica_read
+def _fetch(filters, group_by):
+	to_date = getdate(filters.to_date)
+	from_date = getdate(filters.from_date or add_days(to_date, -7))
+	conditions = {"captured_at": ["between", [from_date, add_days(to_date, 1)]]}
+	if filters.driver:
+		conditions["driver"] = filters.driver
+	if filters.territory:
+		conditions["territory"] = filters.territory
+	return frappe.get_all(
+		TRACE_DOCTYPE,
+		filters=conditions,
+		fields=[group_by, "was_queued", "end_to_end_ms", "device_ms", "queue_ms", "retry_ms", "server_ms"],
+	)
+
+
+def _columns(group_by):
+	ms = {"fieldtype": "Float", "precision": 0, "width": 110}
+	return [
+		{
+			"fieldname": group_by,
+			"label": "Driver" if group_by == "driver" else "Territory",
+			"fieldtype": "Link",
+			"options": "Driver" if group_by == "driver" else "Territory",
+			"width": 160,
+		},
+		{"fieldname": "count", "label": "Pickups", "fieldtype": "Int", "width": 80},
+		{"fieldname": "queued_pct", "label": "Queued %", "fieldtype": "Percent", "width": 90},
+		{"fieldname": "p50_ms", "label": "p50 (ms)", **ms},
+		{"fieldname": "p90_ms", "label": "p90 (ms)", **ms},
+		{"fieldname": "p99_ms", "label": "p99 (ms)", **ms},
+		{"fieldname": "device_p90_ms", "label": "Device p90 (ms)", **ms},
+		{"fieldname": "queue_p90_ms", "label": "Queue p90 (ms)", **ms},
+		{"fieldname": "retry_p90_ms", "label": "Retry p90 (ms)", **ms},
+		{"fieldname": "server_p90_ms", "label": "Server p90 (ms)", **ms},
+	]
@@ -0,0 +1,62 @@
+# Copyright (c) 2026, Saman Malakjan and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.utils import add_days, getdate
+
+from transport.forecasting.volume import FORECAST_DOCTYPE
+from transport.utils.replica import replica_read
+
+GROUP_BY = {
+	"site": ("f.site", "Site", "Link", "Customer Site"),
+	"customer": ("f.customer", "Customer", "Link", "Customer"),
+	"territory": ("c.territory", "Territory", "Link", "Territory"),
+	"forecast_date": ("f.forecast_date", "Date", "Date", None),
+}
+
+
+def execute(filters=None):
+	filters = frappe._dict(filters or {})
+	group_by = filters.group_by if filters.group_by in GROUP_BY else "site"
+	return _columns(group_by), _fetch(filters, group_by)
+
+
+@replica_read
+def _fetch(filters, group_by):
+	from_date = getdate(filters.from_date)
+	to_date = getdate(filters.to_date or add_days(from_date, 6))
+	conditions = ["f.forecast_date BETWEEN %(from_date)s AND %(to_date)s"]
+	if filters.customer:
+		conditions.append("f.customer = %(customer)s")
+	if filters.territory:
+		conditions.append("c.territory = %(territory)s")
+
+	# the upper bounds are summed as-is: a conservative bound for the group
+	return frappe.db.sql(
+		f"""
+		SELECT {GROUP_BY[group_by][0]} AS `{group_by}`,
+			COUNT(DISTINCT f.site) AS sites,
+			SUM(f.qty_forecast) AS qty_forecast,
+			SUM(f.qty_upper) AS qty_upper,
+			SUM(f.package_forecast) AS package_forecast
+		FROM `tab{FORECAST_DOCTYPE}` f
+		LEFT JOIN `tabCustomer` c ON c.name = f.customer
+		WHERE {" AND ".join(conditions)}
+		GROUP BY `{group_by}`
+		ORDER BY qty_forecast DESC
+		""",
+		{"from_date": from_date, "to_date": to_date, "customer": filters.customer, "territory": filters.territory},
+		as_dict=True,
+	)
+
+
+def _columns(group_by):
+	_, label, fieldtype, options = GROUP_BY[group_by]
+	qty = {"fieldtype": "Float", "precision": 1, "width": 130}
+	return [
+		{"fieldname": group_by, "label": label, "fieldtype": fieldtype, "options": options, "width": 180},
+		{"fieldname": "sites", "label": "Sites", "fieldtype": "Int", "width": 80},
+		{"fieldname": "qty_forecast", "label": "Expected Qty", **qty},
+		{"fieldname": "qty_upper", "label": "Upper (90%)", **qty},
+		{"fieldname": "package_forecast", "label": "Expected Packages", **qty},
+	]
@@ -0,0 +1,12 @@
+import frappe
+
+
+def local_file_path(file_url: str | None) -> str | None:
+    """Site path of an uploaded /files or /private/files URL; None for empty or external URLs."""
+    if not file_url:
+        return None
+    if file_url.startswith("/private/files/"):
+        return frappe.get_site_path("private", "files", file_url.rsplit("/", 1)[-1])
+    if file_url.startswith("/files/"):
+        return frappe.get_site_path("public", "files", file_url.rsplit("/", 1)[-1])
+    return None
@@ -0,0 +1,96 @@
+"""
+Read-replica routing for read-only paths (reports, list/delta-sync endpoints, exports).
+
+Builds on Frappe's replica support (`read_from_replica`, `replica_host` in
+site_config.json, the same switch @frappe.read_only() makes) and adds a bounded
+replication-lag check: if the replica is more than `replica_max_lag_seconds`
+behind, not replicating, or unreachable, the call stays on the primary.
+
+Only wrap functions that never write. Write paths (upsert/finalize, jobs that
+insert) keep using the primary connection.
+
+The lag check runs SHOW SLAVE STATUS on the replica, so the site's DB user
+needs the REPLICATION CLIENT (MariaDB >= 10.5: SLAVE MONITOR) privilege there.
+"""
+
+import functools
+
+import frappe
+
+LAG_CACHE_KEY = "transport:replica_lag_seconds"
+LAG_CACHE_TTL = 5  # seconds
+DEFAULT_MAX_LAG_SECONDS = 10
+UNKNOWN_LAG = 10**9
+
+
+def _replica_lag_seconds() -> int:
+    """Seconds the replica is behind, measured on the (current) replica connection."""
+    cache = frappe.cache()
+    lag = cache.get_value(LAG_CACHE_KEY)
+    if lag is not None:
+        return lag
+
+    try:
+        status = frappe.db.sql("SHOW SLAVE STATUS", as_dict=True)
+        lag = status[0].get("Seconds_Behind_Master") if status else None
+    except Exception as e:
+        # no log_error here: frappe.db is the (read-only) replica
+        frappe.logger("transport").warning(f"[replica] lag check failed: {e}")
+        lag = None
+
+    # NULL means the SQL thread isn't running: treat as "too far behind"
+    lag = UNKNOWN_LAG if lag is None else int(lag)
+    cache.set_value(LAG_CACHE_KEY, lag, expires_in_sec=LAG_CACHE_TTL)
+    return lag
+
+
+def _restore_primary():
+    local = frappe.local
+    if hasattr(local, "primary_db"):
+        local.db.close()
+        local.db = local.primary_db
+        del local.primary_db
+    if hasattr(local, "replica_db"):
+        del local.replica_db
+
+
+def _switch_to_replica() -> bool:
+    """Point frappe.db at the replica if configured, reachable and fresh enough."""
+    if not frappe.conf.read_from_replica or not frappe.conf.replica_host:
+        return False
+
+    try:
+        if not frappe.connect_replica():
+            # already on the replica (nested call) or already switched
+            return False
+    except Exception as e:
+        frappe.logger("transport").warning(f"[replica] connect failed: {e}")
+        return False
+
+    max_lag = frappe.conf.get("replica_max_lag_seconds")
+    max_lag = DEFAULT_MAX_LAG_SECONDS if max_lag is None else int(max_lag)
+    if _replica_lag_seconds() > max_lag:
+        _restore_primary()
+        return False
+
+    return True
+
+
+def replica_read(fn):
+    """Run a read-only function against the replica when it's healthy, else the primary."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        switched = _switch_to_replica()
+        try:
+            # like frappe.read_only: drop request args (cmd, ...) fn doesn't take
+            return fn(*args, **frappe.get_newargs(fn, kwargs))
+        finally:
+            if switched:
+                _restore_primary()
+
+    return wrapper
+
+
+def is_on_replica() -> bool:
+    return hasattr(frappe.local, "replica_db") and frappe.db is frappe.local.replica_db
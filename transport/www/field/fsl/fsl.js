@@ -25,6 +25,21 @@ function getTokenFromHash() {
   return m ? decodeURIComponent(m[1]) : "";
 }
 
+// ---------------------------------------------------------------------------
+// BOOTSTRAP (embedded by index.py: driver, CSRF, trips, queue policy)
+// ---------------------------------------------------------------------------
+
+function readBootstrap() {
+  const el = $("fslBootstrap");
+  if (!el) return null;
+  try {
+    return JSON.parse(el.textContent || "null");
+  } catch (e) {
+    console.warn("[FSL] bootstrap parse error:", e);
+    return null;
+  }
+}
+
 // ---------------------------------------------------------------------------
 // CSRF
 // ---------------------------------------------------------------------------
@@ -304,7 +319,19 @@ async function initDriverOnline(cachedId) {
   }
 }
 
-async function initDriverCanonicalId() {
+// Fresh page from the server: the profile is already embedded, no fetch needed.
+function initDriverFromBootstrap(bootstrap) {
+  const cid = bootstrap?.driver?.custom_driver_canonical_id;
+  if (!cid) return false;
+
+  driverCanonicalId = cid;
+  cacheDriverId(cid);
+  setDriverDisplay(driverCanonicalId);
+  setStatus(MSG.DRIVER_FROM_SERVER(driverCanonicalId));
+  return true;
+}
+
+async function initDriverCanonicalId(bootstrap) {
   const cached = getCachedDriverId();
 
   if (!navigator.onLine) {
@@ -312,6 +339,8 @@ async function initDriverCanonicalId() {
     return;
   }
 
+  if (initDriverFromBootstrap(bootstrap)) return;
+
   await initDriverOnline(cached);
 }
 
@@ -319,6 +348,27 @@ async function initDriverCanonicalId() {
 // SERVICE WORKER MESSAGES
 // ---------------------------------------------------------------------------
 
+// Hand CSRF token, trips and queue policy to the SW so it doesn't fetch them itself
+function sendBootstrapToSw(bootstrap) {
+  if (!bootstrap || !("serviceWorker" in navigator)) return;
+
+  navigator.serviceWorker.ready
+    .then((reg) => {
+      if (!reg.active) return;
+      reg.active.postMessage({
+        type: "FSL_BOOTSTRAP",
+        bootstrap: {
+          csrf_token: bootstrap.csrf_token,
+          trips: bootstrap.trips,
+          queue_policy: bootstrap.queue_policy,
+        },
+      });
+    })
+    .catch((e) => {
+      console.warn("[FSL] FSL_BOOTSTRAP failed:", e);
+    });
+}
+
 function requestSwSyncQueue() {
   if (!("serviceWorker" in navigator)) return;
 
@@ -334,7 +384,7 @@ function requestSwSyncQueue() {
 }
 
 // CHANGED: no CSRF here anymore, just payload
-function sendToSwQueue(bodyObj) {
+function sendToSwQueue(bodyObj, trace = null) {
   if (!("serviceWorker" in navigator)) {
     console.warn(
       "[FSL] serviceWorker not supported; cannot queue offline"
@@ -348,6 +398,7 @@ function sendToSwQueue(bodyObj) {
       reg.active.postMessage({
         type: "QUEUE_FSL",
         payload: bodyObj, // only payload, no headers/CSRF
+        trace,
       });
       console.log("[FSL] Sent QUEUE_FSL to SW");
     })
@@ -370,6 +421,10 @@ function handleSwMessage(event) {
     setStatus(MSG.OFFLINE_SYNCED);
   }
 
+  if (data.type === "FSL_DIRECTORY_UPDATED") {
+    showCustomerInfo();
+  }
+
   // NEW: session expired while SW was trying to fetch CSRF
   if (data.type === "FSL_SESSION_EXPIRED") {
     // You can define MSG.SESSION_EXPIRED in fsl.messages.js
@@ -377,6 +432,35 @@ function handleSwMessage(event) {
   }
 }
 
+// ---------------------------------------------------------------------------
+// CUSTOMER LOOKUP (offline directory kept by the SW)
+// ---------------------------------------------------------------------------
+
+const DIRECTORY_URL = "/field/fsl/__directory__";
+
+async function loadDirectory() {
+  try {
+    const res = await fetch(DIRECTORY_URL);
+    return res.ok ? await res.json() : null;
+  } catch (e) {
+    return null;
+  }
+}
+
+async function showCustomerInfo() {
+  const el = $("customerDisplay");
+  const token = getTokenFromHash();
+  if (!el || !token) return;
+
+  const customer = FSL_LOGIC.decodeQrCustomer(token);
+  if (!customer) {
+    el.innerText = MSG.CUSTOMER_UNKNOWN;
+    return;
+  }
+  const info = FSL_LOGIC.lookupCustomer(await loadDirectory(), customer);
+  el.innerText = info ? MSG.CUSTOMER_INFO(info) : MSG.CUSTOMER_NOT_IN_DIRECTORY(customer);
+}
+
 function initSwMessageListener() {
   if (!("serviceWorker" in navigator)) return;
   navigator.serviceWorker.addEventListener("message", handleSwMessage);
@@ -397,6 +481,12 @@ const FSL_LOGIC = self.FslLogic || {
     payload_json: JSON.stringify(item.payload),
   }),
   validatePayload: () => [],
+  newTrace: () => null,
+  markStage: (trace) => trace,
+  ackSnapshot: () => null,
+  diffPayload: (acked, payload) => payload,
+  decodeQrCustomer: () => null,
+  lookupCustomer: () => null,
 };
 
 function buildFslBody(item) {
@@ -404,7 +494,12 @@ function buildFslBody(item) {
 }
 
 
-async function submitFslOnline(bodyObj, csrf) {
+async function submitFslOnline(bodyObj, csrf, trace = null) {
+  if (trace) {
+    FSL_LOGIC.markStage(trace, "first_attempt", Date.now());
+    FSL_LOGIC.markStage(trace, "sent", Date.now(), true);
+    bodyObj = { ...bodyObj, trace_json: JSON.stringify(trace) };
+  }
   const res = await fetch(
     "/api/method/transport.api.fsl.upsert_draft_fsl",
     {
@@ -429,27 +524,102 @@ async function submitFslOnline(bodyObj, csrf) {
 
   if (!res.ok) {
     const msg = data?.message || "خطای سرور در ذخیره FSL.";
-    throw new Error(msg);
+    const err = new Error(msg);
+    err.status = res.status;
+    err.excType = data?.exc_type;
+    throw err;
   }
 
   return data.message || {};
 }
 
-function submitFslOffline(bodyObj) {
-  const ok = sendToSwQueue(bodyObj);
+function submitFslOffline(bodyObj, trace = null) {
+  const ok = sendToSwQueue(bodyObj, trace);
   if (!ok) {
     throw new Error(MSG.OFFLINE_QUEUE_FAIL);
   }
   return { offline: true, queued: true };
 }
 
+// ---------------------------------------------------------------------------
+// ACKNOWLEDGED VERSIONS (patch protocol, see upsert_draft_fsl base_version)
+// ---------------------------------------------------------------------------
+
+const ACK_STORAGE_KEY = "fsl_acked_drafts";
+const ACK_MAX_AGE_MS = 2 * 24 * 60 * 60 * 1000;
+
+function ackKey(item) {
+  const day = new Date().toISOString().slice(0, 10);
+  return `${item.driver_canonical_id}|${item.qr_token}|${day}`;
+}
+
+function loadAcks() {
+  try {
+    return JSON.parse(localStorage.getItem(ACK_STORAGE_KEY) || "{}");
+  } catch {
+    return {};
+  }
+}
+
+function loadAck(item) {
+  return loadAcks()[ackKey(item)] || null;
+}
+
+function saveAck(item, version) {
+  if (version == null) return;
+  const acks = loadAcks();
+  const now = Date.now();
+  for (const [key, ack] of Object.entries(acks)) {
+    if (now - (ack.at || 0) > ACK_MAX_AGE_MS) delete acks[key];
+  }
+  acks[ackKey(item)] = {
+    version,
+    fields: FSL_LOGIC.ackSnapshot(item.payload),
+    at: now,
+  };
+  try {
+    localStorage.setItem(ACK_STORAGE_KEY, JSON.stringify(acks));
+  } catch (e) {
+    console.warn("[FSL] cannot store acknowledged draft:", e);
+  }
+}
+
+// Online saves send only the fields changed since the last acknowledged
+// version; the offline queue always carries the full payload (it may replay
+// after other saves, and the server orders writes by performed_at).
+async function submitDraftOnline(item, csrf) {
+  const ack = loadAck(item);
+  const trace = item.trace || null;
+
+  let result;
+  if (ack) {
+    const patchItem = {
+      ...item,
+      payload: FSL_LOGIC.diffPayload(ack.fields, item.payload),
+      base_version: ack.version,
+    };
+    try {
+      result = await submitFslOnline(buildFslBody(patchItem), csrf, trace);
+    } catch (e) {
+      if (e.excType !== "FullPayloadRequired") throw e;
+      result = null;
+    }
+  }
+  if (!result) {
+    result = await submitFslOnline(buildFslBody(item), csrf, trace);
+  }
+
+  saveAck(item, result.version);
+  return result;
+}
+
 // CHANGED: offline path does NOT require CSRF now;
 // CSRF only required for online submit.
 async function createDraftOnServer(item) {
-  const body = buildFslBody(item);
+  const trace = item.trace || null;
 
   if (!navigator.onLine) {
-    return submitFslOffline(body);
+    return submitFslOffline(buildFslBody(item), trace);
   }
 
   const csrf = getCsrf();
@@ -458,14 +628,121 @@ async function createDraftOnServer(item) {
   }
 
   try {
-    return await submitFslOnline(body, csrf);
+    return await submitDraftOnline(item, csrf);
   } catch (e) {
+    if (e.status === 409) {
+      // stale write: the server already has newer data; queueing cannot help
+      throw e;
+    }
     console.warn("[FSL] submit failed, queueing offline:", e);
     await logClientError("fsl_submit_error", e);
-    return submitFslOffline(body);
+    return submitFslOffline(buildFslBody(item), trace);
+  }
+}
+
+// ---------------------------------------------------------------------------
+// GPS TRACK (breadcrumbs -> transport.api.track.ingest_track)
+// ---------------------------------------------------------------------------
+
+const TRACK_MIN_INTERVAL_MS = 5000;
+const TRACK_FLUSH_INTERVAL_MS = 60000;
+const TRACK_MAX_BUFFER = 5000; // ~7h at one fix per 5s; oldest dropped first
+
+let trackBuffer = [];
+let trackWatchId = null;
+let trackFlushing = false;
+
+function onTrackPosition(pos) {
+  const last = trackBuffer[trackBuffer.length - 1];
+  if (last && pos.timestamp - last.ts < TRACK_MIN_INTERVAL_MS) return;
+
+  trackBuffer.push({
+    lat: pos.coords.latitude,
+    lng: pos.coords.longitude,
+    ts: pos.timestamp,
+  });
+  if (trackBuffer.length > TRACK_MAX_BUFFER) {
+    trackBuffer = trackBuffer.slice(-TRACK_MAX_BUFFER);
+  }
+}
+
+async function deflateToBase64(text) {
+  const stream = new Blob([text])
+    .stream()
+    .pipeThrough(new CompressionStream("deflate"));
+  const bytes = new Uint8Array(await new Response(stream).arrayBuffer());
+
+  let binary = "";
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+  }
+  return btoa(binary);
+}
+
+async function buildTrackBody(points) {
+  const segments = [FSL_LOGIC.encodeTrackSegment(points)];
+  if (typeof CompressionStream === "undefined") {
+    return { encoding: "json", segments };
+  }
+  return { encoding: "deflate", data: await deflateToBase64(JSON.stringify(segments)) };
+}
+
+async function flushTrack() {
+  if (trackFlushing || !trackBuffer.length || !navigator.onLine) return;
+  const csrf = getCsrf();
+  if (!csrf) return;
+
+  trackFlushing = true;
+  const points = trackBuffer;
+  trackBuffer = [];
+
+  try {
+    const res = await fetch("/api/method/transport.api.track.ingest_track", {
+      method: "POST",
+      credentials: "include",
+      headers: {
+        "Content-Type": "application/json",
+        "X-Frappe-CSRF-Token": csrf,
+      },
+      body: JSON.stringify(await buildTrackBody(points)),
+    });
+
+    if (res.status === 403) {
+      stopTrack(); // not a logged-in driver
+      return;
+    }
+    if (!res.ok) throw new Error(`ingest_track HTTP ${res.status}`);
+  } catch (e) {
+    // keep the points for the next flush
+    trackBuffer = points.concat(trackBuffer).slice(-TRACK_MAX_BUFFER);
+    console.warn("[FSL] track flush failed:", e);
+  } finally {
+    trackFlushing = false;
   }
 }
 
+function startTrack() {
+  if (!("geolocation" in navigator) || !FSL_LOGIC.encodeTrackSegment) return;
+  if (trackWatchId !== null) return;
+
+  trackWatchId = navigator.geolocation.watchPosition(
+    onTrackPosition,
+    (err) => console.warn("[FSL] geolocation error:", err),
+    { enableHighAccuracy: true, maximumAge: 10000, timeout: 30000 }
+  );
+  setInterval(flushTrack, TRACK_FLUSH_INTERVAL_MS);
+  window.addEventListener("online", flushTrack);
+  window.addEventListener("pagehide", flushTrack);
+}
+
+function stopTrack() {
+  if (trackWatchId !== null) {
+    navigator.geolocation.clearWatch(trackWatchId);
+    trackWatchId = null;
+  }
+  trackBuffer = [];
+}
+
 // ---------------------------------------------------------------------------
 // BOOTSTRAP PAGE
 // ---------------------------------------------------------------------------
@@ -540,6 +817,7 @@ function initSaveButton() {
       qr_token: token,
       driver_canonical_id: driverCanonicalId,
       payload,
+      trace: FSL_LOGIC.newTrace(),
     };
 
     try {
@@ -579,13 +857,16 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }
 
-  initDriverCanonicalId().catch(async (e) => {
+  const bootstrap = readBootstrap();
+
+  initDriverCanonicalId(bootstrap).catch(async (e) => {
     console.error("[FSL] initDriverCanonicalId failed:", e);
     await logClientError("init_driver_canonical_id", e);
     setStatus(e.message || MSG.INIT_FAILED);
   });
 
   if (navigator.onLine) {
+    sendBootstrapToSw(bootstrap);
     requestSwSyncQueue();
   }
   window.addEventListener("online", requestSwSyncQueue);
@@ -593,6 +874,13 @@ document.addEventListener("DOMContentLoaded", () => {
   // NEW: start listening for SW messages (incl. flush done / session expired)
   initSwMessageListener();
 
+  if (bootstrap?.driver) {
+    startTrack();
+  }
+
+  showCustomerInfo();
+  window.addEventListener("hashchange", showCustomerInfo);
+
   initPhotoInputs();
   initSafetyToggle();
   initSaveButton();
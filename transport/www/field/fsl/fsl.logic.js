@@ -5,15 +5,59 @@
  * {
  *   qr_token,
  *   driver_canonical_id,
- *   payload_json: "<stringified payload>"
+ *   payload_json: "<stringified payload>",
+ *   base_version  (only when payload is a patch, see diffPayload)
  * }
  */
 function buildFslBody(item) {
-  return {
+  const body = {
     qr_token: item.qr_token,
     driver_canonical_id: item.driver_canonical_id,
     payload_json: JSON.stringify(item.payload),
   };
+  if (item.base_version != null) body.base_version = item.base_version;
+  return body;
+}
+
+/**
+ * Short stand-in for photo data URLs, so acknowledged payloads can be kept
+ * in localStorage and compared without holding the image bytes.
+ */
+function fingerprintValue(value) {
+  if (typeof value !== "string" || !value.startsWith("data:")) return value;
+  let h = 0x811c9dc5; // FNV-1a
+  for (let i = 0; i < value.length; i++) {
+    h ^= value.charCodeAt(i);
+    h = Math.imul(h, 0x01000193);
+  }
+  return `data#${value.length}#${(h >>> 0).toString(16)}`;
+}
+
+function ackSnapshot(payload) {
+  const out = {};
+  for (const [key, value] of Object.entries(payload || {})) {
+    out[key] = fingerprintValue(value);
+  }
+  return out;
+}
+
+// Sent with every patch: the server orders writes by it
+const ALWAYS_SENT = ["performed_at"];
+
+/**
+ * Fields of `payload` that differ from the acknowledged snapshot.
+ */
+function diffPayload(acked, payload) {
+  const patch = {};
+  for (const [key, value] of Object.entries(payload)) {
+    if (
+      ALWAYS_SENT.includes(key) ||
+      JSON.stringify(fingerprintValue(value)) !== JSON.stringify((acked || {})[key])
+    ) {
+      patch[key] = value;
+    }
+  }
+  return patch;
 }
 
 /**
@@ -39,11 +83,140 @@ function validatePayload(payload) {
   return errors;
 }
 
+/**
+ * Latency trace for one pickup, sent to upsert_draft_fsl as `trace_json`.
+ * stages holds device timestamps (ms): captured (form read), queued (entered
+ * the SW queue, offline only), first_attempt, sent (last send). The server
+ * adds accepted/committed; see transport.tracing.spans.
+ */
+function newTraceId() {
+  if (typeof crypto !== "undefined" && crypto.randomUUID) {
+    return crypto.randomUUID().replace(/-/g, "");
+  }
+  let id = "";
+  for (let i = 0; i < 32; i++) id += Math.floor(Math.random() * 16).toString(16);
+  return id;
+}
+
+function newTrace(nowMs = Date.now()) {
+  return { id: newTraceId(), stages: { captured: nowMs } };
+}
+
+/** Record a stage time; the first value wins unless overwrite is set. */
+function markStage(trace, stage, ms, overwrite = false) {
+  if (!trace) return trace;
+  trace.stages = trace.stages || {};
+  if (overwrite || trace.stages[stage] == null) {
+    trace.stages[stage] = ms;
+  }
+  return trace;
+}
+
+/**
+ * GPS breadcrumbs -> one segment for transport.api.track.ingest_track.
+ * points: [{ lat, lng, ts }] with ts in ms.
+ * lat/lng become integers in 1e-5 degrees and t integer Unix seconds;
+ * the first value of each array is absolute, the rest are deltas.
+ */
+const TRACK_SCALE = 100000;
+
+function encodeTrackSegment(points) {
+  const seg = { lat: [], lng: [], t: [] };
+  let pLat = 0;
+  let pLng = 0;
+  let pT = 0;
+
+  for (const p of points || []) {
+    const lat = Math.round(p.lat * TRACK_SCALE);
+    const lng = Math.round(p.lng * TRACK_SCALE);
+    const t = Math.floor(p.ts / 1000);
+    seg.lat.push(lat - pLat);
+    seg.lng.push(lng - pLng);
+    seg.t.push(t - pT);
+    pLat = lat;
+    pLng = lng;
+    pT = t;
+  }
+
+  return seg;
+}
+
+/** Inverse of encodeTrackSegment (ts back in ms, whole seconds). */
+function decodeTrackSegment(seg) {
+  const out = [];
+  let lat = 0;
+  let lng = 0;
+  let t = 0;
+
+  for (let i = 0; i < seg.t.length; i++) {
+    lat += seg.lat[i];
+    lng += seg.lng[i];
+    t += seg.t[i];
+    out.push({ lat: lat / TRACK_SCALE, lng: lng / TRACK_SCALE, ts: t * 1000 });
+  }
+
+  return out;
+}
+
+/**
+ * Customer name carried in a QR token (base64url JSON, see
+ * transport.field_auth.qr). The signature is not checked here; the server
+ * verifies it on save. Returns null for anything unreadable.
+ */
+function decodeQrCustomer(token) {
+  try {
+    let b64 = String(token || "").replace(/-/g, "+").replace(/_/g, "/");
+    b64 += "=".repeat((4 - (b64.length % 4)) % 4);
+    const bytes = Uint8Array.from(atob(b64), (c) => c.charCodeAt(0));
+    const payload = JSON.parse(new TextDecoder().decode(bytes));
+    return typeof payload.customer === "string" && payload.customer ? payload.customer : null;
+  } catch (e) {
+    return null;
+  }
+}
+
+function rowToObject(fields, row) {
+  const out = {};
+  fields.forEach((field, i) => {
+    out[field] = row[i];
+  });
+  return out;
+}
+
+/**
+ * Look a customer up in the offline territory directory (served by the SW,
+ * see transport.directory.snapshot). Returns null if it is not listed.
+ * {customer, customer_name, sites: [{name, site_uuid, status, latitude, longitude, service_window}]}
+ */
+function lookupCustomer(directory, customer) {
+  if (!directory || !directory.customers || !customer) return null;
+  const row = directory.customers[customer];
+  if (!row) return null;
+
+  const fields = directory.fields || {};
+  const sites = Object.entries(directory.sites || {})
+    .map(([name, siteRow]) => ({ name, ...rowToObject(fields.sites || [], siteRow) }))
+    .filter((site) => site.customer === customer);
+  return {
+    customer,
+    ...rowToObject(fields.customers || [], row),
+    sites,
+  };
+}
+
 // ---- For Jest / Node tests ----
 if (typeof module !== "undefined" && module.exports) {
   module.exports = {
     buildFslBody,
     validatePayload,
+    encodeTrackSegment,
+    decodeTrackSegment,
+    newTrace,
+    markStage,
+    ackSnapshot,
+    diffPayload,
+    decodeQrCustomer,
+    lookupCustomer,
   };
 }
 
@@ -52,5 +225,13 @@ if (typeof self !== "undefined") {
   self.FslLogic = {
     buildFslBody,
     validatePayload,
+    encodeTrackSegment,
+    decodeTrackSegment,
+    newTrace,
+    markStage,
+    ackSnapshot,
+    diffPayload,
+    decodeQrCustomer,
+    lookupCustomer,
   };
 }
@@ -19,6 +19,17 @@ const MSG = {
   TOKEN_STATUS_OK: "توکن QR معتبر است.",
   TOKEN_STATUS_MISSING: "توکن QR در آدرس صفحه یافت نشد.",
 
+  CUSTOMER_UNKNOWN: "مشتری از روی QR قابل تشخیص نیست.",
+  CUSTOMER_NOT_IN_DIRECTORY: (customer) =>
+    `${customer} (در فهرست منطقه شما یافت نشد)`,
+  CUSTOMER_INFO: (info) => {
+    const windows = [...new Set(info.sites.map((s) => s.service_window).filter(Boolean))];
+    return (
+      `${info.customer_name || info.customer} — ${info.sites.length} محل` +
+      (windows.length ? `، ساعت خدمت: ${windows.join("، ")}` : "")
+    );
+  },
+
   DRIVER_REQUIRED:
     "شناسه راننده در دسترس نیست. لطفاً یک بار در حالت آنلاین وارد شوید.",
   QTY_REQUIRED: "فیلد «مقدار / وزن» الزامی است.",
@@ -71,6 +71,7 @@ class FslQueueService {
           body: request.body,
           created_at: request.created_at,
           retry_count: request.retry_count || 0, // NEW
+          trace: request.trace || null,
         };
 
         const addReq = store.add(data);
@@ -180,6 +181,7 @@ class FslQueueService {
           body: item.body,
           created_at: item.created_at,
           retry_count: item.retry_count || 0,
+          trace: item.trace || null,
         };
 
         const req = store.put(data);
@@ -13,6 +13,7 @@ class FslRequest {
     body = null,
     created_at = null,
     retry_count = 0, // NEW
+    trace = null, // {id, stages} latency trace (see FslLogic.newTrace)
   }) {
     if (!url) {
       throw new Error("FslRequest requires url");
@@ -26,6 +27,7 @@ class FslRequest {
     // Store as-is; we handle both string/number in SW
     this.created_at = created_at || new Date().toISOString();
     this.retry_count = retry_count || 0;
+    this.trace = trace;
   }
 }
 
@@ -1,7 +1,19 @@
 import frappe
 
+from transport.api.field_assets import versioned_urls
+from transport.api.field_bootstrap import bootstrap_json, build_field_bootstrap
+
 no_cache = 1
 
 def get_context(context):
-    # Make csrf token available to the template as {{ csrf_token }}
-    context.csrf_token = frappe.sessions.get_csrf_token()
+    if frappe.session.user == "Guest":
+        frappe.local.flags.redirect_location = "/login?redirect-to=/field/fsl"
+        raise frappe.Redirect
+
+    # Driver profile, CSRF token, today's trips and queue policy in one go,
+    # so the page doesn't need follow-up requests before the driver can work.
+    bootstrap = build_field_bootstrap()
+    context.csrf_token = bootstrap["csrf_token"]
+    context.bootstrap_json = bootstrap_json(bootstrap)
+    # hash-versioned asset URLs (long-lived browser cache, see field_assets)
+    context.assets = versioned_urls()
@@ -35,20 +35,121 @@ function shouldDropItem(item, nowMs, maxAgeMs, maxRetries) {
   return { drop: false, reason: null, ageMs, retryCount };
 }
 
+// HTTP statuses meaning "server overloaded, come back later" (not the item's fault)
+const THROTTLE_STATUSES = [429, 503];
+
+// Stale write: retrying cannot succeed
+const CONFLICT_STATUS = 409;
+
+function isThrottleStatus(status) {
+  return THROTTLE_STATUSES.includes(status);
+}
+
+/**
+ * Parse a Retry-After header value (delta-seconds or HTTP-date) into millis.
+ * returns 0 when missing/invalid.
+ */
+function parseRetryAfterMs(value, nowMs = Date.now()) {
+  if (value == null || value === "") return 0;
+
+  const seconds = Number(value);
+  if (!Number.isNaN(seconds)) return Math.max(0, Math.round(seconds * 1000));
+
+  const at = Date.parse(value);
+  return Number.isNaN(at) ? 0 : Math.max(0, at - nowMs);
+}
+
+/**
+ * Jittered exponential backoff that never retries before the server's hint.
+ *
+ *  attempt - 1 for the first backoff, 2 for the second, ...
+ *  retryAfterMs - server hint (Retry-After), 0 if none
+ * returns delay in ms: max(retryAfterMs, "equal jitter" of baseMs * 2^(attempt-1))
+ */
+function computeBackoffMs(
+  attempt,
+  retryAfterMs = 0,
+  { baseMs = 2000, capMs = 5 * 60 * 1000, random = Math.random } = {}
+) {
+  const exp = Math.min(capMs, baseMs * 2 ** Math.max(0, attempt - 1));
+  const jittered = exp / 2 + random() * (exp / 2);
+  return Math.round(Math.max(retryAfterMs || 0, jittered));
+}
+
+/**
+ * Compare two asset manifests ({version, assets: {url: {hash, bytes}}}).
+ * `current` may be null (nothing cached yet: everything is "changed").
+ * returns {changed: [url], unchanged: [url], removed: [url], changedBytes}
+ */
+function diffAssetManifests(current, next) {
+  const before = (current && current.assets) || {};
+  const after = (next && next.assets) || {};
+  const changed = [];
+  const unchanged = [];
+  let changedBytes = 0;
+
+  for (const [url, asset] of Object.entries(after)) {
+    if (before[url] && before[url].hash === asset.hash) {
+      unchanged.push(url);
+    } else {
+      changed.push(url);
+      changedBytes += asset.bytes || 0;
+    }
+  }
+  const removed = Object.keys(before).filter((url) => !(url in after));
+  return { changed, unchanged, removed, changedBytes };
+}
+
+/**
+ * May the cached copy of `pathname` answer a request for `?v=<version>`?
+ * Yes for a plain URL, or when the cached manifest has that exact hash.
+ * A different hash means the page is newer than the cache (fresh deploy).
+ */
+function isCachedAssetCurrent(manifest, pathname, version) {
+  if (!version) return true;
+  const asset = manifest && manifest.assets && manifest.assets[pathname];
+  return Boolean(asset) && asset.hash === version;
+}
+
+/**
+ * Stamp the send stages on an item's latency trace (if it has one):
+ * first_attempt is kept from the first flush, sent is the latest try.
+ */
+function markSendStages(item, ms) {
+  const trace = item && item.trace;
+  if (!trace) return null;
+  trace.stages = trace.stages || {};
+  if (trace.stages.first_attempt == null) trace.stages.first_attempt = ms;
+  trace.stages.sent = ms;
+  trace.retry_count = item.retry_count || 0;
+  return trace;
+}
+
 /**
  * Core flush logic, independent of service worker APIs.
  *
  * Dependencies are injected:
  *  - queueService: { getAll, delete, update, trimToMax }
- *  - sendFn: async (payloadObj, item) => { ok: boolean, status: number }
+ *  - sendFn: async (payloadObj, item) => { ok: boolean, status: number, retryAfterMs?: number }
  *  - logger: { logSync(metrics), logDrop(item, reason) }
  *
  * This makes it easy to unit-test with pure JS.
+ *
+ * Items carrying a `trace` get first_attempt/sent stamped (via `clock`) just
+ * before sendFn; the trace is saved with the item if it stays queued.
+ *
+ * A 409 (stale write: the server already has newer data for the draft) is
+ * final: the item is removed and counted as `rejected`.
+ *
+ * If the server answers 429/503 the batch stops right there (without counting a
+ * retry against the item) and the returned metrics carry `throttled` and
+ * `retry_after_ms` so the caller can back off.
  */
 async function flushQueueCore({
   queueService,
   sendFn,
   nowMs = Date.now(),
+  clock = () => Date.now(),
   maxAgeMs,
   maxRetries,
   maxItemsPerFlush,
@@ -59,7 +160,7 @@ async function flushQueueCore({
   const queued_before = all.length;
 
   if (!queued_before) {
-    await logger.logSync({
+    const metrics = {
       queued_before,
       queued_after: 0,
       processed: 0,
@@ -67,8 +168,9 @@ async function flushQueueCore({
       failed: 0,
       dropped: 0,
       timestamp: nowMs,
-    });
-    return;
+    };
+    await logger.logSync(metrics);
+    return metrics;
   }
 
   let dropped = 0;
@@ -87,7 +189,7 @@ async function flushQueueCore({
   }
 
   if (!candidates.length) {
-    await logger.logSync({
+    const metrics = {
       queued_before,
       queued_after: 0,
       processed: 0,
@@ -95,8 +197,9 @@ async function flushQueueCore({
       failed: 0,
       dropped,
       timestamp: nowMs,
-    });
-    return;
+    };
+    await logger.logSync(metrics);
+    return metrics;
   }
 
   // 2) Oldest first, limited batch
@@ -112,6 +215,9 @@ async function flushQueueCore({
   let processed = 0;
   let succeeded = 0;
   let failed = 0;
+  let rejected = 0;
+  let throttled = false;
+  let retry_after_ms = 0;
 
   // 3) Process the selected batch
   for (const item of toProcess) {
@@ -127,11 +233,26 @@ async function flushQueueCore({
       continue;
     }
 
+    const traced = markSendStages(item, clock());
     const result = await sendFn(payloadObj, item);
 
+    if (!result.ok && isThrottleStatus(result.status)) {
+      // Server over capacity: leave this and the remaining items untouched
+      // (only keep the trace's first_attempt)
+      if (traced) await queueService.update(item);
+      processed--;
+      throttled = true;
+      retry_after_ms = result.retryAfterMs || 0;
+      break;
+    }
+
     if (result.ok) {
       await queueService.delete(item.id);
       succeeded++;
+    } else if (result.status === CONFLICT_STATUS) {
+      await queueService.delete(item.id);
+      logger.logDrop(item, "stale");
+      rejected++;
     } else {
       item.retry_count = (item.retry_count || 0) + 1;
       await queueService.update(item);
@@ -147,15 +268,57 @@ async function flushQueueCore({
   const after = await queueService.getAll();
 
   // 5) Report metrics
-  await logger.logSync({
+  const metrics = {
     queued_before,
     queued_after: after.length,
     processed,
     succeeded,
     failed,
     dropped,
+    rejected,
+    throttled,
+    retry_after_ms,
     timestamp: nowMs,
-  });
+  };
+  await logger.logSync(metrics);
+  return metrics;
+}
+
+/**
+ * Apply a reply of get_field_directory to the directory the SW holds.
+ *
+ *  current - stored directory ({territory, version, fields, customers, sites}) or null
+ *  update - {unchanged}, a full snapshot, or a delta against update.base
+ * returns the new directory (the same object when unchanged, null when the
+ * driver has no territory). Throws DIRECTORY_BASE_MISMATCH when a delta does
+ * not apply to `current`; the caller should then ask for a full snapshot.
+ */
+function applyDirectoryUpdate(current, update) {
+  if (!update || !update.territory) return null;
+
+  if (update.unchanged) {
+    if (current && current.territory === update.territory && current.version === update.version) return current;
+    throw new Error("DIRECTORY_BASE_MISMATCH");
+  }
+
+  if (update.full) {
+    const { full, ...snapshot } = update;
+    return snapshot;
+  }
+
+  if (!current || current.territory !== update.territory || current.version !== update.base) {
+    throw new Error("DIRECTORY_BASE_MISMATCH");
+  }
+
+  const next = { ...current, version: update.version };
+  for (const table of ["customers", "sites"]) {
+    const change = update[table] || {};
+    const rows = { ...(current[table] || {}) };
+    for (const name of change.delete || []) delete rows[name];
+    Object.assign(rows, change.upsert || {});
+    next[table] = rows;
+  }
+  return next;
 }
 
 // ---- Exports for Node tests ----
@@ -163,6 +326,13 @@ if (typeof module !== "undefined" && module.exports) {
   module.exports = {
     createdAtToMs,
     shouldDropItem,
+    parseRetryAfterMs,
+    computeBackoffMs,
+    isThrottleStatus,
+    diffAssetManifests,
+    isCachedAssetCurrent,
+    applyDirectoryUpdate,
+    markSendStages,
     flushQueueCore,
   };
 }
@@ -172,6 +342,13 @@ if (typeof self !== "undefined") {
   self.FslSwCore = {
     createdAtToMs,
     shouldDropItem,
+    parseRetryAfterMs,
+    computeBackoffMs,
+    isThrottleStatus,
+    diffAssetManifests,
+    isCachedAssetCurrent,
+    applyDirectoryUpdate,
+    markSendStages,
     flushQueueCore,
   };
 }
\ No newline at end of file
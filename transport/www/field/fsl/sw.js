@@ -5,7 +5,8 @@
  * - Offline shell for /field/fsl/ (driver page)
  * - Offline trips (GET API)
  * - Offline submit via messages (queue & retry on each SYNC)
- * - Redirect navigations to /login if not logged in (when online)
+ * - Offline customer/site directory of the driver's territory (QR lookups)
+ * - Network-first navigations (the server redirects guests to /login)
  */
 
 importScripts(
@@ -16,7 +17,15 @@ importScripts(
 
 // ----- CONSTANTS -----
 
-const STATIC_CACHE = "fsl-static-v1";
+// Static assets live in "fsl-static-<manifest version>"; META_CACHE points at
+// the complete one in use (see syncAssets).
+const STATIC_CACHE_PREFIX = "fsl-static-";
+const META_CACHE = "fsl-meta-v1";
+const ACTIVE_STATIC_KEY = "/field/fsl/__active_static_cache__";
+const MANIFEST_KEY = "/field/fsl/__asset_manifest__";
+// Territory directory (customers + sites) for offline QR lookups; the page
+// reads it from this URL, answered by the SW from META_CACHE.
+const DIRECTORY_KEY = "/field/fsl/__directory__";
 const TRIPS_CACHE = "fsl-trips-v1";
 const DB_NAME = "fsl_offline_db";
 const DB_STORE = "request-queue";
@@ -25,16 +34,39 @@ const TRIPS_API_PATH = "/api/method/transport.api.get_driver_trips";
 const SUBMIT_API_PATH = "/api/method/transport.api.fsl.upsert_draft_fsl";
 
 const CSRF_API_PATH = "/api/method/transport.api.fsl.get_csrf_for_fsl";
+const ASSET_MANIFEST_PATH = "/api/method/transport.api.field_assets.get_asset_manifest";
+const DIRECTORY_API_PATH = "/api/method/transport.api.field_directory.get_field_directory";
 
-const LOGIN_STATUS_API = "/api/method/frappe.auth.get_logged_user";
-const LOGIN_PAGE = "/login";
+// How often a page load may trigger an asset manifest check
+const ASSET_CHECK_INTERVAL_MS = 10 * 60 * 1000;
+// ...and a directory check (the server rebuilds it every 15 minutes)
+const DIRECTORY_CHECK_INTERVAL_MS = 15 * 60 * 1000;
 
-// Retry / TTL / size policy
+// Retry / TTL / size policy (defaults; the page forwards the server-side
+// policy from its bootstrap, see applyQueuePolicy)
 const MAX_RETRIES = 3;
 const MAX_QUEUE_AGE_MS = 30 * 24 * 60 * 60 * 1000; // 30 days
 const MAX_QUEUE_ITEMS = 10;
 const MAX_ITEMS_PER_FLUSH = 10;
 
+const queuePolicy = {
+  maxRetries: MAX_RETRIES,
+  maxAgeMs: MAX_QUEUE_AGE_MS,
+  maxQueueItems: MAX_QUEUE_ITEMS,
+  maxItemsPerFlush: MAX_ITEMS_PER_FLUSH,
+};
+
+// Fleet-wide reconnects: spread the first flush, then back off on 429/503
+// with jittered exponential delays (SwCore.computeBackoffMs).
+const RECONNECT_JITTER_MS = 3000;
+let backoffAttempt = 0;
+let nextFlushAt = 0;
+let retryTimer = null;
+
+// CSRF token handed over by the page bootstrap; saves a round trip per flush.
+// Cleared whenever the server rejects it.
+let bootstrapCsrf = null;
+
 // IMPORTANT:
 // In production, https://smartwm.ir/field/fsl/ redirects to http://smartwm.ir:8080/field/fsl (mixed content).
 // So we MUST NOT precache "/field/fsl/".
@@ -101,6 +133,34 @@ async function fetchCsrfForFsl() {
   return token;
 }
 
+function applyQueuePolicy(policy) {
+  if (!policy) return;
+  if (policy.max_retries != null) queuePolicy.maxRetries = policy.max_retries;
+  if (policy.max_queue_age_ms != null) queuePolicy.maxAgeMs = policy.max_queue_age_ms;
+  if (policy.max_queue_items != null) queuePolicy.maxQueueItems = policy.max_queue_items;
+  if (policy.max_items_per_flush != null) {
+    queuePolicy.maxItemsPerFlush = policy.max_items_per_flush;
+  }
+}
+
+async function applyBootstrap(bootstrap) {
+  if (!bootstrap) return;
+
+  if (bootstrap.csrf_token) bootstrapCsrf = bootstrap.csrf_token;
+  applyQueuePolicy(bootstrap.queue_policy);
+
+  // Seed the trips cache so offline trips work without a separate fetch
+  if (bootstrap.trips) {
+    const cache = await caches.open(TRIPS_CACHE);
+    await cache.put(
+      TRIPS_API_PATH,
+      new Response(JSON.stringify({ message: bootstrap.trips }), {
+        headers: { "Content-Type": "application/json" },
+      })
+    );
+  }
+}
+
 async function notifyClientsQueueFlushed() {
   try {
     const clients = await self.clients.matchAll({ type: "window" });
@@ -128,6 +188,221 @@ async function logSyncResult(csrf, metrics) {
   }
 }
 
+// ---------------------------------------------------------------------------
+// STATIC ASSETS (content-hashed manifest, see transport.api.field_assets)
+// ---------------------------------------------------------------------------
+
+let activeStaticCache = null; // name of the complete static cache in use
+let assetSync = null; // in-flight syncAssets() promise
+let lastAssetCheck = 0;
+
+function jsonResponse(obj) {
+  return new Response(JSON.stringify(obj), {
+    headers: { "Content-Type": "application/json" },
+  });
+}
+
+async function getActiveStaticCache() {
+  if (activeStaticCache) return activeStaticCache;
+  const meta = await caches.open(META_CACHE);
+  const res = await meta.match(ACTIVE_STATIC_KEY);
+  activeStaticCache = res ? (await res.json()).cache : null;
+  return activeStaticCache;
+}
+
+let activeManifest = null; // {cache, manifest} of the active static cache
+
+async function getActiveManifest(cacheName) {
+  if (!activeManifest || activeManifest.cache !== cacheName) {
+    activeManifest = { cache: cacheName, manifest: await readCachedManifest(cacheName) };
+  }
+  return activeManifest.manifest;
+}
+
+async function readCachedManifest(cacheName) {
+  if (!cacheName) return null;
+  const cache = await caches.open(cacheName);
+  const res = await cache.match(MANIFEST_KEY);
+  return res ? res.json() : null;
+}
+
+async function fetchAssetManifest() {
+  const res = await fetch(ASSET_MANIFEST_PATH, { cache: "no-store" });
+  if (!res.ok) throw new Error("ASSET_MANIFEST_" + res.status);
+  const data = await parseJsonSafe(res, "asset manifest", "ASSET_MANIFEST_PARSE_ERROR");
+  return data.message;
+}
+
+async function deleteStaleStaticCaches(keep) {
+  const keys = await caches.keys();
+  await Promise.all(
+    keys
+      .filter((k) => k.startsWith(STATIC_CACHE_PREFIX) && k !== keep)
+      .map((k) => caches.delete(k))
+  );
+}
+
+/**
+ * Bring the static cache up to the server's manifest:
+ * unchanged entries are copied from the current cache, only changed ones are
+ * downloaded (as `url?v=hash`, long-cacheable). The new cache is filled
+ * completely before one write to META_CACHE switches to it, so a failed or
+ * interrupted update leaves the current cache untouched.
+ */
+async function updateStaticCache() {
+  const next = await fetchAssetManifest();
+  const currentName = await getActiveStaticCache();
+  const current = await readCachedManifest(currentName);
+  if (current && current.version === next.version) {
+    return { updated: false };
+  }
+
+  const diff = SwCore.diffAssetManifests(current, next);
+  const nextName = STATIC_CACHE_PREFIX + next.version;
+  await caches.delete(nextName); // leftovers of an interrupted attempt
+  const fresh = await caches.open(nextName);
+  const old = currentName ? await caches.open(currentName) : null;
+
+  try {
+    const toFetch = [...diff.changed];
+    for (const url of diff.unchanged) {
+      const res = old && (await old.match(url));
+      if (res) await fresh.put(url, res);
+      else toFetch.push(url);
+    }
+
+    await Promise.all(
+      toFetch.map(async (url) => {
+        const res = await fetch(`${url}?v=${next.assets[url].hash}`);
+        if (!res.ok) throw new Error(`ASSET_FETCH_${res.status} ${url}`);
+        await fresh.put(url, res);
+      })
+    );
+
+    // the offline shell is refreshed by navigations; carry it over
+    const shell = old && (await old.match(SHELL_URL));
+    if (shell) await fresh.put(SHELL_URL, shell);
+
+    await fresh.put(MANIFEST_KEY, jsonResponse(next));
+  } catch (e) {
+    await caches.delete(nextName);
+    throw e;
+  }
+
+  const meta = await caches.open(META_CACHE);
+  await meta.put(ACTIVE_STATIC_KEY, jsonResponse({ cache: nextName }));
+  activeStaticCache = nextName;
+  await deleteStaleStaticCaches(nextName);
+
+  console.log(
+    "[SW] assets updated to",
+    next.version,
+    "- fetched",
+    diff.changed.length,
+    "of",
+    Object.keys(next.assets).length,
+    `(${diff.changedBytes} bytes)`
+  );
+  return { updated: true, fetched: diff.changed.length, bytes: diff.changedBytes };
+}
+
+function syncAssets() {
+  if (!assetSync) {
+    assetSync = updateStaticCache().finally(() => {
+      assetSync = null;
+      lastAssetCheck = Date.now();
+    });
+  }
+  return assetSync;
+}
+
+function maybeSyncAssets() {
+  if (Date.now() - lastAssetCheck < ASSET_CHECK_INTERVAL_MS) return Promise.resolve();
+  return syncAssets().catch((e) => {
+    console.warn("[SW] asset update failed, keeping current cache:", e);
+  });
+}
+
+// ---------------------------------------------------------------------------
+// TERRITORY DIRECTORY (versioned snapshot + deltas, see transport.directory)
+// ---------------------------------------------------------------------------
+
+let directorySync = null; // in-flight updateDirectory() promise
+let lastDirectoryCheck = 0;
+
+async function readDirectory() {
+  const meta = await caches.open(META_CACHE);
+  const res = await meta.match(DIRECTORY_KEY);
+  return res ? res.json() : null;
+}
+
+async function fetchDirectoryUpdate(since) {
+  const query = since ? `?since=${encodeURIComponent(since)}` : "";
+  const res = await fetch(DIRECTORY_API_PATH + query, {
+    credentials: "include",
+    cache: "no-store",
+  });
+  if (!res.ok) throw new Error("DIRECTORY_" + res.status);
+  const data = await parseJsonSafe(res, "directory", "DIRECTORY_PARSE_ERROR");
+  return data.message;
+}
+
+/**
+ * Ask for the changes since the version we hold; fall back to a full
+ * snapshot if the delta does not apply. The stored copy is replaced in one
+ * write, so an interrupted update keeps the previous version usable.
+ */
+async function updateDirectory() {
+  const current = await readDirectory();
+  let next;
+  try {
+    next = SwCore.applyDirectoryUpdate(
+      current,
+      await fetchDirectoryUpdate(current && current.version)
+    );
+  } catch (e) {
+    if (e.message !== "DIRECTORY_BASE_MISMATCH") throw e;
+    next = SwCore.applyDirectoryUpdate(null, await fetchDirectoryUpdate(null));
+  }
+  if (next === current) return { updated: false };
+
+  const meta = await caches.open(META_CACHE);
+  if (next) await meta.put(DIRECTORY_KEY, jsonResponse(next));
+  else await meta.delete(DIRECTORY_KEY);
+
+  const clients = await self.clients.matchAll({ type: "window" });
+  clients.forEach((client) => client.postMessage({ type: "FSL_DIRECTORY_UPDATED" }));
+  console.log("[SW] directory updated to", next && next.version);
+  return { updated: true };
+}
+
+function maybeSyncDirectory() {
+  if (Date.now() - lastDirectoryCheck < DIRECTORY_CHECK_INTERVAL_MS) return Promise.resolve();
+  if (!directorySync) {
+    directorySync = updateDirectory()
+      .then(() => {
+        lastDirectoryCheck = Date.now();
+      })
+      .catch((e) => {
+        console.warn("[SW] directory update failed, keeping current copy:", e);
+      })
+      .finally(() => {
+        directorySync = null;
+      });
+  }
+  return directorySync;
+}
+
+async function handleDirectoryRequest() {
+  const meta = await caches.open(META_CACHE);
+  const cached = await meta.match(DIRECTORY_KEY);
+  if (cached) return cached;
+  return new Response("null", {
+    status: 404,
+    headers: { "Content-Type": "application/json" },
+  });
+}
+
 // ---------------------------------------------------------------------------
 // INSTALL
 // ---------------------------------------------------------------------------
@@ -135,27 +410,11 @@ async function logSyncResult(csrf, metrics) {
 self.addEventListener("install", (event) => {
   console.log("[SW] install");
 
+  // DO NOT precache "/field/fsl/" (it redirects to http://:8080 in prod);
+  // the shell is cached as SHELL_URL by the first online navigation.
   event.waitUntil(
     (async () => {
-      const cache = await caches.open(STATIC_CACHE);
-
-      // DO NOT add "/field/fsl/" here (it redirects to http://:8080 in prod).
-      // Use SHELL_URL instead.
-      await cache.addAll([
-        SHELL_URL,
-        "/field/fsl/fsl.css",
-        "/field/fsl/fsl.js",
-        "/field/fsl/register-sw.js",
-        "/field/fsl/fsl.messages.js",
-        "/field/fsl/fsl.request.js",
-        "/field/fsl/fsl.queue.js",
-        "/field/fsl/sw.core.js",
-        "/field/fsl/manifest.json",
-        // icons if you use them:
-        // "/field/fsl/icons/icon-192.png",
-        // "/field/fsl/icons/icon-512.png",
-      ]);
-
+      await syncAssets();
       self.skipWaiting();
     })()
   );
@@ -169,11 +428,10 @@ self.addEventListener("activate", (event) => {
   console.log("[SW] activate");
   event.waitUntil(
     (async () => {
+      const keep = [await getActiveStaticCache(), META_CACHE, TRIPS_CACHE];
       const keys = await caches.keys();
       await Promise.all(
-        keys
-          .filter((k) => ![STATIC_CACHE, TRIPS_CACHE].includes(k))
-          .map((k) => caches.delete(k))
+        keys.filter((k) => !keep.includes(k)).map((k) => caches.delete(k))
       );
       await self.clients.claim();
       console.log("[SW] clients claimed");
@@ -194,8 +452,17 @@ self.addEventListener("fetch", (event) => {
     return;
   }
 
+  if (req.method === "GET" && url.pathname === DIRECTORY_KEY) {
+    event.respondWith(handleDirectoryRequest());
+    return;
+  }
+
   if (req.method === "GET" && url.pathname.startsWith("/field/fsl")) {
     event.respondWith(handleStaticRequest(req));
+    if (req.mode === "navigate") {
+      // page loads are the natural moment to pick up new assets
+      event.waitUntil(maybeSyncAssets());
+    }
     return;
   }
 
@@ -207,48 +474,65 @@ self.addEventListener("fetch", (event) => {
 // ---------------------------------------------------------------------------
 
 async function handleStaticRequest(req) {
+  if (req.mode === "navigate") {
+    return handleNavigation(req);
+  }
+
+  // cache keys are plain URLs; the page asks for `url?v=hash`
+  const cacheName = await getActiveStaticCache();
+  if (!cacheName) return fetch(req);
+
   const url = new URL(req.url);
+  const cache = await caches.open(cacheName);
+  const manifest = await getActiveManifest(cacheName);
+  if (SwCore.isCachedAssetCurrent(manifest, url.pathname, url.searchParams.get("v"))) {
+    const cached = await cache.match(url.pathname);
+    if (cached) return cached;
+    return fetch(req);
+  }
 
-  // Online navigation -> login check (keep as-is)
-  if (req.mode === "navigate" && url.pathname.startsWith("/field/fsl")) {
-    try {
-      const authRes = await fetch(LOGIN_STATUS_API, { method: "GET" });
-      if (authRes.ok) {
-        const data = await authRes.json();
-        const user = data && data.message;
-        if (!user || user === "Guest") {
-          const redirectTo = url.pathname + url.search;
-          return Response.redirect(
-            `${LOGIN_PAGE}?redirect-to=${encodeURIComponent(redirectTo)}`,
-            302
-          );
-        }
-      }
-    } catch {
-      // offline -> continue to cache
-    }
+  // the page was rendered after a deploy the cache hasn't caught up with:
+  // serve the requested version, keyed by its full URL so the plain entries
+  // stay consistent with the cache's manifest until maybeSyncAssets swaps it
+  const exact = await cache.match(req);
+  if (exact) return exact;
+  try {
+    const res = await fetch(req);
+    if (res.ok && res.type === "basic") await cache.put(req, res.clone());
+    return res;
+  } catch (err) {
+    // offline: an older version beats no script at all
+    const fallback = await cache.match(url.pathname);
+    if (fallback) return fallback;
+    throw err;
   }
+}
 
-  const cached = await caches.match(req);
-  if (cached) return cached;
+// Navigations are network-first: the page embeds a fresh bootstrap (driver,
+// CSRF token, trips) and the server redirects guests to /login itself, so a
+// single request is enough. The cached shell is only the offline fallback.
+async function handleNavigation(req) {
+  const url = new URL(req.url);
 
   try {
-    const res = await fetch(req);
-    if (res && res.ok) {
-      const cache = await caches.open(STATIC_CACHE);
-      cache.put(req, res.clone());
+    const res = await fetch(SHELL_URL + url.search, {
+      credentials: "include",
+      redirect: "manual",
+    });
+    const cacheName = await getActiveStaticCache();
+    if (res && res.ok && res.type === "basic" && cacheName) {
+      const cache = await caches.open(cacheName);
+      cache.put(SHELL_URL, res.clone());
     }
     return res;
   } catch (err) {
-    // Offline navigation fallback: return cached shell.
-    if (req.mode === "navigate") {
-      const shell1 = await caches.match(SHELL_URL);
-      if (shell1) return shell1;
+    const shell1 = await caches.match(SHELL_URL);
+    if (shell1) return shell1;
+
+    // extra fallback (in case you cached with slash somewhere)
+    const shell2 = await caches.match("/field/fsl/");
+    if (shell2) return shell2;
 
-      // extra fallback (in case you cached with slash somewhere)
-      const shell2 = await caches.match("/field/fsl/");
-      if (shell2) return shell2;
-    }
     throw err;
   }
 }
@@ -283,18 +567,40 @@ async function handleTripsRequest(req) {
 // FLUSH QUEUE – use SwCore.flushQueueCore
 // ---------------------------------------------------------------------------
 
+function sleep(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+function scheduleFlushRetry(retryAfterMs) {
+  backoffAttempt++;
+  const delay = SwCore.computeBackoffMs(backoffAttempt, retryAfterMs);
+  nextFlushAt = Date.now() + delay;
+  console.warn("[SW][FSL] server busy, next flush in", delay, "ms");
+
+  if (retryTimer) clearTimeout(retryTimer);
+  retryTimer = setTimeout(() => {
+    retryTimer = null;
+    flushQueue();
+  }, delay);
+}
+
 async function flushQueue() {
   console.log("[SW] flushQueue called");
 
+  if (Date.now() < nextFlushAt) {
+    console.log("[SW][FSL] backing off, flush deferred");
+    return;
+  }
+
   const all = await queueService.getAll();
   if (!all.length) {
     await notifyClientsQueueFlushed();
     return;
   }
 
-  let csrf;
+  let csrf = bootstrapCsrf;
   try {
-    csrf = await fetchCsrfForFsl();
+    if (!csrf) csrf = await fetchCsrfForFsl();
   } catch (e) {
     if (e && e.message === "CSRF_FOR_FSL_FORBIDDEN") {
       console.warn("[SW][FSL] Stopping flush: session not logged in");
@@ -304,9 +610,12 @@ async function flushQueue() {
     return;
   }
 
-  await SwCore.flushQueueCore({
+  const metrics = await SwCore.flushQueueCore({
     queueService,
-    sendFn: async (payloadObj) => {
+    sendFn: async (payloadObj, item) => {
+      if (item && item.trace) {
+        payloadObj.trace_json = JSON.stringify(item.trace);
+      }
       const res = await fetch(SUBMIT_API_PATH, {
         method: "POST",
         credentials: "include",
@@ -316,13 +625,21 @@ async function flushQueue() {
         },
         body: JSON.stringify(payloadObj),
       });
-      return { ok: !!(res && res.ok), status: res ? res.status : 0 };
+      if (res && (res.status === 400 || res.status === 403)) {
+        // possibly a stale bootstrap CSRF token; fetch a fresh one next time
+        bootstrapCsrf = null;
+      }
+      return {
+        ok: !!(res && res.ok),
+        status: res ? res.status : 0,
+        retryAfterMs: res ? SwCore.parseRetryAfterMs(res.headers.get("Retry-After")) : 0,
+      };
     },
     nowMs: Date.now(),
-    maxAgeMs: MAX_QUEUE_AGE_MS,
-    maxRetries: MAX_RETRIES,
-    maxItemsPerFlush: MAX_ITEMS_PER_FLUSH,
-    maxQueueItems: MAX_QUEUE_ITEMS,
+    maxAgeMs: queuePolicy.maxAgeMs,
+    maxRetries: queuePolicy.maxRetries,
+    maxItemsPerFlush: queuePolicy.maxItemsPerFlush,
+    maxQueueItems: queuePolicy.maxQueueItems,
     logger: {
       async logSync(metrics) {
         await logSyncResult(csrf, metrics);
@@ -335,6 +652,12 @@ async function flushQueue() {
       },
     },
   });
+
+  if (metrics && metrics.throttled) {
+    scheduleFlushRetry(metrics.retry_after_ms);
+  } else {
+    backoffAttempt = 0;
+  }
 }
 
 // ---------------------------------------------------------------------------
@@ -352,23 +675,40 @@ self.addEventListener("message", (event) => {
     const body = JSON.stringify(payloadObj);
     const now = Date.now();
 
+    const trace = data.trace || null;
+    if (trace) {
+      trace.stages = trace.stages || {};
+      trace.stages.queued = trace.stages.queued || now;
+    }
+
     const request = new FslRequest({
       url: SUBMIT_API_PATH,
       method: "POST",
       body,
       created_at: now,
       retry_count: 0,
+      trace,
     });
 
     event.waitUntil(
       (async () => {
         await queueService.enqueue(request);
-        await queueService.trimToMax(MAX_QUEUE_ITEMS);
+        await queueService.trimToMax(queuePolicy.maxQueueItems);
       })()
     );
   }
 
+  if (data.type === "FSL_BOOTSTRAP") {
+    // the page only sends this while online
+    event.waitUntil(Promise.all([applyBootstrap(data.bootstrap), maybeSyncDirectory()]));
+  }
+
   if (data.type === "SYNC_QUEUE") {
-    event.waitUntil(flushQueue());
+    // many devices reconnect together; don't all hit the server in the same instant
+    event.waitUntil(
+      sleep(Math.random() * RECONNECT_JITTER_MS).then(() =>
+        Promise.all([flushQueue(), maybeSyncAssets(), maybeSyncDirectory()])
+      )
+    );
   }
 });
\ No newline at end of file
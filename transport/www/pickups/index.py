@@ -0,0 +1,21 @@
+import frappe
+
+from transport.portal.history import get_history_page, portal_customers
+
+no_cache = 1
+
+
+def get_context(context):
+    if frappe.session.user == "Guest":
+        frappe.local.flags.redirect_location = "/login?redirect-to=/pickups"
+        raise frappe.Redirect
+
+    # first page is rendered here; "Load more" goes through transport.api.portal.get_pickup_history
+    context.customers = portal_customers(frappe.session.user)
+    customer = frappe.form_dict.customer
+    if customer not in context.customers:
+        customer = context.customers[0] if context.customers else None
+    context.customer = customer
+    context.page = get_history_page(customer) if customer else None
+    context.title = frappe._("Pickup History")
+    context.show_sidebar = True